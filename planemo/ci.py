@@ -5,10 +5,28 @@ from __future__ import print_function
 import copy
 import math
 import os
+import re
+
+import click
 
 from planemo import git
 from planemo import io
+from planemo.ci_dependencies import build_reverse_dependency_index
+from planemo.galaxy.test.structures import (
+    case_id,
+    iter_xunit_cases,
+)
 from planemo.shed import SHED_CONFIG_NAME
+from planemo.test.results import StructuredData
+from planemo.tool_cache import tool_summary
+from planemo.tools import (
+    is_tool_load_error,
+    yield_tool_summaries_on_paths,
+)
+
+# Engine test IDs are <tool id or workflow name>_<test index>.
+ENGINE_TEST_INDEX_PATTERN = re.compile(r"_\d+$")
+DEFAULT_PATH_DURATION = 1.0
 
 
 def filter_paths(ctx, raw_paths, path_type="repo", **kwds):
@@ -23,41 +41,188 @@ def filter_paths(ctx, raw_paths, path_type="repo", **kwds):
     diff_paths = None
     if changed_in_commit_range is not None:
         diff_files = git.diff(ctx, cwd, changed_in_commit_range)
-        if path_type == "repo":
-            diff_dirs = set(os.path.dirname(p) for p in diff_files)
-            diff_paths = set()
-            for diff_dir in diff_dirs:
-                while diff_dir:
-                    if os.path.isfile(os.path.join(diff_dir, SHED_CONFIG_NAME)):
-                        diff_paths.add(diff_dir)
-                        break
-                    diff_dir = os.path.dirname(diff_dir)
-        else:
-            diff_paths = diff_files
-        diff_paths = sorted(diff_paths)
+        diff_paths = _affected_paths(ctx, cwd, raw_paths, diff_files, path_type)
 
     unique_paths = sorted(set(map(lambda p: os.path.relpath(p, cwd), raw_paths)))
     filtered_paths = io.filter_paths(unique_paths, cwd=cwd, **filter_kwds)
     if diff_paths is not None:
         new_filtered_paths = []
         for path in filtered_paths:
-            if path in diff_paths:
+            if os.path.realpath(path) in diff_paths:
                 new_filtered_paths.append(path)
 
         filtered_paths = new_filtered_paths
 
-    path_count = len(filtered_paths)
-    chunk_size = ((1.0 * path_count) / kwds["chunk_count"])
+    return chunk_paths(ctx, filtered_paths, path_type=path_type, **kwds)
+
+
+def _affected_paths(ctx, cwd, raw_paths, diff_files, path_type):
+    """Return real paths of the tools or repositories affected by changed files.
+
+    Besides tools and repositories containing changed files, this includes
+    those depending on them through macros, test-data, ``.shed.yml`` includes
+    and workflow tool or sub-workflow references.
+    """
+    index = build_reverse_dependency_index(ctx, raw_paths)
+    affected = index.affected([os.path.join(cwd, p) for p in diff_files])
+    if path_type != "repo":
+        return affected
+
+    affected_repos = set(index.repositories & affected)
+    for affected_path in affected:
+        diff_dir = os.path.dirname(affected_path)
+        while diff_dir != os.path.dirname(diff_dir):
+            if os.path.isfile(os.path.join(diff_dir, SHED_CONFIG_NAME)):
+                affected_repos.add(diff_dir)
+                break
+            diff_dir = os.path.dirname(diff_dir)
+    return affected_repos
+
+
+def chunk_paths(ctx, paths, path_type="repo", **kwds):
+    """Return the paths in chunk ``chunk`` of ``chunk_count``.
+
+    Without recorded durations (``chunk_durations``) paths are split by
+    sorted position, otherwise paths are assigned to chunks to balance their
+    total expected test time.
+    """
+    chunk_count = kwds["chunk_count"]
     chunk = kwds["chunk"]
+    if chunk_count < 1:
+        raise click.UsageError("--chunk_count must be at least 1, not %d." % chunk_count)
+    if not 0 <= chunk < chunk_count:
+        message = "--chunk must be between 0 and %d (--chunk_count - 1), not %d."
+        raise click.UsageError(message % (chunk_count - 1, chunk))
+    duration_paths = kwds.get("chunk_durations", None)
+    if duration_paths and chunk_count > 1:
+        costs = expected_durations(
+            ctx, paths, duration_paths, path_type=path_type,
+            default_duration=kwds.get("chunk_default_duration", None),
+        )
+        return balanced_chunks(paths, costs, chunk_count)[chunk]
+
+    path_count = len(paths)
+    chunk_size = ((1.0 * path_count) / chunk_count)
 
     chunked_paths = []
-    for i, path in enumerate(filtered_paths):
+    for i, path in enumerate(paths):
         if int(math.floor(i / chunk_size)) == chunk:
             chunked_paths.append(path)
 
     return chunked_paths
 
 
+def balanced_chunks(paths, costs, chunk_count):
+    """Split paths into ``chunk_count`` chunks with roughly equal total cost.
+
+    Greedily assigns the most expensive remaining path to the chunk with the
+    lowest total so far - ties are broken by path and chunk index so every
+    CI shard computes the same assignment. Paths in each chunk are sorted.
+    """
+    chunks = [[] for _ in range(chunk_count)]
+    totals = [0.0] * chunk_count
+    for cost, path in sorted(zip(costs, paths), key=lambda c: (-c[0], c[1])):
+        lightest = totals.index(min(totals))
+        chunks[lightest].append(path)
+        totals[lightest] += cost
+    return [sorted(c) for c in chunks]
+
+
+def expected_durations(ctx, paths, duration_paths, path_type="file", default_duration=None):
+    """Estimate the test time of each tool file (or shed repository) in ``paths``.
+
+    Durations are read from the reports in ``duration_paths`` (see
+    :func:`read_test_durations`), tools without recorded durations are
+    assumed to take ``default_duration`` seconds - by default the mean of
+    the recorded durations.
+    """
+    durations = read_test_durations(duration_paths)
+    if default_duration is None:
+        default_duration = _mean(durations.values(), DEFAULT_PATH_DURATION)
+    return [
+        _path_duration(ctx, path, path_type, durations, default_duration) for path in paths
+    ]
+
+
+def read_test_durations(paths):
+    """Read recorded test durations from structured test data or xUnit reports.
+
+    Returns a dictionary mapping tool IDs (or workflow names) to the total
+    seconds their tests took. Files later in ``paths`` take precedence.
+    """
+    durations = {}
+    for path in paths:
+        if path.endswith(".xml"):
+            file_durations = _xunit_durations(path)
+        else:
+            file_durations = _structured_data_durations(path)
+        durations.update(file_durations)
+    return durations
+
+
+def _xunit_durations(path):
+    durations = {}
+    for testcase_el in iter_xunit_cases(path):
+        time = testcase_el.attrib.get("time", None)
+        if time is None:
+            continue
+        name = _test_name(case_id(testcase_el))
+        durations[name] = durations.get(name, 0.0) + float(time)
+    return durations
+
+
+def _structured_data_durations(path):
+    durations = {}
+    for test in StructuredData(path).structured_data_tests:
+        time_seconds = (test.get("data", None) or {}).get("time_seconds", None)
+        if time_seconds is None:
+            continue
+        name = _test_name(case_id(raw_id=test["id"]))
+        durations[name] = durations.get(name, 0.0) + float(time_seconds)
+    return durations
+
+
+def _test_name(test_id):
+    if test_id.num is not None:
+        # Galaxy run_tests.sh ID - name is already the tool ID.
+        return test_id.name
+    return ENGINE_TEST_INDEX_PATTERN.sub("", test_id.name)
+
+
+def _path_duration(ctx, path, path_type, durations, default_duration):
+    """Estimate the test time of a tool file or shed repository."""
+    if path_type == "repo":
+        tool_summaries = yield_tool_summaries_on_paths(ctx, [path], recursive=True)
+        names = [[t.parse_id()] for (_, t) in tool_summaries if not is_tool_load_error(t)]
+    else:
+        names = [_path_names(ctx, path)]
+    if not names:
+        return default_duration
+
+    duration = 0.0
+    for tool_names in names:
+        known = [durations[n] for n in tool_names if n in durations]
+        duration += known[0] if known else default_duration
+    return duration
+
+
+def _path_names(ctx, path):
+    # Workflows are recorded by file name, tools by ID.
+    names = [os.path.basename(path)]
+    try:
+        names.insert(0, tool_summary(ctx, path).parse_id())
+    except Exception:
+        pass
+    return names
+
+
+def _mean(values, default):
+    values = list(values)
+    if not values:
+        return default
+    return sum(values) / len(values)
+
+
 def print_path_list(paths, **kwds):
     with io.open_file_or_standard_output(kwds["output"], "w") as f:
         for path in paths:
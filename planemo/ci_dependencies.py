@@ -0,0 +1,185 @@
+"""Index tools, workflows and repositories by the files they depend on.
+
+Used by the ``ci_find_*`` commands to select everything affected by the
+changes in a commit range - not only tools and repositories containing
+changed files, but also tools importing changed macros or referencing changed
+``test-data``, repositories including changed files through ``.shed.yml`` and
+workflows running changed tools or sub-workflows.
+"""
+import json
+import os
+
+import six
+import yaml
+from galaxy.tools.loader_directory import (
+    is_a_yaml_with_class,
+    looks_like_a_tool_xml,
+)
+
+from planemo.shed import (
+    find_raw_repositories,
+    SHED_CONFIG_NAME,
+)
+from planemo.tool_cache import tool_summary
+
+
+class ReverseDependencyIndex(object):
+    """Map files to the tools, workflows and repositories depending on them.
+
+    All paths are stored as real paths so files shared through symbolic links
+    (e.g. ``test-data`` linked between repositories) are tracked once.
+    """
+
+    def __init__(self):
+        self.repositories = set()
+        self._dependents = {}
+        self._tool_paths_by_id = {}
+        self._workflow_tool_ids = {}
+
+    def add(self, dependent, dependencies):
+        """Record that ``dependent`` needs to be re-checked if any of ``dependencies`` change."""
+        dependent = os.path.realpath(dependent)
+        for dependency in dependencies:
+            dependency = os.path.realpath(dependency)
+            if dependency != dependent:
+                self._dependents.setdefault(dependency, set()).add(dependent)
+
+    def add_tool(self, ctx, path):
+        """Index macro imports and test-data references of the XML tool at ``path``."""
+        try:
+            summary = tool_summary(ctx, path)
+        except Exception:
+            # Unparsable tools are reported by linting, only track the file itself.
+            return
+        if summary.id is not None:
+            self._tool_paths_by_id.setdefault(summary.id, set()).add(os.path.realpath(path))
+        self.add(path, summary.macro_paths)
+        self.add(path, _test_data_paths(path, summary.test_data))
+
+    def add_workflow(self, path):
+        """Index tools and sub-workflows used by the Galaxy workflow at ``path``."""
+        try:
+            workflow = _load_workflow(path)
+        except Exception:
+            return
+        tool_ids = set()
+        subworkflow_paths = set()
+        _collect_workflow_references(workflow, tool_ids, subworkflow_paths)
+        workflow_directory = os.path.dirname(os.path.abspath(path))
+        self.add(path, [os.path.join(workflow_directory, p) for p in subworkflow_paths])
+        # Tools may not have been indexed yet, resolve IDs in affected().
+        self._workflow_tool_ids[os.path.realpath(path)] = tool_ids
+
+    def add_repository(self, ctx, path):
+        """Index files included into the shed repositories described in ``path``."""
+        repository = os.path.realpath(path)
+        self.repositories.add(repository)
+        included_paths = set()
+        for raw_repo in find_raw_repositories(ctx, [path], fail_fast=False):
+            if isinstance(raw_repo, Exception):
+                continue
+            try:
+                included_paths.update(raw_repo.included_paths())
+            except Exception:
+                continue
+        self.add(repository, included_paths)
+        return included_paths
+
+    def affected(self, changed_paths):
+        """Return real paths of changed files and everything depending on them."""
+        dependents = self._dependents_with_workflows()
+        affected = set()
+        pending = [os.path.realpath(p) for p in changed_paths]
+        while pending:
+            path = pending.pop()
+            if path in affected:
+                continue
+            affected.add(path)
+            pending.extend(dependents.get(path, ()))
+        return affected
+
+    def _dependents_with_workflows(self):
+        dependents = dict((k, set(v)) for (k, v) in self._dependents.items())
+        for workflow_path, tool_ids in self._workflow_tool_ids.items():
+            for tool_id in tool_ids:
+                for tool_path in self._tool_paths_by_id.get(tool_id, ()):
+                    dependents.setdefault(tool_path, set()).add(workflow_path)
+        return dependents
+
+
+def build_reverse_dependency_index(ctx, paths):
+    """Build a :class:`ReverseDependencyIndex` over tool, workflow and repository ``paths``.
+
+    Directories are searched recursively and directories containing a
+    ``.shed.yml`` file are indexed as repositories.
+    """
+    index = ReverseDependencyIndex()
+    seen = set()
+    for path in paths:
+        for file_path in _index_candidates(ctx, index, path):
+            real_path = os.path.realpath(file_path)
+            if real_path in seen:
+                continue
+            seen.add(real_path)
+            if looks_like_a_tool_xml(file_path):
+                index.add_tool(ctx, file_path)
+            elif _looks_like_a_workflow(file_path):
+                index.add_workflow(file_path)
+    return index
+
+
+def _index_candidates(ctx, index, path):
+    if not os.path.isdir(path):
+        yield path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        if SHED_CONFIG_NAME in files:
+            for included_path in sorted(index.add_repository(ctx, root)):
+                if os.path.isfile(included_path):
+                    yield included_path
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def _test_data_paths(tool_path, test_data):
+    test_data_directory = os.path.join(os.path.dirname(os.path.abspath(tool_path)), "test-data")
+    paths = [os.path.join(test_data_directory, name) for name in test_data]
+    return [p for p in paths if os.path.exists(p)]
+
+
+def _looks_like_a_workflow(path):
+    return path.endswith(".ga") or is_a_yaml_with_class(path, ["GalaxyWorkflow"])
+
+
+def _load_workflow(path):
+    with open(path, "r") as f:
+        if path.endswith(".ga"):
+            return json.load(f)
+        return yaml.safe_load(f)
+
+
+def _collect_workflow_references(value, tool_ids, subworkflow_paths):
+    # Steps are nested in lists and dictionaries in both .ga and format 2
+    # workflows, with sub-workflows either embedded or referenced by path.
+    if isinstance(value, dict):
+        tool_id = value.get("tool_id", None)
+        if tool_id:
+            tool_ids.add(tool_id)
+            # Tool shed tool IDs end with /<tool id>/<version>.
+            if "/" in tool_id:
+                tool_ids.add(tool_id.rstrip("/").split("/")[-2])
+        run = value.get("run", None)
+        if isinstance(run, six.string_types) and not run.startswith("#"):
+            subworkflow_paths.add(run)
+        for child in value.values():
+            _collect_workflow_references(child, tool_ids, subworkflow_paths)
+    elif isinstance(value, list):
+        for child in value:
+            _collect_workflow_references(child, tool_ids, subworkflow_paths)
+
+
+__all__ = (
+    "build_reverse_dependency_index",
+    "ReverseDependencyIndex",
+)
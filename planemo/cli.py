@@ -8,7 +8,6 @@ import click
 
 from planemo import __version__
 from planemo.exit_codes import ExitCodeException
-from planemo.galaxy import profiles
 
 from .config import (
     OptionSource,
@@ -98,6 +97,12 @@ class Context(object):
         path = os.path.join(self.workspace, "profiles")
         return self._ensure_directory(path, "Galaxy profiles")
 
+    @property
+    def galaxy_pool_directory(self):
+        """Create and return a directory for storing pooled Galaxy servers."""
+        path = os.path.join(self.workspace, "galaxy_pool")
+        return self._ensure_directory(path, "Galaxy pool")
+
     def _ensure_directory(self, path, name):
         if not os.path.exists(path):
             os.makedirs(path)
@@ -149,6 +154,33 @@ def name_to_command(name):
     return mod.cli
 
 
+def build_command_manifest():
+    """Import every command and describe it for ``planemo/commands/manifest.py``."""
+    manifest = {}
+    for name in list_cmds():
+        command = name_to_command(name)
+        if command is not None:
+            manifest[name] = _short_help(command)
+    return manifest
+
+
+def _short_help(command):
+    # click 7+ only sets short_help when given explicitly and derives it
+    # from the docstring on demand.
+    get_short_help_str = getattr(command, "get_short_help_str", None)
+    if get_short_help_str is not None:
+        return get_short_help_str()
+    return command.short_help or ''
+
+
+def _command_manifest():
+    try:
+        from planemo.commands.manifest import COMMANDS
+    except ImportError:
+        COMMANDS = {}
+    return COMMANDS
+
+
 class PlanemoCLI(click.MultiCommand):
 
     def list_commands(self, ctx):
@@ -159,6 +191,27 @@ class PlanemoCLI(click.MultiCommand):
             name = COMMAND_ALIASES[name]
         return name_to_command(name)
 
+    def format_commands(self, ctx, formatter):
+        """List commands using the prebuilt manifest - without importing them.
+
+        Commands missing from the manifest (e.g. new commands in a development
+        checkout) are imported to describe them.
+        """
+        manifest = _command_manifest()
+        rows = []
+        for name in self.list_commands(ctx):
+            if name in manifest:
+                rows.append((name, manifest[name]))
+                continue
+            command = self.get_command(ctx, name)
+            if command is None:
+                continue
+            rows.append((name, _short_help(command)))
+
+        if rows:
+            with formatter.section('Commands'):
+                formatter.write_dl(rows)
+
 
 def command_function(f):
     """Extension point for processing kwds after click callbacks."""
@@ -166,6 +219,8 @@ def command_function(f):
     def handle_blended_options(*args, **kwds):
         profile = kwds.get("profile", None)
         if profile:
+            # Imports much of planemo.galaxy - only pay for it when needed.
+            from planemo.galaxy import profiles
             ctx = args[0]
             profile_defaults = profiles.ensure_profile(
                 ctx, profile, **kwds
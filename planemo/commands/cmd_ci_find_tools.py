@@ -6,7 +6,7 @@ import click
 from planemo import options
 from planemo.ci import filter_paths, print_path_list
 from planemo.cli import command_function
-from planemo.tools import is_tool_load_error, yield_tool_sources_on_paths
+from planemo.tools import is_tool_load_error, yield_tool_summaries_on_paths
 
 
 @click.command('ci_find_tools')
@@ -20,8 +20,8 @@ def cli(ctx, paths, **kwds):
     operations over for continuous integration operations.
     """
     tool_paths = []
-    for (tool_path, tool_source) in yield_tool_sources_on_paths(ctx, paths, recursive=True):
-        if is_tool_load_error(tool_source):
+    for (tool_path, tool_summary) in yield_tool_summaries_on_paths(ctx, paths, recursive=True):
+        if is_tool_load_error(tool_summary):
             continue
         tool_paths.append(tool_path)
 
@@ -1,11 +1,21 @@
 """Module describing the planemo ``conda_install`` command."""
+import os
+
 import click
 
 from galaxy.tools.deps import conda_util
 
 from planemo import options
 from planemo.cli import command_function
-from planemo.conda import build_conda_context, collect_conda_targets
+from planemo.conda import (
+    build_conda_context,
+    collect_conda_targets,
+    target_str_to_targets,
+)
+from planemo.conda_env_cache import (
+    build_environments,
+    tool_conda_target_lists,
+)
 from planemo.io import coalesce_return_codes
 
 
@@ -15,10 +25,21 @@ from planemo.io import coalesce_return_codes
 @options.conda_target_options()
 @options.conda_global_option()
 @options.conda_auto_init_option()
+@options.conda_install_batch_option()
+@options.conda_install_jobs_option()
 @command_function
 def cli(ctx, paths, **kwds):
-    """Install conda packages for tool requirements."""
+    """Install conda packages for tool requirements.
+
+    By default each requirement is installed into an environment of its own.
+    With ``--batch`` the environment Galaxy resolves for all requirements of
+    a tool is built instead - each distinct set of requirements is solved
+    once and the solution is cached in planemo's workspace, where ``planemo
+    test`` and ``planemo serve`` reuse it.
+    """
     conda_context = build_conda_context(ctx, handle_auto_init=True, **kwds)
+    if kwds.get("batch", False) and not kwds.get("global", False):
+        return _install_batch(ctx, paths, conda_context, **kwds)
     return_codes = []
     for conda_target in collect_conda_targets(ctx, paths, recursive=kwds["recursive"]):
         ctx.log("Install conda target %s" % conda_target)
@@ -27,3 +48,12 @@ def cli(ctx, paths, **kwds):
         )
         return_codes.append(return_code)
     return coalesce_return_codes(return_codes, assert_at_least_one=True)
+
+
+def _install_batch(ctx, paths, conda_context, **kwds):
+    tool_paths = [p for p in paths if os.path.exists(p)]
+    conda_target_lists = [target_str_to_targets(p) for p in paths if not os.path.exists(p)]
+    conda_target_lists.extend(tool_conda_target_lists(ctx, tool_paths, recursive=kwds["recursive"]))
+    if not conda_target_lists:
+        return coalesce_return_codes([], assert_at_least_one=True)
+    return build_environments(ctx, conda_target_lists, conda_context, jobs=kwds.get("jobs", 1))
@@ -4,13 +4,20 @@ import string
 
 import click
 
-from galaxy.tools.deps.mulled.util import conda_build_target_str, quay_repository, v2_image_name
+from galaxy.tools.deps.mulled.util import conda_build_target_str, v2_image_name
 
 from planemo import options
 from planemo.cli import command_function
 from planemo.conda import best_practice_search, collect_conda_target_lists_and_tool_paths
+from planemo.container_registry import (
+    GITHUB_API_URL,
+    PullRequestTitleIndex,
+    QUAY_API_URL,
+    RegistryLookups,
+)
 from planemo.git import add, branch, commit, push
-from planemo.github_util import clone_fork_branch, get_repository_object, pull_request
+from planemo.github_util import clone_fork_branch, get_github_auth, pull_request
+from planemo.io import warn
 from planemo.mulled import conda_to_mulled_targets
 
 REGISTERY_TARGET_NAME = "multi-package-containers"
@@ -62,28 +69,18 @@ def cli(ctx, paths, **kwds):
     so that a container can be created and registered for these tools.
     """
     registry_target = RegistryTarget(ctx, **kwds)
+    namespace = kwds["mulled_namespace"]
 
-    combinations_added = 0
+    candidates = []
     conda_targets_list, tool_paths_list = collect_conda_target_lists_and_tool_paths(ctx, paths, recursive=kwds["recursive"])
     for conda_targets, tool_paths in zip(conda_targets_list, tool_paths_list):
         ctx.vlog("Handling conda_targets [%s]" % conda_targets)
-        mulled_targets = conda_to_mulled_targets(conda_targets)
-        mulled_targets_str = "- " + "\n- ".join(map(conda_build_target_str, mulled_targets))
+        mulled_targets = list(conda_to_mulled_targets(conda_targets))
         if len(mulled_targets) < 2:
             ctx.vlog("Skipping registeration, fewer than 2 targets discovered.")
             # Skip these for now, we will want to revisit this for conda-forge dependencies and such.
             continue
 
-        best_practice_requirements = True
-        for conda_target in conda_targets:
-            best_hit, exact = best_practice_search(conda_target)
-            if not best_hit or not exact:
-                ctx.vlog("Target [%s] is not available in best practice channels - skipping" % conda_target)
-                best_practice_requirements = False
-
-        if not best_practice_requirements:
-            continue
-
         name = v2_image_name(mulled_targets)
         tag = "0"
         name_and_tag = "%s-%s" % (name, tag)
@@ -93,9 +90,20 @@ def cli(ctx, paths, **kwds):
             ctx.vlog("Target file already exists, skipping")
             continue
 
-        namespace = kwds["mulled_namespace"]
-        repo_data = quay_repository(namespace, name)
-        if "tags" in repo_data:
+        if not _best_practice_requirements(ctx, conda_targets):
+            continue
+
+        candidates.append((name, mulled_targets, tool_paths, target_filename))
+
+    # Look up every candidate image on quay.io at once rather than one by one.
+    repositories = registry_target.lookups.quay_repositories(namespace, [c[0] for c in candidates])
+    combinations_added = 0
+    for name, mulled_targets, tool_paths, target_filename in candidates:
+        if repositories[name] is None:
+            warn("Could not check quay.io for repository [%s], skipping." % name)
+            continue
+
+        if "tags" in repositories[name]:
             ctx.vlog("quay repository already exists, skipping")
             continue
 
@@ -104,11 +112,23 @@ def cli(ctx, paths, **kwds):
             continue
 
         registry_target.write_targets(ctx, target_filename, mulled_targets)
+        mulled_targets_str = "- " + "\n- ".join(map(conda_build_target_str, mulled_targets))
         tools_str = "\n".join(map(lambda p: "- " + os.path.basename(p), tool_paths))
         registry_target.handle_pull_request(ctx, name, target_filename, mulled_targets_str, tools_str, **kwds)
         combinations_added += 1
 
 
+def _best_practice_requirements(ctx, conda_targets):
+    # Searches are answered from the best practice channel index loaded once.
+    best_practice_requirements = True
+    for conda_target in conda_targets:
+        best_hit, exact = best_practice_search(conda_target, ctx=ctx)
+        if not best_hit or not exact:
+            ctx.vlog("Target [%s] is not available in best practice channels - skipping" % conda_target)
+            best_practice_requirements = False
+    return best_practice_requirements
+
+
 class RegistryTarget(object):
     """Abstraction around mulled container registery (both directory and Github repo)."""
 
@@ -117,6 +137,11 @@ class RegistryTarget(object):
         pr_titles = []
         target_repository = None
         do_pull_request = kwds.get("pull_request", True)
+        self.lookups = RegistryLookups(
+            quay_api_url=ctx.global_config.get("quay_api_url", QUAY_API_URL),
+            github_api_url=ctx.global_config.get("github_api_url", GITHUB_API_URL),
+            github_auth=get_github_auth(ctx),
+        )
         if output_directory is None:
             target_repository = os.path.join(ctx.workspace, REGISTERY_TARGET_NAME)
             output_directory = os.path.join(target_repository, REGISTERY_TARGET_PATH)
@@ -126,20 +151,15 @@ class RegistryTarget(object):
                 target_repository,
                 fork=do_pull_request,
             )
-            pr_titles = [pr.title for pr in open_prs(ctx)]
+            pr_titles = self.lookups.open_pull_request_titles(REGISTERY_REPOSITORY)
 
         self.do_pull_request = do_pull_request
-        self.pr_titles = pr_titles
+        self.pr_titles = PullRequestTitleIndex(pr_titles)
         self.output_directory = output_directory
         self.target_repository = target_repository
 
     def has_pull_request_for(self, name):
-        has_pr = False
-        if self.do_pull_request:
-            if any([name in t for t in self.pr_titles]):
-                has_pr = True
-
-        return has_pr
+        return self.do_pull_request and name in self.pr_titles
 
     def handle_pull_request(self, ctx, name, target_filename, packages_str, tools_str, **kwds):
         if self.do_pull_request:
@@ -169,9 +189,3 @@ class RegistryTarget(object):
             contents = ",".join(target_strings)
             f.write(contents)
             ctx.vlog("Wrote requirements [%s] to file [%s]" % (contents, target_filename))
-
-
-def open_prs(ctx):
-    repo = get_repository_object(ctx, REGISTERY_REPOSITORY)
-    prs = [pr for pr in repo.get_pulls()]
-    return prs
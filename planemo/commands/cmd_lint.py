@@ -3,7 +3,10 @@ import click
 
 from planemo import options
 from planemo.cli import command_function
-from planemo.lint import build_lint_args
+from planemo.lint import (
+    build_lint_args,
+    url_checking,
+)
 from planemo.tool_lint import lint_tools_on_path
 
 
@@ -15,6 +18,7 @@ from planemo.tool_lint import lint_tools_on_path
 @options.skip_option()
 @options.lint_xsd_option()
 @options.recursive_option()
+@options.lint_jobs_option()
 @click.option(
     "--urls",
     is_flag=True,
@@ -51,12 +55,14 @@ from planemo.tool_lint import lint_tools_on_path
 def cli(ctx, uris, **kwds):
     """Check for common errors and best practices."""
     lint_args = build_lint_args(ctx, **kwds)
-    exit_code = lint_tools_on_path(
-        ctx,
-        uris,
-        lint_args,
-        recursive=kwds["recursive"]
-    )
+    with url_checking(ctx, **kwds):
+        exit_code = lint_tools_on_path(
+            ctx,
+            uris,
+            lint_args,
+            recursive=kwds["recursive"],
+            jobs=kwds["jobs"],
+        )
 
     # TODO: rearchitect XUnit.
     # if kwds['urls']:
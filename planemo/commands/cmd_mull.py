@@ -1,11 +1,9 @@
 """Module describing the planemo ``mull`` command."""
 import click
 
-from galaxy.tools.deps.mulled.mulled_build import mull_targets
-
 from planemo import options
 from planemo.cli import command_function
-from planemo.mulled import build_mull_target_kwds, collect_mulled_target_lists
+from planemo.mulled import collect_mulled_target_lists, mull
 
 
 @click.command('mull')
@@ -13,6 +11,9 @@ from planemo.mulled import build_mull_target_kwds, collect_mulled_target_lists
 @options.recursive_option()
 @options.mulled_options()
 @options.conda_ensure_channels_option()
+@options.mull_jobs_option()
+@options.mull_rebuild_existing_option()
+@options.docker_config_options()
 @command_function
 def cli(ctx, paths, **kwds):
     """Build containers for specified tools.
@@ -26,8 +27,12 @@ def cli(ctx, paths, **kwds):
     Conda channel such as bioconda (https://github.com/bioconda/bioconda-recipes).
     This can be verified by running ``planemo lint --conda_requirements`` on the
     target tool(s).
+
+    Tools sharing a combination of requirements share a container, so each
+    container is only built once. Containers already present in the local
+    Docker image store are not rebuilt unless ``--rebuild_existing`` is
+    specified. Use ``--jobs`` to build several containers concurrently - the
+    output of each build is then logged to a file in planemo's workspace.
     """
-    for mulled_targets in collect_mulled_target_lists(ctx, paths, recursive=kwds["recursive"]):
-        mull_target_kwds = build_mull_target_kwds(ctx, **kwds)
-        command = kwds["mulled_command"]
-        mull_targets(mulled_targets, command=command, **mull_target_kwds)
+    target_lists = collect_mulled_target_lists(ctx, paths, recursive=kwds["recursive"])
+    ctx.exit(mull(ctx, target_lists, **kwds))
@@ -0,0 +1,21 @@
+"""Module describing the planemo ``pool_clear`` command."""
+from __future__ import print_function
+
+import click
+
+from planemo.cli import command_function
+from planemo.galaxy import pool
+
+
+@click.command('pool_clear')
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help="Also stop servers currently leased by running planemo commands.",
+)
+@command_function
+def cli(ctx, **kwds):
+    """Stop and delete Galaxy servers in the warm server pool."""
+    stopped = pool.clear_pool(ctx, **kwds)
+    print("Stopped %d pooled Galaxy server(s)." % stopped)
@@ -0,0 +1,18 @@
+"""Module describing the planemo ``pool_list`` command."""
+from __future__ import print_function
+
+import click
+
+from planemo.cli import command_function
+from planemo.galaxy import pool
+
+
+@click.command('pool_list')
+@command_function
+def cli(ctx, **kwds):
+    """List Galaxy servers in the warm server pool.
+
+    These are servers started by commands run with ``--galaxy_pool``.
+    """
+    for server in pool.list_pooled_servers(ctx, **kwds):
+        print("port %(port)s\tleased: %(leased)s\t%(server_directory)s" % server)
@@ -12,8 +12,15 @@ from planemo.galaxy import profiles
 @options.profile_name_argument()
 @options.profile_database_options()
 @options.serve_engine_option()
+@options.galaxy_root_option()
+@options.skip_venv_option()
 @command_function
 def cli(ctx, profile_name, **kwds):
-    """Create a profile."""
+    """Create a profile.
+
+    For ``postgres`` profiles, if ``--galaxy_root`` is supplied the profile
+    database is copied from a template migrated for that Galaxy rather than
+    left empty for Galaxy to migrate on first boot.
+    """
     profiles.create_profile(ctx, profile_name, **kwds)
     print("Profile [%s] created." % profile_name)
@@ -16,6 +16,7 @@ from planemo.reports.xunit_handler import handle_report_xunit_kwd
 
 @click.command("shed_diff")
 @options.shed_read_options()
+@options.shed_cache_realizations_option()
 @click.option(
     "-o", "--output",
     type=click.Path(file_okay=True, resolve_path=True),
@@ -2,15 +2,17 @@
 import click
 
 from planemo import options
-from planemo import shed
 from planemo import shed_lint
 from planemo.cli import command_function
+from planemo.lint import url_checking
 
 
 @click.command('shed_lint')
 @options.shed_realization_options()
+@options.shed_cache_realizations_option()
 @options.report_level_option()
 @options.fail_level_option()
+@options.lint_jobs_option()
 @options.click.option(
     '--tools',
     is_flag=True,
@@ -51,9 +53,7 @@ def cli(ctx, paths, **kwds):
     was received. In tool XML files, the ``--urls`` option checks through the
     help text for mentioned URLs and checks those.
     """
-    def lint(realized_repository):
-        return shed_lint.lint_repository(ctx, realized_repository, **kwds)
-
     kwds["fail_on_missing"] = False
-    exit_code = shed.for_each_repository(ctx, lint, paths, **kwds)
+    with url_checking(ctx, **kwds):
+        exit_code = shed_lint.lint_repositories(ctx, paths, **kwds)
     ctx.exit(exit_code)
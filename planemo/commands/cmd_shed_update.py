@@ -1,5 +1,6 @@
 """Module describing the planemo ``shed_update`` command."""
 import sys
+import threading
 
 import click
 
@@ -18,6 +19,8 @@ from planemo.reports.xunit_handler import handle_report_xunit_kwd
 @options.report_xunit()
 @options.shed_publish_options()
 @options.shed_upload_options()
+@options.shed_cache_realizations_option()
+@options.shed_jobs_option()
 @options.shed_skip_upload()
 @options.shed_skip_metadata()
 @command_function
@@ -64,11 +67,12 @@ def cli(ctx, paths, **kwds):
         'suitename': 'update',
         'tests': [],
     }
+    # Repositories may be updated concurrently (see --jobs).
+    collected_data_lock = threading.Lock()
 
     shed_context = shed.get_shed_context(ctx, **kwds)
 
     def update(realized_repository):
-        collected_data['results']['total'] += 1
         skip_upload = kwds["skip_upload"]
         skip_metadata = kwds["skip_metadata"]
         upload_ret_code = 0
@@ -92,13 +96,12 @@ def cli(ctx, paths, **kwds):
 
         # Now that we've uploaded (or skipped appropriately), collect results.
         if upload_ret_code == 2:
-            collected_data['results']['failures'] += 1
             message = "Failed to update repository '%s' as it does not exist on the %s." % (realized_repository.name, shed_context.label)
             repo_result.update({
                 'errorType': 'FailedUpdate',
                 'errorMessage': message,
             })
-            collected_data['tests'].append(repo_result)
+            _collect(collected_data, collected_data_lock, repo_result, 'failures')
             error(message)
             return upload_ret_code
 
@@ -119,10 +122,11 @@ def cli(ctx, paths, **kwds):
         else:
             info("Skipping metadata update for %s" % repository_destination_label)
 
+        result_type = None
         if metadata_ok and upload_ok:
             pass
         elif upload_ok:
-            collected_data['results']['skips'] += 1
+            result_type = 'skips'
             repo_result.update({
                 'errorType': 'FailedMetadata',
                 'errorMessage': 'Failed to update repository metadata',
@@ -131,7 +135,7 @@ def cli(ctx, paths, **kwds):
                 error("Repository contents updated but failed to update metadata for %s." % repository_destination_label)
             exit = exit or 1
         else:
-            collected_data['results']['failures'] += 1
+            result_type = 'failures'
             repo_result.update({
                 'errorType': 'FailedUpdate',
                 'errorMessage': 'Failed to update repository',
@@ -141,11 +145,20 @@ def cli(ctx, paths, **kwds):
             else:
                 error("Failed to update repository contents and metadata for %s." % repository_destination_label)
             exit = exit or 1
-        collected_data['tests'].append(repo_result)
+        _collect(collected_data, collected_data_lock, repo_result, result_type)
         return exit
 
-    exit_code = shed.for_each_repository(ctx, update, paths, **kwds)
+    map_function = shed.concurrent_map_function(kwds.get("jobs"))
+    exit_code = shed.for_each_repository(ctx, update, paths, map_function=map_function, **kwds)
 
     handle_report_xunit_kwd(kwds, collected_data)
 
     sys.exit(exit_code)
+
+
+def _collect(collected_data, lock, repo_result, result_type=None):
+    with lock:
+        collected_data['results']['total'] += 1
+        if result_type is not None:
+            collected_data['results'][result_type] += 1
+        collected_data['tests'].append(repo_result)
@@ -18,6 +18,8 @@ tar_path = click.Path(
 
 @click.command("shed_upload")
 @options.shed_publish_options()
+@options.shed_cache_realizations_option()
+@options.shed_jobs_option()
 @options.shed_upload_options()
 @click.option(
     '--tar_only',
@@ -52,5 +54,6 @@ def cli(ctx, paths, **kwds):
     def upload(realized_repository):
         return shed.upload_repository(ctx, realized_repository, **kwds)
 
-    exit_code = shed.for_each_repository(ctx, upload, paths, **kwds)
+    map_function = shed.concurrent_map_function(kwds.get("jobs"))
+    exit_code = shed.for_each_repository(ctx, upload, paths, map_function=map_function, **kwds)
     sys.exit(exit_code)
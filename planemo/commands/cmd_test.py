@@ -11,8 +11,13 @@ from planemo.galaxy import galaxy_config
 from planemo.galaxy.test import (
     handle_reports_and_summary,
     run_in_config,
+    run_in_instances,
+    run_in_pooled_galaxy,
+)
+from planemo.io import (
+    info,
+    warn,
 )
-from planemo.io import info
 from planemo.runnable import (
     for_paths,
     RunnableType,
@@ -34,6 +39,9 @@ from planemo.runnable import (
 @options.galaxy_config_options()
 @options.test_options()
 @options.engine_options()
+@options.test_parallel_option()
+@options.test_instances_option()
+@options.test_postgres_database_option()
 @command_function
 def cli(ctx, paths, **kwds):
     """Run specified tool's tests within Galaxy.
@@ -73,7 +81,15 @@ def cli(ctx, paths, **kwds):
             return_value = handle_reports_and_summary(ctx, test_data.structured_data, kwds=kwds)
     else:
         kwds["for_tests"] = True
-        with galaxy_config(ctx, runnables, **kwds) as config:
-            return_value = run_in_config(ctx, config, **kwds)
+        galaxy_pool = kwds.get("galaxy_pool", False) and not kwds.get("dockerize", False)
+        if kwds.get("instances", 1) > 1:
+            if galaxy_pool:
+                warn("--galaxy_pool does not apply with --instances, starting fresh Galaxy instances.")
+            return_value = run_in_instances(ctx, runnables, **kwds)
+        elif galaxy_pool:
+            return_value = run_in_pooled_galaxy(ctx, runnables, **kwds)
+        else:
+            with galaxy_config(ctx, runnables, **kwds) as config:
+                return_value = run_in_config(ctx, config, **kwds)
 
     ctx.exit(return_value)
@@ -0,0 +1,63 @@
+"""Short help for each planemo command.
+
+Lets ``planemo --help`` list commands without importing them. Generated by
+``scripts/build_command_manifest.py`` (``make command-manifest``) - do not
+edit by hand.
+"""
+
+COMMANDS = {
+    "brew": "Install tool requirements using brew.",
+    "brew_env": "List commands to inject brew dependencies.",
+    "brew_init": "Download linuxbrew install & run it in ruby.",
+    "ci_find_repos": "Find all shed repositories in one or more...",
+    "ci_find_tools": "Find all tools in one or more directories.",
+    "clone": "Short-cut to quickly clone, fork, and...",
+    "conda_build": "Perform conda build with Planemo's conda.",
+    "conda_env": "Activate a conda environment for tool.",
+    "conda_init": "Download and install conda.",
+    "conda_install": "Install conda packages for tool requirements.",
+    "conda_lint": "Check conda recipe for common issues.",
+    "conda_search": "Perform conda search with Planemo's conda.",
+    "config_init": "Initialise global configuration for Planemo.",
+    "container_register": "Register multi-requirement containers as...",
+    "create_gist": "Upload file to GitHub as a sharable gist.",
+    "database_create": "Create a *development* database.",
+    "database_delete": "Delete a *development* database.",
+    "database_list": "List databases in configured database source.",
+    "dependency_script": "Compile tool_dependencies.xml to bash script.",
+    "docker_build": "Build (and optionally cache) Docker images.",
+    "docker_shell": "Launch shell in Docker container for a tool.",
+    "docs": "Open Planemo documentation in web browser.",
+    "lint": "Check for common errors and best practices.",
+    "mull": "Build containers for specified tools.",
+    "mulled_init": "Download and install involucro for mull...",
+    "normalize": "Generate normalized tool XML from input.",
+    "open": "Open latest Planemo test results in a web...",
+    "pool_clear": "Stop and delete Galaxy servers in the warm...",
+    "pool_list": "List Galaxy servers in the warm server pool.",
+    "profile_create": "Create a profile.",
+    "profile_delete": "Delete a profile.",
+    "profile_list": "List configured profile names.",
+    "project_init": "(Experimental) Initialize a new tool project.",
+    "pull_request": "Short-cut to quickly create a pull request...",
+    "serve": "Launch Galaxy instance with specified tools.",
+    "share_test": "Publish JSON test results as sharable Gist.",
+    "shed_build": "Create a Galaxy tool tarball.",
+    "shed_create": "Create a repository in a Galaxy Tool Shed.",
+    "shed_diff": "diff between local repository and Tool Shed.",
+    "shed_download": "Download tool from Tool Shed into directory.",
+    "shed_init": "Bootstrap new Tool Shed .shed.yml file.",
+    "shed_lint": "Check Tool Shed repository for common issues.",
+    "shed_serve": "Launch Galaxy with Tool Shed dependencies.",
+    "shed_test": "Run tests of published shed artifacts.",
+    "shed_update": "Update Tool Shed repository.",
+    "shed_upload": "Low-level command to upload tarballs.",
+    "syntax": "Open tool config syntax page in web browser.",
+    "test": "Run specified tool's tests within Galaxy.",
+    "test_reports": "Generate human readable tool test reports.",
+    "tool_factory": "(Experimental) Launch Galaxy with Tool...",
+    "tool_init": "Generate tool outline from given arguments.",
+    "travis_before_install": "Internal command for GitHub/TravisCI testing.",
+    "travis_init": "Create files to use GitHub/TravisCI testing.",
+    "virtualenv": "Create a virtualenv.",
+}
@@ -9,17 +9,26 @@ import collections
 import os
 import threading
 
+import requests
 from galaxy.tools.deps import conda_util
 
+from planemo.conda_index import (
+    CHANNELS_URL,
+    CondaPackageIndex,
+    DEFAULT_TTL,
+)
 from planemo.exit_codes import EXIT_CODE_FAILED_DEPENDENCIES, ExitCodeException
-from planemo.io import error, shell
-from planemo.tools import yield_tool_sources_on_paths
+from planemo.io import error, shell, warn
+from planemo.tools import yield_tool_summaries_on_paths
 
 MESSAGE_ERROR_FAILED_INSTALL = "Attempted to install conda and failed."
 MESSAGE_ERROR_CANNOT_INSTALL = "Cannot install Conda - perhaps due to a failed installation or permission problems."
 MESSAGE_ERROR_NOT_INSTALLING = "Conda not configured - run ``planemo conda_init`` or pass ``--conda_auto_init`` to continue."
 
 BEST_PRACTICE_CHANNELS = ["conda-forge", "anaconda", "r", "bioconda"]
+CONDA_INDEX_DIRECTORY = "conda_index"
+# Errors meaning the channel metadata of an index could not be loaded.
+INDEX_ERRORS = (requests.exceptions.RequestException, IOError, ValueError)
 
 
 def build_conda_context(ctx, **kwds):
@@ -76,7 +85,7 @@ def collect_conda_targets(ctx, paths, recursive=False, found_tool_callback=None,
         else:
             real_paths.append(path)
 
-    for (tool_path, tool_source) in yield_tool_sources_on_paths(ctx, real_paths, recursive=recursive):
+    for (tool_path, tool_source) in yield_tool_summaries_on_paths(ctx, real_paths, recursive=recursive):
         if found_tool_callback:
             found_tool_callback(tool_path)
         for target in tool_source_conda_targets(tool_source):
@@ -117,7 +126,7 @@ def collect_conda_target_lists_and_tool_paths(ctx, paths, recursive=False, found
     """
     conda_target_lists = set([])
     tool_paths = collections.defaultdict(list)
-    for (tool_path, tool_source) in yield_tool_sources_on_paths(ctx, paths, recursive=recursive, yield_load_errors=False):
+    for (tool_path, tool_source) in yield_tool_summaries_on_paths(ctx, paths, recursive=recursive, yield_load_errors=False):
         if found_tool_callback:
             found_tool_callback(tool_path)
         targets = frozenset(tool_source_conda_targets(tool_source))
@@ -137,25 +146,89 @@ def tool_source_conda_targets(tool_source):
     return conda_util.requirements_to_conda_targets(requirements)
 
 
-best_practice_search_first = threading.local()
+# Linters only receive the tool and lint context, so the index of best
+# practice channels used by best_practice_search is tracked at the module
+# level - the index last requested for a planemo context is reused.
+_best_practice_indices = {}
+_best_practice_index = None
+_best_practice_indices_lock = threading.Lock()
+# Indices that failed to load and have been warned about.
+_unavailable_indices = set()
+
+
+def best_practice_index(ctx=None):
+    """Return the :class:`CondaPackageIndex` of :data:`BEST_PRACTICE_CHANNELS`.
+
+    With a planemo context the channel metadata is stored in its workspace
+    and refreshed once older than ``conda_index_ttl`` seconds (settable in
+    ``~/.planemo.yml``, defaults to a day). Channels are downloaded from
+    ``conda_channels_url`` (defaults to https://conda.anaconda.org).
+    """
+    global _best_practice_index
+    directory = None
+    ttl = DEFAULT_TTL
+    channels_url = CHANNELS_URL
+    if ctx is not None and getattr(ctx, "planemo_directory", None):
+        directory = os.path.join(ctx.workspace, CONDA_INDEX_DIRECTORY)
+        ttl = int(ctx.global_config.get("conda_index_ttl", DEFAULT_TTL))
+        channels_url = ctx.global_config.get("conda_channels_url", CHANNELS_URL)
+    with _best_practice_indices_lock:
+        if ctx is None and _best_practice_index is not None:
+            return _best_practice_index
+        index = _best_practice_indices.get(directory, None)
+        if index is None or index.ttl != ttl or index.channels_url != channels_url.rstrip("/"):
+            index = _best_practice_indices[directory] = CondaPackageIndex(
+                BEST_PRACTICE_CHANNELS, directory=directory, ttl=ttl, channels_url=channels_url
+            )
+        if ctx is not None:
+            _best_practice_index = index
+        return index
+
+
+def load_best_practice_index(ctx):
+    """Load the :func:`best_practice_index` up front, e.g. before forking workers.
+
+    Returns ``False`` (after warning) if the channel metadata cannot be
+    downloaded - :func:`best_practice_search` then runs ``conda search``
+    without trying to download it again.
+    """
+    index = best_practice_index(ctx)
+    try:
+        index.load()
+    except INDEX_ERRORS as e:
+        _warn_index_unavailable(index, e)
+        return False
+    return True
+
 
+def best_practice_search(conda_target, ctx=None):
+    """Find the best hit for ``conda_target`` in best practice channels.
 
-def best_practice_search(conda_target):
-    # Call it in offline mode after the first time.
+    Searches the :func:`best_practice_index` and only falls back to running
+    ``conda search`` if the channel metadata cannot be downloaded.
+    """
+    index = best_practice_index(ctx)
     try:
-        best_practice_search_first.previously_called
-        # TODO: Undo this...
-        offline = False
-    except AttributeError:
-        best_practice_search_first.previously_called = True
-        offline = False
+        return index.best_search_result(conda_target)
+    except INDEX_ERRORS as e:
+        _warn_index_unavailable(index, e)
+        conda_context = build_conda_context(ctx) if ctx is not None else conda_util.CondaContext()
+        return conda_util.best_search_result(conda_target, conda_context, channels_override=BEST_PRACTICE_CHANNELS)
+
 
-    return conda_util.best_search_result(conda_target, channels_override=BEST_PRACTICE_CHANNELS, offline=offline)
+def _warn_index_unavailable(index, e):
+    with _best_practice_indices_lock:
+        if index in _unavailable_indices:
+            return
+        _unavailable_indices.add(index)
+    warn("Failed to load best practice Conda channel metadata (%s), running conda search instead." % e)
 
 
 __all__ = (
     "BEST_PRACTICE_CHANNELS",
+    "best_practice_index",
     "best_practice_search",
+    "load_best_practice_index",
     "build_conda_context",
     "collect_conda_targets",
     "collect_conda_target_lists",
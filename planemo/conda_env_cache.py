@@ -0,0 +1,250 @@
+"""Build Conda environments for tools in batches backed by a workspace cache.
+
+Galaxy's Conda dependency resolver expects all requirements of a tool in one
+environment named after them (see :func:`merged_environment_name`). Installing
+these one package or one tool at a time means Conda solves the same
+requirement sets over and over.
+
+:func:`build_environments` groups requirement lists by the set of packages
+they describe, solves each distinct set once and builds the environments of
+different sets concurrently. The solution - the explicit list of packages
+Conda installed - is stored in planemo's workspace keyed on a hash of the
+packages and channels, so further environments for the same set (e.g. for
+tools listing the requirements in another order, or in a fresh Conda prefix)
+are created without solving again. ``planemo test`` and ``serve`` use
+:func:`create_cached_environments` to restore environments from these
+solutions before Galaxy starts.
+"""
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+
+from galaxy.tools.deps import conda_util
+
+from planemo.conda import tool_source_conda_targets
+from planemo.io import (
+    coalesce_return_codes,
+    error,
+    info,
+)
+from planemo.tools import yield_tool_summaries_on_paths
+
+CONDA_ENV_CACHE_DIRECTORY = "conda_env_cache"
+CONDA_ENV_CACHE_VERSION = 1
+
+
+def merged_environment_name(conda_targets):
+    """Return the name Galaxy's Conda resolver gives the environment for ``conda_targets``."""
+    conda_targets = list(conda_targets)
+    if len(conda_targets) == 1:
+        return conda_targets[0].install_environment
+    # Mirrors galaxy-lib's hash_conda_packages, which fails on Python 3.
+    h = hashlib.new('sha256')
+    for conda_target in conda_targets:
+        h.update(conda_target.install_environment.encode("utf-8"))
+    return "mulled-v1-%s" % h.hexdigest()
+
+
+def tool_conda_target_lists(ctx, paths, recursive=False):
+    """Return the Conda targets of each tool in ``paths`` in requirement order."""
+    conda_target_lists = []
+    for (_, tool_source) in yield_tool_summaries_on_paths(ctx, paths, recursive=recursive, yield_load_errors=False):
+        conda_targets = list(tool_source_conda_targets(tool_source))
+        if conda_targets:
+            conda_target_lists.append(conda_targets)
+    return conda_target_lists
+
+
+class CondaEnvironmentCache(object):
+    """Explicit package lists of solved environments keyed on what was solved.
+
+    If ``directory`` is ``None`` nothing is cached and every distinct set of
+    targets is solved.
+    """
+
+    def __init__(self, directory, conda_context):
+        self.directory = directory
+        self.conda_context = conda_context
+
+    def key(self, conda_targets):
+        """Return the cache key for the set of ``conda_targets``."""
+        key_data = dict(
+            version=CONDA_ENV_CACHE_VERSION,
+            packages=sorted(set(t.package_specifier for t in conda_targets)),
+            channels=self.conda_context.ensure_channels or [],
+            use_local=bool(self.conda_context.use_local),
+            platform=sys.platform,
+        )
+        return hashlib.sha1(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def explicit_path(self, conda_targets):
+        """Return the path of the cached solution for ``conda_targets`` or ``None``."""
+        path = self._entry_path(conda_targets)
+        if path is None or not os.path.exists(path):
+            return None
+        return path
+
+    def store(self, conda_targets, env_name):
+        """Store the packages installed in ``env_name`` as the solution for ``conda_targets``."""
+        path = self._entry_path(conda_targets)
+        if path is None:
+            return
+        parent = os.path.dirname(path)
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        tmp_path = "%s.%d.%d.tmp" % (path, os.getpid(), threading.current_thread().ident)
+        with open(tmp_path, "w") as stdout:
+            exit_code = _exec_conda(self.conda_context, "list", [
+                "--name", env_name, "--explicit",
+            ], stdout=stdout)
+        if exit_code == 0:
+            os.rename(tmp_path, path)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def create(self, conda_targets, env_name):
+        """Create ``env_name`` from the cached solution, return an exit code."""
+        path = self.explicit_path(conda_targets)
+        if path is None:
+            return 1
+        exit_code = self.conda_context.exec_command("create", [
+            "-y", "--name", env_name, "--file", path,
+        ])
+        if exit_code != 0:
+            conda_util.cleanup_failed_install_of_environment(env_name, conda_context=self.conda_context)
+        return exit_code
+
+    def _entry_path(self, conda_targets):
+        if self.directory is None:
+            return None
+        key = self.key(conda_targets)
+        return os.path.join(self.directory, key[0:2], "%s.txt" % key)
+
+
+def conda_environment_cache(ctx, conda_context):
+    """Return the :class:`CondaEnvironmentCache` in ``ctx``'s planemo workspace."""
+    directory = None
+    if ctx is not None and getattr(ctx, "planemo_directory", None):
+        directory = os.path.join(ctx.workspace, CONDA_ENV_CACHE_DIRECTORY)
+    return CondaEnvironmentCache(directory, conda_context)
+
+
+def build_environments(ctx, conda_target_lists, conda_context, jobs=1, cache=None):
+    """Build the Galaxy Conda environment for each of ``conda_target_lists``.
+
+    Each distinct set of targets is solved at most once - environments for
+    sets solved before (by this or an earlier planemo command) are created
+    from the solution stored in the workspace. Sets are processed by ``jobs``
+    threads. Returns an exit code.
+    """
+    if cache is None:
+        cache = conda_environment_cache(ctx, conda_context)
+    tasks = [(cache, conda_targets, env_names) for (conda_targets, env_names) in _group_environments(conda_target_lists)]
+    if not tasks:
+        return 0
+    if not jobs or jobs < 2:
+        return_codes = [_build_set(task) for task in tasks]
+    else:
+        pool = ThreadPool(min(jobs, len(tasks)))
+        try:
+            return_codes = pool.map(_build_set, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    return coalesce_return_codes(return_codes)
+
+
+def create_cached_environments(ctx, tool_paths, conda_context):
+    """Create missing environments for tools in ``tool_paths`` from cached solutions.
+
+    Never solves - environments for sets without a stored solution are left
+    for Galaxy to install.
+    """
+    cache = conda_environment_cache(ctx, conda_context)
+    if cache.directory is None or not os.path.isdir(conda_context.conda_prefix):
+        return
+    conda_target_lists = tool_conda_target_lists(ctx, tool_paths, recursive=True)
+    for conda_targets, env_names in _group_environments(conda_target_lists):
+        if cache.explicit_path(conda_targets) is None:
+            continue
+        for env_name in env_names:
+            if not conda_context.has_env(env_name):
+                info("Creating Conda environment %s from cached solution." % env_name)
+                cache.create(conda_targets, env_name)
+
+
+def _exec_conda(conda_context, operation, args, stdout):
+    # CondaContext.exec_command quotes its arguments and cannot redirect
+    # output in all supported galaxy-lib versions, so run conda directly.
+    argv = [conda_context.conda_exec, operation] + list(args)
+    env = None
+    condarc_override = getattr(conda_context, "condarc_override", None)
+    if condarc_override:
+        env = os.environ.copy()
+        env["CONDARC"] = condarc_override
+    return subprocess.Popen(argv, stdout=stdout, env=env).wait()
+
+
+def _group_environments(conda_target_lists):
+    # Group environment names by the set of targets they hold, keeping
+    # the order sets and names were first seen in.
+    groups = []
+    groups_by_set = {}
+    for conda_targets in conda_target_lists:
+        target_set = frozenset(conda_targets)
+        if target_set not in groups_by_set:
+            groups_by_set[target_set] = (list(conda_targets), [])
+            groups.append(groups_by_set[target_set])
+        env_names = groups_by_set[target_set][1]
+        env_name = merged_environment_name(conda_targets)
+        if env_name not in env_names:
+            env_names.append(env_name)
+    return groups
+
+
+def _build_set(args):
+    cache, conda_targets, env_names = args
+    conda_context = cache.conda_context
+    missing = [n for n in env_names if not conda_context.has_env(n)]
+    if not missing:
+        return 0
+
+    existing = [n for n in env_names if n not in missing]
+    if cache.explicit_path(conda_targets) is None:
+        if existing:
+            cache.store(conda_targets, existing[0])
+        else:
+            env_name = missing.pop(0)
+            info("Solving and installing Conda environment %s." % env_name)
+            exit_code = conda_util.install_conda_targets(conda_targets, conda_context, env_name=env_name)
+            if exit_code != 0 or not conda_context.has_env(env_name):
+                conda_util.cleanup_failed_install_of_environment(env_name, conda_context=conda_context)
+                error("Failed to install Conda environment %s." % env_name)
+                return 1
+            cache.store(conda_targets, env_name)
+
+    return_codes = [0]
+    for env_name in missing:
+        if cache.explicit_path(conda_targets) is not None:
+            info("Creating Conda environment %s from cached solution." % env_name)
+            exit_code = cache.create(conda_targets, env_name)
+        else:
+            exit_code = conda_util.install_conda_targets(conda_targets, conda_context, env_name=env_name)
+        if exit_code != 0:
+            error("Failed to install Conda environment %s." % env_name)
+        return_codes.append(exit_code)
+    return coalesce_return_codes(return_codes)
+
+
+__all__ = (
+    "build_environments",
+    "conda_environment_cache",
+    "CondaEnvironmentCache",
+    "create_cached_environments",
+    "merged_environment_name",
+    "tool_conda_target_lists",
+)
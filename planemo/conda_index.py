@@ -0,0 +1,216 @@
+"""Search Conda channels for packages without running ``conda search``.
+
+A :class:`CondaPackageIndex` downloads the package metadata
+(``repodata.json``) of each channel for the current platform and ``noarch``
+once - concurrently, over one pooled HTTP session - keeps a compact map from
+package names to available versions in memory and optionally stores it in a
+JSON file per channel, which is reused by later indices until it expires.
+Searching the index is then a dictionary lookup rather than a ``conda
+search`` subprocess per package.
+"""
+import bz2
+import json
+import os
+import sys
+import threading
+import time
+from distutils.version import LooseVersion
+from multiprocessing.pool import ThreadPool
+
+import requests
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_TIMEOUT = 120
+DEFAULT_THREADS = 4
+CHANNELS_URL = "https://conda.anaconda.org"
+NOARCH_SUBDIR = "noarch"
+
+
+class CondaPackageIndex(object):
+    """Versions of every package in ``channels``, cached in memory and optionally in ``directory``."""
+
+    def __init__(
+        self,
+        channels,
+        directory=None,
+        ttl=DEFAULT_TTL,
+        subdirs=None,
+        timeout=DEFAULT_TIMEOUT,
+        threads=DEFAULT_THREADS,
+        channels_url=CHANNELS_URL,
+    ):
+        self.channels = list(channels)
+        self.directory = directory
+        self.ttl = ttl
+        self.subdirs = subdirs or [conda_subdir(), NOARCH_SUBDIR]
+        self.timeout = timeout
+        self.threads = threads
+        self.channels_url = channels_url.rstrip("/")
+        self._session = None
+        self._lock = threading.Lock()
+        self._packages = None
+        self._loaded_time = None
+        self.load_error = None
+
+    def search(self, package):
+        """Return search hits (dictionaries like ``conda search --json`` ones) for ``package``."""
+        return self.load().get(package, [])
+
+    def best_search_result(self, conda_target):
+        """Find the best hit for a ``CondaTarget`` like ``conda_util.best_search_result``.
+
+        Return a ``(hit, exact)`` pair or ``(None, None)`` if no package matches.
+        """
+        hits = _sorted_by_version(self.search(conda_target.package))
+        if not hits:
+            return (None, None)
+
+        for hit in hits:
+            if not conda_target.version or hit["version"] == conda_target.version:
+                return (hit, True)
+        return (hits[0], False)
+
+    def load(self):
+        """Return the map from package names to search hits, refreshing expired metadata.
+
+        If the metadata cannot be loaded, the error is stored in ``load_error``
+        and raised again by later calls without downloading anything - so an
+        offline index fails fast rather than once per search.
+        """
+        with self._lock:
+            if self.load_error is not None:
+                raise self.load_error
+            if self._packages is None or self._expired(self._loaded_time):
+                sources = [(c, s) for c in self.channels for s in self.subdirs]
+                try:
+                    all_channel_packages = self._all_channel_packages(sources)
+                except (requests.exceptions.RequestException, IOError, ValueError) as e:
+                    self.load_error = e
+                    raise
+                packages = {}
+                for (channel, _), channel_packages in zip(sources, all_channel_packages):
+                    for name, versions in channel_packages.items():
+                        hits = packages.setdefault(name, [])
+                        for version, build, build_number in versions:
+                            hits.append(dict(
+                                name=name,
+                                version=version,
+                                build=build,
+                                build_number=build_number,
+                                channel=channel,
+                            ))
+                self._packages = packages
+                self._loaded_time = time.time()
+            return self._packages
+
+    def _all_channel_packages(self, sources):
+        if self._session is None:
+            self._session = pooled_session(self.threads)
+        threads = min(self.threads, len(sources))
+        if threads <= 1:
+            return [self._channel_packages(*s) for s in sources]
+        pool = ThreadPool(threads)
+        try:
+            return pool.map(lambda s: self._channel_packages(*s), sources)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _channel_packages(self, channel, subdir):
+        cache_path = self._cache_path(channel, subdir)
+        cached = self._read(cache_path)
+        if cached is not None and not self._expired(cached["time"]):
+            return cached["packages"]
+        try:
+            packages = self._fetch(channel, subdir)
+        except (requests.exceptions.RequestException, IOError, ValueError):
+            if cached is not None:
+                # Expired metadata beats none at all when offline.
+                return cached["packages"]
+            raise
+        self._write(cache_path, dict(time=time.time(), packages=packages))
+        return packages
+
+    def _fetch(self, channel, subdir):
+        url = "%s/%s/%s/repodata.json.bz2" % (self.channels_url, channel, subdir)
+        response = self._session.get(url, timeout=self.timeout)
+        if response.status_code == 404:
+            # Not all channels have packages for every subdir.
+            return {}
+        response.raise_for_status()
+        repodata = json.loads(bz2.decompress(response.content).decode("utf-8"))
+        return compact_repodata(repodata)
+
+    def _cache_path(self, channel, subdir):
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, "%s_%s.json" % (channel.replace("/", "_"), subdir))
+
+    def _read(self, cache_path):
+        if cache_path is None or not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, "r") as f:
+                return json.load(f)
+        except Exception:
+            # A corrupt cache just means downloading the metadata again.
+            return None
+
+    def _write(self, cache_path, entry):
+        if cache_path is None:
+            return
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            tmp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError):
+            pass
+
+    def _expired(self, loaded_time):
+        return time.time() - loaded_time > self.ttl
+
+
+def pooled_session(connections):
+    """Return a ``requests.Session`` allowing ``connections`` concurrent connections per host."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def compact_repodata(repodata):
+    """Reduce a channel's ``repodata.json`` to package names and their distinct builds."""
+    packages = {}
+    for record in repodata.get("packages", {}).values():
+        build = [record["version"], record.get("build", ""), record.get("build_number", 0)]
+        builds = packages.setdefault(record["name"], [])
+        if build not in builds:
+            builds.append(build)
+    return packages
+
+
+def conda_subdir():
+    """Return the Conda subdir (e.g. ``linux-64``) of the current platform."""
+    system = {"darwin": "osx", "win32": "win"}.get(sys.platform, "linux")
+    bits = "64" if sys.maxsize > 2 ** 32 else "32"
+    return "%s-%s" % (system, bits)
+
+
+def _sorted_by_version(hits):
+    try:
+        return sorted(hits, key=lambda hit: LooseVersion(hit["version"]), reverse=True)
+    except TypeError:
+        # Python 3 cannot compare mixed numeric and textual version parts.
+        return sorted(hits, key=lambda hit: hit["version"], reverse=True)
+
+
+__all__ = (
+    "compact_repodata",
+    "conda_subdir",
+    "CondaPackageIndex",
+    "pooled_session",
+)
@@ -0,0 +1,121 @@
+"""Look up BioContainers registry state for the ``container_register`` command.
+
+Registering multi-package containers for a large tool repository means
+checking thousands of image names against quay.io and open pull requests
+against the registry repository on GitHub. :class:`RegistryLookups` performs
+these checks concurrently over a pooled HTTP session, fetching each distinct
+quay.io repository once, and :class:`PullRequestTitleIndex` answers whether
+a pull request for an image is open from the titles fetched once.
+"""
+import re
+from multiprocessing.pool import ThreadPool
+
+import requests
+
+from planemo.conda_index import pooled_session
+
+QUAY_API_URL = "https://quay.io/api/v1"
+GITHUB_API_URL = "https://api.github.com"
+DEFAULT_THREADS = 8
+DEFAULT_TIMEOUT = 30
+# Responses meaning quay.io could not answer rather than that a repository is missing.
+UNAVAILABLE_STATUS_CODES = [429, 500, 502, 503, 504]
+MULLED_NAME_PATTERN = re.compile(r"mulled-v2-[0-9a-f]+(?::[0-9a-f]+)?")
+
+
+class RegistryLookups(object):
+    """Query quay.io and GitHub with up to ``threads`` concurrent requests."""
+
+    def __init__(
+        self,
+        quay_api_url=QUAY_API_URL,
+        github_api_url=GITHUB_API_URL,
+        github_auth=None,
+        threads=DEFAULT_THREADS,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.quay_api_url = quay_api_url.rstrip("/")
+        self.github_api_url = github_api_url.rstrip("/")
+        self.github_auth = github_auth
+        self.threads = threads
+        self.timeout = timeout
+        self._session = pooled_session(threads)
+
+    def quay_repositories(self, namespace, names):
+        """Return a dictionary of quay.io repository descriptions keyed on ``names``.
+
+        Repositories that do not exist are described by an empty dictionary
+        or an ``error_type``, like ``quay_repository`` in galaxy-lib. Names
+        quay.io could not be asked about are mapped to ``None``.
+        """
+        unique_names = sorted(set(names))
+        threads = min(self.threads, len(unique_names))
+        if threads <= 1:
+            repositories = [self.quay_repository(namespace, n) for n in unique_names]
+        else:
+            pool = ThreadPool(threads)
+            try:
+                repositories = pool.map(lambda n: self.quay_repository(namespace, n), unique_names)
+            finally:
+                pool.close()
+                pool.join()
+        return dict(zip(unique_names, repositories))
+
+    def quay_repository(self, namespace, name):
+        """Return the quay.io description of repository ``namespace/name``.
+
+        Returns ``None`` rather than a description of a missing repository if
+        quay.io could not answer - e.g. it is unreachable, failing or rate
+        limiting requests.
+        """
+        url = "%s/repository/%s/%s" % (self.quay_api_url, namespace, name)
+        try:
+            response = self._session.get(url, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            return None
+        try:
+            repository = response.json()
+        except ValueError:
+            repository = None
+        if response.status_code == 404:
+            return repository if isinstance(repository, dict) else {}
+        if not isinstance(repository, dict) or response.status_code in UNAVAILABLE_STATUS_CODES:
+            return None
+        if response.ok or "error_type" in repository:
+            return repository
+        return None
+
+    def open_pull_request_titles(self, repository):
+        """Return the titles of all open pull requests against GitHub ``repository``."""
+        titles = []
+        url = "%s/repos/%s/pulls" % (self.github_api_url, repository)
+        params = dict(state="open", per_page=100)
+        while url:
+            response = self._session.get(url, params=params, auth=self.github_auth, timeout=self.timeout)
+            response.raise_for_status()
+            titles.extend(pr["title"] for pr in response.json())
+            # The next page URL already carries the query parameters.
+            url = response.links.get("next", {}).get("url")
+            params = None
+        return titles
+
+
+class PullRequestTitleIndex(object):
+    """Image names mentioned in pull request titles."""
+
+    def __init__(self, titles):
+        self.names = set()
+        for title in titles:
+            for name in MULLED_NAME_PATTERN.findall(title):
+                self.names.add(name)
+                # A title for a tagged image covers the untagged name too.
+                self.names.add(name.split(":", 1)[0])
+
+    def __contains__(self, name):
+        return name in self.names
+
+
+__all__ = (
+    "PullRequestTitleIndex",
+    "RegistryLookups",
+)
@@ -9,10 +9,12 @@ class DatabaseSource(object):
     __metaclass__ = abc.ABCMeta
 
     @abc.abstractmethod
-    def create_database(self, identifier):
+    def create_database(self, identifier, template=None):
         """Create a database with specified short identifier.
 
-        Throw an exception if it already exists.
+        If ``template`` is specified, the new database is a copy of the
+        database with that identifier. Throw an exception if it already
+        exists.
         """
 
     @abc.abstractmethod
@@ -1,6 +1,9 @@
 """Module contianing the :class:`CwlToolEngine` implementation of :class:`Engine`."""
 
+from multiprocessing import Pool
+
 from planemo import cwl
+from planemo.cli import Context
 from planemo.runnable import RunnableType
 
 from .interface import BaseEngine
@@ -19,6 +22,41 @@ class CwlToolEngine(BaseEngine):
         path = runnable.path
         return cwl.run_cwltool(self._ctx, path, job_path, **self._kwds)
 
+    def _map_test_cases(self, test_cases, parallel):
+        """Run each test case in its own cwltool process.
+
+        cwltool is executed in-process and swaps out standard streams so
+        threads cannot be used to run test cases concurrently. Only the
+        workspace settings of the context are sent to the worker processes,
+        each of which rebuilds its own context from them.
+        """
+        ctx_settings = _context_settings(self._ctx)
+        args = [(ctx_settings, self._kwds, test_case) for test_case in test_cases]
+        pool = Pool(min(parallel, len(test_cases)))
+        try:
+            for test_result in pool.imap(_run_test_case_in_process, args):
+                yield test_result
+        finally:
+            pool.close()
+            pool.join()
+
+
+def _context_settings(ctx):
+    return {
+        "home": ctx.home,
+        "verbose": ctx.verbose,
+        "planemo_config": ctx.planemo_config,
+        "planemo_directory": ctx.planemo_directory,
+    }
+
+
+def _run_test_case_in_process(args):
+    ctx_settings, kwds, test_case = args
+    ctx = Context()
+    for key, value in ctx_settings.items():
+        setattr(ctx, key, value)
+    return CwlToolEngine(ctx, **kwds)._run_test_case(test_case)
+
 
 __all__ = (
     "CwlToolEngine",
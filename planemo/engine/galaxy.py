@@ -3,6 +3,8 @@
 import contextlib
 
 from planemo.galaxy.activity import execute
+from planemo.galaxy.config import galaxy_version_id
+from planemo.galaxy.pool import leased_galaxy
 from planemo.galaxy.serve import serve_daemon
 from planemo.runnable import RunnableType
 
@@ -21,23 +23,75 @@ class GalaxyEngine(BaseEngine):
         RunnableType.galaxy_tool
     ]
 
+    def __init__(self, ctx, **kwds):
+        """Store context and kwds and track the Galaxy served for a test session."""
+        super(GalaxyEngine, self).__init__(ctx, **kwds)
+        self._session_config = None
+
     def _run(self, runnable, job_path):
         """Run CWL job in Galaxy."""
-        self._ctx.vlog("Serving artifact [%s] with Galaxy." % (runnable,))
-        with self._serve([runnable]) as config:
+        with self.ensure_runnables_served([runnable]) as config:
             self._ctx.vlog("Running job path [%s]" % job_path)
             run_response = execute(config, runnable, job_path, **self._kwds)
 
         return run_response
 
+    def _collect_test_results(self, test_cases, callback=None):
+        """Serve all runnables in one Galaxy and run every test case against it.
+
+        Each test case still runs in its own history, but Galaxy is only
+        started and stopped once for the whole session.
+        """
+        if not test_cases:
+            return []
+
+        runnables = []
+        for test_case in test_cases:
+            if test_case.runnable not in runnables:
+                runnables.append(test_case.runnable)
+
+        with self.ensure_runnables_served(runnables) as config:
+            # Fetch the user API key before test cases may be run concurrently.
+            config.user_gi
+            self._session_config = config
+            try:
+                return super(GalaxyEngine, self)._collect_test_results(test_cases, callback=callback)
+            finally:
+                self._session_config = None
+
+    @contextlib.contextmanager
+    def ensure_runnables_served(self, runnables):
+        """Yield a Galaxy config serving runnables - reusing the session Galaxy if active."""
+        session_config = self._session_config
+        if session_config is not None:
+            unserved = [r for r in runnables if r not in session_config.runnables]
+            if unserved:
+                raise Exception("Runnables [%s] not served by active Galaxy session." % unserved)
+            yield session_config
+        else:
+            self._ctx.vlog("Serving artifacts [%s] with Galaxy." % (runnables,))
+            with self._serve(runnables) as config:
+                yield config
+
     @contextlib.contextmanager
     def _serve(self, runnables):
-        with serve_daemon(self._ctx, runnables, **self._serve_kwds()) as config:
+        serve_kwds = self._serve_kwds()
+        if serve_kwds.get("galaxy_pool", False) and not serve_kwds.get("dockerize", False):
+            serve_context = leased_galaxy
+        else:
+            serve_context = serve_daemon
+        with serve_context(self._ctx, runnables, **serve_kwds) as config:
             yield config
 
     def _serve_kwds(self):
         return self._kwds.copy()
 
+    def _cache_engine_id(self):
+        galaxy_version = galaxy_version_id(self._ctx, **self._kwds)
+        if galaxy_version is None:
+            return None
+        return "%s:%s" % (self.__class__.__name__, galaxy_version)
+
 
 class DockerizedGalaxyEngine(GalaxyEngine):
     """An :class:`Engine` implementation backed by Galaxy running in Docker.
@@ -50,6 +104,11 @@ class DockerizedGalaxyEngine(GalaxyEngine):
         serve_kwds["dockerize"] = True
         return serve_kwds
 
+    def _cache_engine_id(self):
+        # The Galaxy version is determined by the Docker image, which
+        # planemo does not pin - never reuse cached results.
+        return None
+
 
 __all__ = (
     "GalaxyEngine",
@@ -4,6 +4,8 @@ import abc
 import json
 import os
 import tempfile
+import time
+from multiprocessing.pool import ThreadPool
 
 from planemo.exit_codes import EXIT_CODE_UNSUPPORTED_FILE_TYPE
 from planemo.io import error
@@ -11,7 +13,12 @@ from planemo.runnable import (
     cases,
     for_path,
 )
-from planemo.test.results import StructuredData
+from planemo.test.cache import TestResultCache
+from planemo.test.results import (
+    JSON_LINES_EXTENSION,
+    StructuredData,
+    StructuredDataWriter,
+)
 
 
 class Engine(object):
@@ -77,13 +84,65 @@ class BaseEngine(Engine):
 
     def test(self, runnables):
         """Test runnable artifacts (workflow or tool)."""
+        runnables = list(runnables)
         self._check_can_run_all(runnables)
-        test_cases = [t for tl in map(cases, runnables) for t in tl]
-        test_results = self._collect_test_results(test_cases)
-        tests = []
-        for (test_case, run_response) in test_results:
+        test_cache = self._test_cache()
+        tests_by_runnable, cache_keys, uncached_runnables = self._cached_tests(runnables, test_cache)
+
+        # JSON-lines results are written as each test finishes rather than
+        # being collected in memory (unless they must be cached).
+        writer = self._structured_data_writer()
+        if writer is not None:
+            writer = _RunnableOrderWriter(writer, runnables, uncached_runnables, tests_by_runnable)
+
+        def record(test_result):
+            test_case, run_response = test_result
             test_case_data = test_case.structured_test_data(run_response)
-            tests.append(test_case_data)
+            if writer is not None:
+                writer.write_test(test_case.runnable, test_case_data)
+            if writer is None or test_cache is not None:
+                tests_by_runnable[test_case.runnable].append(test_case_data)
+
+        test_cases = [t for tl in map(cases, uncached_runnables) for t in tl]
+        try:
+            self._collect_test_results(test_cases, callback=record)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if test_cache is not None:
+            for runnable in uncached_runnables:
+                test_cache.put(runnable, tests_by_runnable[runnable], key=cache_keys[runnable])
+
+        return self._structured_results(runnables, tests_by_runnable, writer)
+
+    def _cached_tests(self, runnables, test_cache):
+        """Find cached tests for runnables and the runnables that need testing."""
+        tests_by_runnable = {}
+        cache_keys = {}
+        uncached_runnables = []
+        for runnable in runnables:
+            cached_tests = None
+            if test_cache is not None:
+                cache_keys[runnable] = test_cache.key(runnable)
+                cached_tests = test_cache.get(runnable, key=cache_keys[runnable])
+            if cached_tests is not None:
+                self._ctx.vlog("Using cached test results for [%s]" % runnable.path)
+                tests_by_runnable[runnable] = cached_tests
+            else:
+                tests_by_runnable[runnable] = []
+                uncached_runnables.append(runnable)
+        return tests_by_runnable, cache_keys, uncached_runnables
+
+    def _structured_results(self, runnables, tests_by_runnable, writer):
+        if writer is not None:
+            structured_results = StructuredData(json_path=writer.json_path)
+            structured_results.calculate_summary_data()
+            # Appends the summary to the JSON-lines file.
+            structured_results.update()
+            return structured_results
+
+        tests = [t for r in runnables for t in tests_by_runnable[r]]
         test_data = {
             'version': '0.1',
             'tests': tests,
@@ -92,45 +151,136 @@ class BaseEngine(Engine):
         structured_results.calculate_summary_data()
         return structured_results
 
-    def _collect_test_results(self, test_cases):
-        test_results = []
-        for test_case in test_cases:
-            self._ctx.vlog(
-                "Running tests %s" % test_case
-            )
-            runnable = test_case.runnable
-            job_path = test_case.job_path
-            tmp_path = None
-            if job_path is None:
-                job = test_case.job
-                f = tempfile.NamedTemporaryFile(
-                    dir=test_case.tests_directory,
-                    suffix=".json",
-                    prefix="plnmotmptestjob",
-                    delete=False,
-                )
-                tmp_path = f.name
-                job_path = tmp_path
-                json.dump(job, f)
-                f.close()
-            try:
-                run_response = self._run(runnable, job_path)
-            finally:
-                if tmp_path:
-                    os.remove(tmp_path)
+    def _structured_data_writer(self):
+        """Return a :class:`StructuredDataWriter` if tests should be streamed to JSON lines."""
+        json_path = self._kwds.get("test_output_json", None)
+        if not json_path or not json_path.endswith(JSON_LINES_EXTENSION):
+            return None
+        return StructuredDataWriter(json_path)
+
+    def _test_cache(self):
+        """Return a :class:`TestResultCache` if test result caching is enabled."""
+        if not self._kwds.get("test_cache", False):
+            return None
+        engine_id = self._cache_engine_id()
+        if engine_id is None:
+            self._ctx.vlog("Engine version cannot be determined, not caching test results.")
+            return None
+        cache_directory = os.path.join(self._ctx.workspace, "test_cache")
+        return TestResultCache(cache_directory, engine_id, **self._kwds)
+
+    def _cache_engine_id(self):
+        """Describe the engine results are cached for - results are not shared across engines.
+
+        Return ``None`` if results for this engine should not be cached.
+        """
+        return self.__class__.__name__
+
+    def _collect_test_results(self, test_cases, callback=None):
+        """Run test cases and return ``(test_case, run_response)`` pairs in test case order.
+
+        If set, ``callback`` is called with each pair as soon as it is available.
+        """
+        parallel = self._kwds.get("parallel", None) or 1
+        if parallel > 1 and len(test_cases) > 1:
             self._ctx.vlog(
-                "Test case [%s] resulted in run response [%s]",
-                test_case,
-                run_response,
+                "Running %d test cases with %d workers" % (len(test_cases), parallel)
             )
-            test_results.append((test_case, run_response))
+            results = self._map_test_cases(test_cases, parallel)
+        else:
+            results = (self._run_test_case(test_case) for test_case in test_cases)
+        test_results = []
+        for test_result in results:
+            if callback is not None:
+                callback(test_result)
+            test_results.append(test_result)
         return test_results
 
+    def _map_test_cases(self, test_cases, parallel):
+        """Run test cases concurrently and yield results in test case order.
+
+        Engines default to a pool of threads, subclasses may override this to
+        use separate processes instead.
+        """
+        pool = ThreadPool(min(parallel, len(test_cases)))
+        try:
+            for test_result in pool.imap(self._run_test_case, test_cases):
+                yield test_result
+        finally:
+            pool.close()
+            pool.join()
+
+    def _run_test_case(self, test_case):
+        self._ctx.vlog(
+            "Running tests %s" % test_case
+        )
+        runnable = test_case.runnable
+        job_path = test_case.job_path
+        tmp_path = None
+        if job_path is None:
+            job = test_case.job
+            f = tempfile.NamedTemporaryFile(
+                dir=test_case.tests_directory,
+                suffix=".json",
+                prefix="plnmotmptestjob",
+                delete=False,
+            )
+            tmp_path = f.name
+            job_path = tmp_path
+            json.dump(job, f)
+            f.close()
+        start = time.time()
+        try:
+            run_response = self._run(runnable, job_path)
+        finally:
+            if tmp_path:
+                os.remove(tmp_path)
+        run_response.time_seconds = time.time() - start
+        self._ctx.vlog(
+            "Test case [%s] resulted in run response [%s]",
+            test_case,
+            run_response,
+        )
+        return (test_case, run_response)
+
     def _process_test_results(self, test_results):
         for (test_case, run_response) in test_results:
             pass
 
 
+class _RunnableOrderWriter(object):
+    """Wrap a :class:`StructuredDataWriter` to keep cached results in runnable order.
+
+    Cached results of a runnable are written once results for a later
+    runnable arrive (or on close), rather than all up front.
+    """
+
+    def __init__(self, writer, runnables, uncached_runnables, tests_by_runnable):
+        self.json_path = writer.json_path
+        self._writer = writer
+        self._runnables = runnables
+        self._runnable_indices = dict((r, i) for (i, r) in enumerate(runnables))
+        self._cached_runnables = set(runnables) - set(uncached_runnables)
+        self._tests_by_runnable = tests_by_runnable
+        self._next_index = 0
+
+    def write_test(self, runnable, test):
+        self._write_cached(self._runnable_indices[runnable])
+        self._writer.write_test(test)
+
+    def close(self):
+        self._write_cached(len(self._runnables))
+        self._writer.close()
+
+    def _write_cached(self, until_index):
+        while self._next_index < until_index:
+            runnable = self._runnables[self._next_index]
+            if runnable in self._cached_runnables:
+                for test in self._tests_by_runnable[runnable]:
+                    self._writer.write_test(test)
+            self._next_index += 1
+
+
 __all__ = (
     "Engine",
     "BaseEngine",
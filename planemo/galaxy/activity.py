@@ -1,22 +1,25 @@
 """Module provides generic interface to running Galaxy tools and workflows."""
 
+import copy
 import json
 import os
 import tempfile
+from multiprocessing.pool import ThreadPool
 
 from bioblend.galaxy.client import Client
-from galaxy.tools.parser import get_tool_source
 from six import iteritems
 
-from planemo.io import wait_on
 from planemo.runnable import (
     ErrorRunResponse,
     get_outputs,
     RunnableType,
     SuccessfulRunResponse,
 )
+from planemo.tool_cache import load_tool_source
+from .watcher import DEFAULT_TIMEOUT
 
 DEFAULT_HISTORY_NAME = "CWL Target History"
+DEFAULT_DOWNLOAD_THREADS = 4
 ERR_NO_SUCH_TOOL = ("Failed to find tool with ID [%s] in Galaxy - cannot execute job. "
                     "You may need to enable verbose logging and determine why the tool did not load. [%s]")
 
@@ -58,7 +61,7 @@ def _execute(config, runnable, job_path, **kwds):
 
         job = tool_run_response["jobs"][0]
         job_id = job["id"]
-        final_state = _wait_for_job(user_gi, job_id)
+        final_state = _wait_for_job(config, job_id, **kwds)
         if final_state != "ok":
             msg = "Failed to run CWL job final job state is [%s]." % final_state
             with open("errored_galaxy.log", "w") as f:
@@ -93,8 +96,8 @@ def _execute(config, runnable, job_path, **kwds):
         )
         invocation = Client._post(user_gi.workflows, payload, url=invocations_url)
         invocation_id = invocation["id"]
-        _wait_for_invocation(user_gi, workflow_id, invocation_id)
-        final_state = _wait_for_history(user_gi, history_id)
+        _wait_for_invocation(config, workflow_id, invocation_id, **kwds)
+        final_state = _wait_for_history(config, history_id, **kwds)
         if final_state != "ok":
             msg = "Failed to run CWL job final job state is [%s]." % final_state
             with open("errored_galaxy.log", "w") as f:
@@ -121,19 +124,36 @@ def _execute(config, runnable, job_path, **kwds):
 
 
 def stage_in(config, user_gi, history_id, job_path, **kwds):
-
-    # Figure out what "." should be here instead.
-    def upload(file_path):
-        return user_gi.tools.upload_file(file_path, history_id)
-
     with open(job_path, "r") as f:
         job = json.load(f)
 
+    # Figure out what "." should be here instead.
     job_dir = os.path.dirname(job_path)
+
+    # Find every file the job needs first so they can be staged together.
+    file_paths = []
+
+    def record(file_path):
+        file_paths.append(file_path)
+        return {"outputs": [{"id": None}]}
+
+    galactic_job_json(copy.deepcopy(job), job_dir, record)
+    link = kwds.get("link_inputs", False) and config.shares_filesystem
+    staged = config.dataset_stager.stage(
+        user_gi,
+        history_id,
+        file_paths,
+        admin_gi=config.gi if link else None,
+        link=link,
+    )
+
+    def upload(file_path):
+        return {"outputs": [staged[file_path]]}
+
     job_dict, datasets = galactic_job_json(job, job_dir, upload)
 
     if datasets:
-        final_state = _wait_for_history(user_gi, history_id)
+        final_state = _wait_for_history(config, history_id, **kwds)
     else:
         # Mark uploads as ok because nothing to do.
         final_state = "ok"
@@ -185,8 +205,7 @@ class GalaxyBaseRunResponse(SuccessfulRunResponse):
             # configuration.
             output_directory = tempfile.mkdtemp()
 
-        for output in get_outputs(self._runnable):
-            output_id = output.get_id()
+        def collect_output(output):
             dataset = self.get_dataset_metadata(output)
             destination = self.download_output_to(output, output_directory)
 
@@ -198,6 +217,21 @@ class GalaxyBaseRunResponse(SuccessfulRunResponse):
                     "path": destination,
                     "class": "File",
                 }
+            return output.get_id(), dict_value
+
+        # Downloads are streamed straight to disk, fetch several at once.
+        outputs = get_outputs(self._runnable)
+        threads = min(DEFAULT_DOWNLOAD_THREADS, len(outputs))
+        if threads <= 1:
+            collected = [collect_output(o) for o in outputs]
+        else:
+            pool = ThreadPool(threads)
+            try:
+                collected = pool.map(collect_output, outputs)
+            finally:
+                pool.close()
+                pool.join()
+        for output_id, dict_value in collected:
             outputs_dict[output_id] = dict_value
         self._outputs_dict = outputs_dict
 
@@ -318,8 +352,7 @@ class GalaxyWorkflowRunResponse(GalaxyBaseRunResponse):
 
 
 def _tool_id(tool_path):
-    tool_source = get_tool_source(tool_path)
-    return tool_source.parse_id()
+    return load_tool_source(tool_path).parse_id()
 
 
 def _history_id(gi, **kwds):
@@ -330,39 +363,22 @@ def _history_id(gi, **kwds):
     return history_id
 
 
-def _wait_for_invocation(gi, workflow_id, invocation_id):
-    def state_func():
-        return gi.workflows.show_invocation(workflow_id, invocation_id)
-
-    return _wait_on_state(state_func)
-
-
-def _wait_for_history(gi, history_id):
-    def state_func():
-        return gi.histories.show_history(history_id)
-
-    return _wait_on_state(state_func)
-
+def _wait_for_invocation(config, workflow_id, invocation_id, **kwds):
+    return config.state_watcher.wait_for_invocation(
+        workflow_id, invocation_id, timeout=_job_timeout(**kwds)
+    )
 
-def _wait_for_job(gi, job_id):
-    def state_func():
-        return gi.jobs.show_job(job_id, full_details=True)
 
-    return _wait_on_state(state_func)
+def _wait_for_history(config, history_id, **kwds):
+    return config.state_watcher.wait_for_history(history_id, timeout=_job_timeout(**kwds))
 
 
-def _wait_on_state(state_func):
+def _wait_for_job(config, job_id, **kwds):
+    return config.state_watcher.wait_for_job(job_id, timeout=_job_timeout(**kwds))
 
-    def get_state():
-        response = state_func()
-        state = response["state"]
-        if str(state) not in ["running", "queued", "new", "ready"]:
-            return state
-        else:
-            return None
 
-    final_state = wait_on(get_state, "state", timeout=100)
-    return final_state
+def _job_timeout(**kwds):
+    return kwds.get("job_timeout", None) or DEFAULT_TIMEOUT
 
 
 # Now this is the newer version of this function as of 4/29
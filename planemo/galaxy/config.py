@@ -4,9 +4,12 @@ from __future__ import print_function
 
 import abc
 import contextlib
+import hashlib
 import os
 import random
 import shutil
+import threading
+import uuid
 
 from string import Template
 from tempfile import mkdtemp
@@ -25,7 +28,9 @@ from six.moves.urllib.request import urlretrieve
 
 from planemo import git
 from planemo.conda import build_conda_context
+from planemo.conda_env_cache import create_cached_environments
 from planemo.config import OptionSource
+from planemo.database import create_database_source
 from planemo.docker import docker_host_args
 from planemo.io import (
     communicate,
@@ -49,6 +54,8 @@ from .run import (
     setup_common_startup_args,
     setup_venv,
 )
+from .staging import DatasetStager
+from .watcher import GalaxyStateWatcher
 from .workflows import (
     import_workflow,
     install_shed_repos,
@@ -222,6 +229,9 @@ STOCK_DEPENDENCY_RESOLUTION_STRATEGIES = {
     "default_dependency_resolution": DEFAULT_DEPENDENCY_RESOLUTION_CONF,
 }
 
+# Resolution strategies under which Galaxy resolves requirements with Conda.
+CONDA_DEPENDENCY_RESOLUTION_TYPES = ["conda_dependency_resolution", "default_dependency_resolution"]
+
 EMPTY_TOOL_CONF_TEMPLATE = """<toolbox></toolbox>"""
 
 DEFAULT_GALAXY_BRANCH = "master"
@@ -234,6 +244,9 @@ DOWNLOADABLE_MIGRATION_VERSIONS = [127, 120, 117]
 LATEST_URL = DOWNLOADS_URL + "latest.sqlite"
 
 DATABASE_LOCATION_TEMPLATE = "sqlite:///%s?isolation_level=IMMEDIATE"
+MIGRATE_DATABASE_CONFIG_TEMPLATE = """[app:main]
+database_connection = %s
+"""
 
 PIP_INSTALL_CMD = "pip install %s"
 
@@ -383,7 +396,7 @@ def local_galaxy_config(ctx, runnables, for_tests=False, **kwds):
             galaxy_root = config_join("galaxy-dev")
 
         server_name = "planemo%d" % random.randint(0, 100000)
-        _handle_dependency_resolution(ctx, config_directory, kwds)
+        _handle_dependency_resolution(ctx, config_directory, kwds, tool_paths=tool_paths)
         _handle_job_config_file(config_directory, server_name, kwds)
         _handle_job_metrics(config_directory, kwds)
         file_path = kwds.get("file_path") or config_join("files")
@@ -470,6 +483,9 @@ def local_galaxy_config(ctx, runnables, for_tests=False, **kwds):
             test_data_dir=test_data_dir,  # TODO: make gx respect this
             shed_data_manager_config_file=shed_data_manager_config_file,
         ))
+        if kwds.get("link_inputs", False):
+            # Lets planemo link local inputs into Galaxy.
+            properties["allow_library_path_paste"] = "True"
         _handle_container_resolution(ctx, kwds, properties)
         write_file(config_join("logging.ini"), _sub(LOGGING_TEMPLATE, template_args))
         if not for_tests:
@@ -514,17 +530,20 @@ def local_galaxy_config(ctx, runnables, for_tests=False, **kwds):
 
         pid_file = kwds.get("pid_file") or config_join("galaxy.pid")
 
-        yield LocalGalaxyConfig(
-            config_directory,
-            env,
-            test_data_dir,
-            port,
-            server_name,
-            master_api_key,
-            runnables,
-            galaxy_root,
-            pid_file,
-        )
+        with _postgres_test_database(ctx, galaxy_root, for_tests, kwds) as test_database_connection:
+            if test_database_connection:
+                env["GALAXY_TEST_DBURI"] = test_database_connection
+            yield LocalGalaxyConfig(
+                config_directory,
+                env,
+                test_data_dir,
+                port,
+                server_name,
+                master_api_key,
+                runnables,
+                galaxy_root,
+                pid_file,
+            )
 
 
 def _shared_galaxy_properties(config_directory, kwds, for_tests):
@@ -647,6 +666,9 @@ class GalaxyConfig(object):
 
 class BaseGalaxyConfig(GalaxyConfig):
 
+    # Whether Galaxy can read files by the paths planemo sees them at.
+    shares_filesystem = False
+
     def __init__(
         self,
         config_directory,
@@ -666,6 +688,10 @@ class BaseGalaxyConfig(GalaxyConfig):
         self.runnables = runnables
         self._user_api_key = None
         self._workflow_ids = {}
+        # Inputs staged into this Galaxy are only reused while it is in use.
+        self.dataset_stager = DatasetStager()
+        self._state_watcher = None
+        self._state_watcher_lock = threading.Lock()
 
     @property
     def gi(self):
@@ -679,6 +705,14 @@ class BaseGalaxyConfig(GalaxyConfig):
 
         return self._gi_for_key(self._user_api_key)
 
+    @property
+    def state_watcher(self):
+        """Return the :class:`GalaxyStateWatcher` polling states for this Galaxy's user."""
+        with self._state_watcher_lock:
+            if self._state_watcher is None:
+                self._state_watcher = GalaxyStateWatcher(self.user_gi)
+            return self._state_watcher
+
     def _gi_for_key(self, key):
         return gi(self.port, key)
 
@@ -810,6 +844,8 @@ class DockerGalaxyConfig(BaseGalaxyConfig):
 class LocalGalaxyConfig(BaseGalaxyConfig):
     """A local, non-containerized implementation of :class:`GalaxyConfig`."""
 
+    shares_filesystem = True
+
     def __init__(
         self,
         config_directory,
@@ -834,9 +870,29 @@ class LocalGalaxyConfig(BaseGalaxyConfig):
         self.galaxy_root = galaxy_root
         self._pid_file = pid_file
 
+    @property
+    def pid_file(self):
+        """Pid file of this Galaxy instance when served as a daemon."""
+        return self._pid_file
+
     def kill(self):
         kill_pid_file(self._pid_file)
 
+    def load_runnables(self, runnables, **kwds):
+        """Rewrite this instance's tool panel to contain the supplied runnables.
+
+        A running Galaxy must still be asked to reload its toolbox for the
+        new tool panel to take effect.
+        """
+        tool_paths = [r.path for r in runnables if r.has_tools]
+        all_tool_paths = list(tool_paths) + list(kwds.get("extra_tools", []))
+        tool_conf_contents = _sub(TOOL_CONF_TEMPLATE, dict(
+            tool_definition=_tool_conf_entry_for(all_tool_paths),
+        ))
+        write_file(os.path.join(self.config_directory, "tool_conf.xml"), tool_conf_contents)
+        self.test_data_dir = _find_test_data(tool_paths, **kwds)
+        self.runnables = runnables
+
     def startup_command(self, ctx, **kwds):
         """Return a shell command used to startup this instance.
 
@@ -943,6 +999,61 @@ def _download_database_template(
         return False
 
 
+def ensure_postgres_template(ctx, galaxy_root, database_source, **kwds):
+    """Ensure ``database_source`` has a migrated template for ``galaxy_root``.
+
+    Return the migration version the template was created for.
+    """
+    migration_version = _newest_migration_version(galaxy_root)
+
+    def migrate(database_connection):
+        _migrate_database(ctx, galaxy_root, database_connection, kwds)
+
+    database_source.ensure_template(migration_version, migrate)
+    return migration_version
+
+
+def _migrate_database(ctx, galaxy_root, database_connection, kwds):
+    config_directory = mkdtemp()
+    try:
+        config_file = os.path.join(config_directory, "galaxy.ini")
+        write_file(config_file, MIGRATE_DATABASE_CONFIG_TEMPLATE % database_connection)
+        migrate_command = shell_join(
+            "cd %s" % galaxy_root,
+            setup_venv(ctx, kwds),
+            setup_common_startup_args(),
+            COMMAND_STARTUP_COMMAND,
+            "python scripts/create_db.py -c '%s'" % config_file,
+        )
+        if shell(migrate_command) != 0:
+            raise Exception("Failed to migrate database [%s]." % database_connection)
+    finally:
+        shutil.rmtree(config_directory, CLEANUP_IGNORE_ERRORS)
+
+
+@contextlib.contextmanager
+def _postgres_test_database(ctx, galaxy_root, for_tests, kwds):
+    # Yield the URL of a throwaway copy of the migrated template for
+    # Galaxy's test driver (or None if tests use the default database).
+    if not for_tests or not kwds.get("postgres_test_database", False):
+        yield None
+        return
+
+    database_source = create_database_source(**dict(kwds, database_type="postgres"))
+    migration_version = ensure_postgres_template(ctx, galaxy_root, database_source, **kwds)
+    identifier = "plnmotest_%s" % uuid.uuid4().hex[:12]
+    database_source.create_database_from_template(identifier, migration_version)
+    try:
+        yield database_source.sqlalchemy_url(identifier)
+    finally:
+        try:
+            database_source.delete_database(identifier)
+            # Copy the template ahead of the next run, one database per instance.
+            database_source.fill_pool(migration_version, kwds.get("instances", None) or 1)
+        except Exception as e:
+            warn("Failed to clean up test database [%s]: %s" % (identifier, e))
+
+
 def _newest_migration_version(galaxy_root):
     versions = os.path.join(galaxy_root, "lib/galaxy/model/migrate/versions")
     version = max(map(_file_name_to_migration_version, os.listdir(versions)))
@@ -969,6 +1080,40 @@ def _check_galaxy(ctx, **kwds):
     return galaxy_root
 
 
+def galaxy_version_id(ctx, galaxy_root=None, **kwds):
+    """Return a hash identifying the Galaxy version and commit to run against.
+
+    If ``galaxy_root`` is not supplied it is resolved from ``kwds`` - for a
+    Galaxy planemo installs from its cached repository this is the commit
+    the requested branch points at. Returns ``None`` if the version cannot
+    be pinned down (a downloaded Galaxy or a checkout with uncommitted
+    changes), so nothing keyed on it should be reused.
+    """
+    if galaxy_root is None:
+        galaxy_root = _check_galaxy(ctx, **kwds)
+    if galaxy_root is not None:
+        galaxy_root = os.path.abspath(galaxy_root)
+        if os.path.exists(os.path.join(galaxy_root, ".git")):
+            if git.is_rev_dirty(ctx, galaxy_root):
+                return None
+            version = "commit:%s" % git.rev(ctx, galaxy_root)
+        else:
+            version_path = os.path.join(galaxy_root, "lib", "galaxy", "version.py")
+            if not os.path.exists(version_path):
+                return None
+            with open(version_path, "r") as f:
+                version = "root:%s:%s" % (galaxy_root, f.read())
+    elif kwds.get("no_cache_galaxy", False):
+        return None
+    else:
+        gx_repo = _ensure_galaxy_repository_available(ctx, kwds)
+        try:
+            version = "commit:%s" % git.rev(ctx, gx_repo, "%s^{commit}" % _galaxy_branch(kwds))
+        except RuntimeError:
+            return None
+    return hashlib.sha1(version.encode("utf-8")).hexdigest()
+
+
 def _find_galaxy_root(ctx, **kwds):
     root_prop = "galaxy_root"
     cwl = kwds.get("cwl", False)
@@ -1219,7 +1364,7 @@ def _handle_job_config_file(config_directory, server_name, kwds):
     kwds["job_config_file"] = job_config_file
 
 
-def _handle_dependency_resolution(ctx, config_directory, kwds):
+def _handle_dependency_resolution(ctx, config_directory, kwds, tool_paths=None):
     _validate_dependency_resolution_options(kwds)
     always_specify_attribute = object()
 
@@ -1279,6 +1424,11 @@ def _handle_dependency_resolution(ctx, config_directory, kwds):
         )
         kwds["dependency_resolvers_config_file"] = resolvers_conf
 
+    if tool_paths and resolution_type in CONDA_DEPENDENCY_RESOLUTION_TYPES and kwds.get("conda_auto_install"):
+        # Galaxy would install missing environments when running the tools,
+        # create those solved by an earlier ``conda_install --batch`` upfront.
+        create_cached_environments(ctx, tool_paths, conda_context)
+
 
 def _validate_dependency_resolution_options(kwds):
     resolutions_strategies = [
@@ -1338,5 +1488,7 @@ def _ensure_directory(path):
 __all__ = (
     "attempt_database_preseed",
     "DATABASE_LOCATION_TEMPLATE",
+    "ensure_postgres_template",
     "galaxy_config",
+    "galaxy_version_id",
 )
@@ -0,0 +1,325 @@
+"""Maintain a pool of warm Galaxy servers that outlive individual planemo invocations.
+
+Pooled servers are daemonized Galaxy instances stored in planemo's workspace
+and keyed on the options that require a fresh server to change (Galaxy root,
+branch, source, dependency and container resolution). A planemo command leases
+an idle server from the pool - booting one only if none is available - loads
+the tools and workflows it needs into the running server, and returns the
+server to the pool afterward rather than shutting it down.
+"""
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+from tempfile import mkdtemp
+
+from planemo import network_util
+from planemo.io import (
+    kill_pid_file,
+    wait_on,
+)
+from planemo.runnable import RunnableType
+from planemo.tool_cache import tool_summary
+
+from .config import LocalGalaxyConfig
+from .serve import serve
+
+POOL_KEY_JSON_NAME = "pool_key.json"
+POOL_SERVER_JSON_NAME = "pool_server.json"
+LEASE_FILE_NAME = "lease"
+LEASE_LOCK_FILE_NAME = "lease.lock"
+
+# Options that are baked into a running Galaxy server - servers booted with
+# different values for any of these cannot be shared.
+POOL_KEY_OPTIONS = [
+    "galaxy_root",
+    "cwl_galaxy_root",
+    "install_galaxy",
+    "galaxy_branch",
+    "galaxy_source",
+    "galaxy_email",
+    "cwl",
+    "non_strict_cwl",
+    "skip_venv",
+    "no_cache_galaxy",
+    "dependency_resolvers_config_file",
+    "brew_dependency_resolution",
+    "shed_dependency_resolution",
+    "no_dependency_resolution",
+    "conda_dependency_resolution",
+    "conda_prefix",
+    "conda_exec",
+    "conda_debug",
+    "conda_ensure_channels",
+    "conda_copy_dependencies",
+    "conda_auto_install",
+    "conda_auto_init",
+    "conda_use_local",
+    "docker",
+    "mulled_containers",
+    "job_config_file",
+    "tool_data_table",
+    "database_connection",
+    "file_path",
+    "tool_dependency_dir",
+    "link_inputs",
+]
+TOOL_LOAD_TIMEOUT = 120
+HEALTH_CHECK_TIMEOUT = 5
+
+
+@contextlib.contextmanager
+def leased_galaxy(ctx, runnables, **kwds):
+    """Lease a pooled Galaxy serving the supplied runnables for the duration of the context.
+
+    The yielded object is a :class:`planemo.galaxy.config.LocalGalaxyConfig`,
+    the underlying server is left running when the context exits.
+    """
+    pool_directory = _pool_directory(ctx, kwds)
+    config, lease_path = _lease_idle_server(ctx, pool_directory, runnables, kwds)
+    try:
+        if config is None:
+            # A freshly booted server already serves the runnables.
+            config, lease_path = _boot_server(ctx, pool_directory, runnables, kwds)
+        else:
+            ctx.vlog("Leased pooled Galaxy server on port [%s]" % config.port)
+            _hot_load(ctx, config, runnables, kwds)
+        yield config
+    finally:
+        _release_lease(lease_path)
+
+
+def list_pooled_servers(ctx, **kwds):
+    """Return a list of dictionaries describing every pooled Galaxy server."""
+    servers = []
+    for pool_directory in _pool_directories(ctx):
+        for server_directory in _server_directories(pool_directory):
+            server = _read_server(server_directory)
+            if server is None:
+                continue
+            server["leased"] = _lease_holder(server_directory) is not None
+            server["server_directory"] = server_directory
+            servers.append(server)
+    return servers
+
+
+def clear_pool(ctx, force=False, **kwds):
+    """Stop pooled Galaxy servers and delete their configuration.
+
+    Servers currently leased by a running planemo process are left alone
+    unless ``force`` is set. Returns the number of servers stopped.
+    """
+    stopped = 0
+    for pool_directory in _pool_directories(ctx):
+        for server_directory in _server_directories(pool_directory):
+            if not force and _lease_holder(server_directory) is not None:
+                ctx.vlog("Skipping leased pooled Galaxy [%s]" % server_directory)
+                continue
+            _destroy_server(server_directory)
+            stopped += 1
+        if not _server_directories(pool_directory):
+            shutil.rmtree(pool_directory, ignore_errors=True)
+    return stopped
+
+
+def pool_key(**kwds):
+    """Return a hash identifying which pooled servers can serve these kwds."""
+    key_options = _key_options(kwds)
+    key_json = json.dumps(key_options, sort_keys=True)
+    return hashlib.sha1(key_json.encode("utf-8")).hexdigest()
+
+
+def _key_options(kwds):
+    key_options = {}
+    for option in POOL_KEY_OPTIONS:
+        value = kwds.get(option, None)
+        if isinstance(value, tuple):
+            value = list(value)
+        key_options[option] = value
+    return key_options
+
+
+def _pool_directory(ctx, kwds):
+    pool_directory = os.path.join(ctx.galaxy_pool_directory, pool_key(**kwds))
+    if not os.path.exists(pool_directory):
+        os.makedirs(pool_directory)
+        with open(os.path.join(pool_directory, POOL_KEY_JSON_NAME), "w") as f:
+            json.dump(_key_options(kwds), f)
+    return pool_directory
+
+
+def _pool_directories(ctx):
+    root = ctx.galaxy_pool_directory
+    return [os.path.join(root, d) for d in sorted(os.listdir(root))]
+
+
+def _server_directories(pool_directory):
+    if not os.path.isdir(pool_directory):
+        return []
+    return [
+        os.path.join(pool_directory, d) for d in sorted(os.listdir(pool_directory))
+        if os.path.isdir(os.path.join(pool_directory, d))
+    ]
+
+
+def _lease_idle_server(ctx, pool_directory, runnables, kwds):
+    for server_directory in _server_directories(pool_directory):
+        lease_path = _acquire_lease(server_directory)
+        if lease_path is None:
+            continue
+        config = _load_server(server_directory, runnables)
+        if config is not None:
+            return config, lease_path
+        ctx.vlog("Removing unresponsive pooled Galaxy [%s]" % server_directory)
+        _destroy_server(server_directory)
+    return None, None
+
+
+def _boot_server(ctx, pool_directory, runnables, kwds):
+    server_directory = mkdtemp(prefix="server_", dir=pool_directory)
+    lease_path = _acquire_lease(server_directory)
+    serve_kwds = kwds.copy()
+    # Pooled servers are regular served Galaxies, even when leased for tests.
+    serve_kwds.pop("for_tests", None)
+    serve_kwds["config_directory"] = os.path.join(server_directory, "config")
+    serve_kwds["port"] = network_util.get_free_port()
+    serve_kwds["daemon"] = True
+    os.makedirs(serve_kwds["config_directory"])
+    ctx.vlog("Booting new pooled Galaxy server in [%s]" % server_directory)
+    try:
+        config = serve(ctx, runnables, **serve_kwds)
+        server = dict(
+            port=config.port,
+            server_name=config.server_name,
+            master_api_key=config.master_api_key,
+            config_directory=config.config_directory,
+            galaxy_root=config.galaxy_root,
+            pid_file=config.pid_file,
+            env=config.env,
+        )
+        with open(os.path.join(server_directory, POOL_SERVER_JSON_NAME), "w") as f:
+            json.dump(server, f)
+    except Exception:
+        _destroy_server(server_directory)
+        raise
+    return config, lease_path
+
+
+def _load_server(server_directory, runnables):
+    server = _read_server(server_directory)
+    if server is None or _read_pid(server["pid_file"]) is None:
+        return None
+
+    galaxy_url = "http://localhost:%s" % server["port"]
+    if not network_util.wait_http_service(galaxy_url, timeout=HEALTH_CHECK_TIMEOUT):
+        return None
+
+    return LocalGalaxyConfig(
+        server["config_directory"],
+        server.get("env", {}),
+        None,
+        server["port"],
+        server["server_name"],
+        server["master_api_key"],
+        runnables,
+        server["galaxy_root"],
+        server["pid_file"],
+    )
+
+
+def _read_server(server_directory):
+    server_json = os.path.join(server_directory, POOL_SERVER_JSON_NAME)
+    if not os.path.exists(server_json):
+        return None
+    with open(server_json, "r") as f:
+        return json.load(f)
+
+
+def _hot_load(ctx, config, runnables, kwds):
+    config.load_runnables(runnables, **kwds)
+    try:
+        toolbox_url = "%s/configuration/toolbox" % config.gi.url
+        config.gi.make_put_request(toolbox_url)
+    except Exception as e:
+        # Galaxy also watches its tool configuration files, so keep
+        # going and just wait on the tools below.
+        ctx.vlog("Problem requesting toolbox reload [%s]" % e)
+
+    tool_ids = [
+        tool_summary(ctx, r.path).parse_id() for r in runnables
+        if r.type in [RunnableType.galaxy_tool, RunnableType.cwl_tool]
+    ]
+
+    def tools_loaded():
+        for tool_id in tool_ids:
+            try:
+                config.gi.tools.show_tool(tool_id)
+            except Exception:
+                return None
+        return True
+
+    if tool_ids:
+        wait_on(tools_loaded, "tools to load in pooled Galaxy", timeout=TOOL_LOAD_TIMEOUT)
+    config.install_workflows()
+
+
+def _acquire_lease(server_directory):
+    lease_path = os.path.join(server_directory, LEASE_FILE_NAME)
+    # Checking for and breaking a stale lease is not atomic, so serialize
+    # it - otherwise a process could remove a lease just taken by another.
+    with open(os.path.join(server_directory, LEASE_LOCK_FILE_NAME), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(lease_path) and _lease_holder(server_directory) is None:
+                # Lease left behind by a planemo process that has since died.
+                os.remove(lease_path)
+            try:
+                fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except OSError:
+                return None
+            os.write(fd, str(os.getpid()).encode("utf-8"))
+            os.close(fd)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    if _lease_holder(server_directory) != os.getpid():
+        return None
+    return lease_path
+
+
+def _release_lease(lease_path):
+    if lease_path and os.path.exists(lease_path):
+        os.remove(lease_path)
+
+
+def _lease_holder(server_directory):
+    """Return the pid of the live process holding a lease on this server or ``None``."""
+    return _read_pid(os.path.join(server_directory, LEASE_FILE_NAME))
+
+
+def _read_pid(pid_file):
+    if not os.path.exists(pid_file):
+        return None
+    try:
+        with open(pid_file, "r") as f:
+            pid = int(f.read().strip())
+        os.kill(pid, 0)
+    except (ValueError, OSError):
+        return None
+    return pid
+
+
+def _destroy_server(server_directory):
+    server = _read_server(server_directory)
+    if server is not None:
+        kill_pid_file(server["pid_file"])
+    shutil.rmtree(server_directory, ignore_errors=True)
+
+
+__all__ = (
+    "clear_pool",
+    "leased_galaxy",
+    "list_pooled_servers",
+    "pool_key",
+)
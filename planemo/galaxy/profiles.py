@@ -15,6 +15,7 @@ from planemo.database import create_database_source
 from .config import (
     attempt_database_preseed,
     DATABASE_LOCATION_TEMPLATE,
+    ensure_postgres_template,
 )
 
 PROFILE_OPTIONS_JSON_NAME = "planemo_profile_options.json"
@@ -58,14 +59,14 @@ def create_profile(ctx, profile_name, **kwds):
 
     os.makedirs(profile_directory)
     create_for_engine = _create_profile_docker if engine_type == "docker_galaxy" else _create_profile_local
-    stored_profile_options = create_for_engine(profile_directory, profile_name, kwds)
+    stored_profile_options = create_for_engine(ctx, profile_directory, profile_name, kwds)
 
     profile_options_path = _stored_profile_options_path(profile_directory)
     with open(profile_options_path, "w") as f:
         json.dump(stored_profile_options, f)
 
 
-def _create_profile_docker(profile_directory, profile_name, kwds):
+def _create_profile_docker(ctx, profile_directory, profile_name, kwds):
     export_directory = os.path.join(profile_directory, "export")
     os.makedirs(export_directory)
     return {
@@ -73,14 +74,23 @@ def _create_profile_docker(profile_directory, profile_name, kwds):
     }
 
 
-def _create_profile_local(profile_directory, profile_name, kwds):
+def _create_profile_local(ctx, profile_directory, profile_name, kwds):
     database_type = kwds.get("database_type", "sqlite")
     if database_type != "sqlite":
         database_source = create_database_source(**kwds)
         database_identifier = _profile_to_database_identifier(profile_name)
-        database_source.create_database(
-            database_identifier,
-        )
+        galaxy_root = kwds.get("galaxy_root", None)
+        if database_type == "postgres" and galaxy_root and os.path.isdir(galaxy_root):
+            # Start from a migrated copy rather than migrating on first boot.
+            migration_version = ensure_postgres_template(ctx, galaxy_root, database_source, **kwds)
+            database_source.create_database_from_template(
+                database_identifier,
+                migration_version,
+            )
+        else:
+            database_source.create_database(
+                database_identifier,
+            )
         database_connection = database_source.sqlalchemy_url(database_identifier)
     else:
         database_location = os.path.join(profile_directory, "galaxy.sqlite")
@@ -0,0 +1,140 @@
+"""Stage local input files into Galaxy histories.
+
+A :class:`DatasetStager` uploads the files needed by a job concurrently and
+remembers the dataset created for each file's name and contents. Staging
+an identical file again (e.g. the same ``test-data`` file used by many test
+cases) just copies the existing dataset into the target history instead of
+uploading it again. Datasets are named after the files they were staged
+from, so files with identical contents but different names are staged
+separately. A stager is meant to be used for one Galaxy server and user
+while that Galaxy is served (each Galaxy configuration has its own).
+
+If Galaxy shares planemo's filesystem, files can instead be linked into
+Galaxy through a data library - avoiding copying their contents entirely.
+"""
+import hashlib
+import os
+import threading
+from multiprocessing.pool import ThreadPool
+
+DEFAULT_STAGING_THREADS = 4
+STAGING_LIBRARY_NAME = "Planemo Staged Inputs"
+# Previously staged datasets in these states are not reused.
+UNUSABLE_STATES = ["error", "discarded", "failed_metadata"]
+
+
+class DatasetStager(object):
+    """Stage files into histories of one Galaxy server for one user."""
+
+    def __init__(self, threads=DEFAULT_STAGING_THREADS):
+        self.threads = threads
+        self._lock = threading.Lock()
+        self._datasets = {}
+        self._content_locks = {}
+        self._library_id = None
+
+    def stage(self, user_gi, history_id, file_paths, admin_gi=None, link=False):
+        """Stage the supplied files into a history.
+
+        Returns a dictionary mapping each path to the dataset (as returned by
+        the Galaxy API) staged for it. If ``link`` is set, ``admin_gi`` is used
+        to link files into Galaxy rather than uploading them.
+        """
+        unique_paths = []
+        for file_path in file_paths:
+            if file_path not in unique_paths:
+                unique_paths.append(file_path)
+
+        def stage_one(file_path):
+            return self._stage_file(user_gi, history_id, file_path, admin_gi, link)
+
+        threads = min(self.threads, len(unique_paths))
+        if threads <= 1:
+            datasets = [stage_one(p) for p in unique_paths]
+        else:
+            pool = ThreadPool(threads)
+            try:
+                datasets = pool.map(stage_one, unique_paths)
+            finally:
+                pool.close()
+                pool.join()
+        return dict(zip(unique_paths, datasets))
+
+    def _stage_file(self, user_gi, history_id, file_path, admin_gi, link):
+        content_key = "%s:%s:%s" % (
+            "link" if link else "upload",
+            os.path.basename(file_path),
+            _file_hash(file_path),
+        )
+        with self._lock:
+            content_lock = self._content_locks.setdefault(content_key, threading.Lock())
+
+        # Stage each unique file once - later callers wait and reuse it.
+        with content_lock:
+            staged = self._datasets.get(content_key, None)
+            if staged is not None:
+                dataset = self._copy(user_gi, history_id, staged)
+                if dataset is not None:
+                    return dataset
+            if link:
+                dataset = self._link(user_gi, history_id, file_path, admin_gi)
+            else:
+                dataset = user_gi.tools.upload_file(file_path, history_id)["outputs"][0]
+            self._datasets[content_key] = dataset
+            return dataset
+
+    def _copy(self, user_gi, history_id, staged):
+        try:
+            if user_gi.datasets.show_dataset(staged["id"])["state"] in UNUSABLE_STATES:
+                return None
+            if staged.get("history_id", None) == history_id:
+                return staged
+            return user_gi.histories.copy_dataset(history_id, staged["id"])
+        except Exception:
+            # Deleted or otherwise inaccessible, just stage the file again.
+            return None
+
+    def _link(self, user_gi, history_id, file_path, admin_gi):
+        library_id = self._staging_library_id(admin_gi)
+        library_datasets = admin_gi.libraries.upload_from_galaxy_filesystem(
+            library_id,
+            os.path.abspath(file_path),
+            link_data_only="link_to_files",
+        )
+        return user_gi.histories.upload_dataset_from_library(history_id, library_datasets[0]["id"])
+
+    def _staging_library_id(self, admin_gi):
+        with self._lock:
+            if self._library_id is None:
+                libraries = admin_gi.libraries.get_libraries(name=STAGING_LIBRARY_NAME)
+                if libraries:
+                    self._library_id = libraries[0]["id"]
+                else:
+                    self._library_id = admin_gi.libraries.create_library(STAGING_LIBRARY_NAME)["id"]
+            return self._library_id
+
+
+# Content hashes of local files keyed on path, size and modification time.
+_FILE_HASHES = {}
+_FILE_HASHES_LOCK = threading.Lock()
+
+
+def _file_hash(path):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    with _FILE_HASHES_LOCK:
+        file_hash = _FILE_HASHES.get(memo_key, None)
+    if file_hash is None:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        file_hash = "%s-%d" % (digest.hexdigest(), stat.st_size)
+        with _FILE_HASHES_LOCK:
+            _FILE_HASHES[memo_key] = file_hash
+    return file_hash
+
+
+__all__ = (
+    "DatasetStager",
+)
@@ -2,6 +2,8 @@
 from .actions import handle_reports
 from .actions import handle_reports_and_summary
 from .actions import run_in_config
+from .actions import run_in_instances
+from .actions import run_in_pooled_galaxy
 
 from .structures import StructuredData
 
@@ -9,5 +11,7 @@ __all__ = (
     "handle_reports",
     "handle_reports_and_summary",
     "run_in_config",
+    "run_in_instances",
+    "run_in_pooled_galaxy",
     "StructuredData",
 )
@@ -1,7 +1,9 @@
 """Actions related to running and reporting on Galaxy-specific testing."""
 
-import json
+import contextlib
 import os
+import shutil
+from multiprocessing.pool import ThreadPool
 
 import click
 
@@ -12,13 +14,31 @@ from planemo.exit_codes import (
     EXIT_CODE_NO_SUCH_TARGET,
     EXIT_CODE_OK,
 )
+from planemo.galaxy.config import (
+    COMMAND_STARTUP_COMMAND,
+    galaxy_config,
+    galaxy_version_id,
+)
+from planemo.galaxy.pool import leased_galaxy
 from planemo.galaxy.run import (
     run_galaxy_command,
     setup_venv,
 )
 from planemo.io import error, info, shell_join, warn
+from planemo.network_util import get_free_port
 from planemo.reports import build_report
-from planemo.test.results import get_dict_value
+from planemo.runnable import (
+    for_path,
+    RunnableType,
+)
+from planemo.test.cache import TestResultCache
+from planemo.test.results import (
+    get_dict_value,
+    StructuredData,
+    write_structured_data,
+)
+from planemo.tool_cache import tool_summary
+from planemo.tools import yield_tool_summaries_on_paths
 
 from . import structures as test_structures
 
@@ -39,6 +59,10 @@ PROBLEM_COUNT_MESSAGE = ("There were problems with %d test(s) - out of %d "
 GENERIC_PROBLEMS_MESSAGE = ("One or more tests failed. See %s for detailed "
                             "breakdown.")
 GENERIC_TESTS_PASSED_MESSAGE = "No failing tests encountered."
+ALL_TESTS_CACHED_MESSAGE = ("Tests for all tools passed previously and are "
+                            "unchanged - reporting cached results.")
+INSTANCES_MESSAGE = "Testing %d tool(s) across %d Galaxy instances."
+COMMON_STARTUP_FAILED_MESSAGE = "Failed to prepare Galaxy for testing (exit code %d)."
 
 
 def run_in_config(ctx, config, run=run_galaxy_command, **kwds):
@@ -47,6 +71,180 @@ def run_in_config(ctx, config, run=run_galaxy_command, **kwds):
     The specified `config` object describes the context for tool
     execution.
     """
+    structured_data, exit_code = _run_tests_in_config(ctx, config, run=run, **kwds)
+    return handle_reports_and_summary(
+        ctx,
+        structured_data,
+        exit_code=exit_code,
+        kwds=kwds
+    )
+
+
+def run_in_pooled_galaxy(ctx, runnables, run=run_galaxy_command, lease=leased_galaxy, **kwds):
+    """Run Galaxy tests with the run_tests.sh command against a pooled Galaxy server.
+
+    A warm server is leased from planemo's pool with the supplied runnables
+    loaded and Galaxy's test driver is pointed at it with
+    ``GALAXY_TEST_EXTERNAL`` rather than starting a fresh Galaxy.
+    """
+    with lease(ctx, runnables, **kwds) as config:
+        config.env.update(_external_galaxy_test_env(config))
+        return run_in_config(ctx, config, run=run, **kwds)
+
+
+def _external_galaxy_test_env(config):
+    env = {
+        "GALAXY_TEST_EXTERNAL": "http://localhost:%s" % config.port,
+        "GALAXY_CONFIG_MASTER_API_KEY": config.master_api_key,
+        "GALAXY_TEST_TOOL_CONF": config.env.get(
+            "GALAXY_TEST_TOOL_CONF", os.path.join(config.config_directory, "tool_conf.xml")
+        ),
+    }
+    # Test data follows the tools loaded for this lease, not those the
+    # server was booted with.
+    if config.test_data_dir:
+        env["GALAXY_TEST_FILE_DIR"] = config.test_data_dir
+    return env
+
+
+def run_in_instances(ctx, runnables, run=run_galaxy_command, config_factory=galaxy_config, **kwds):
+    """Split tools between ``instances`` Galaxy configurations and test them concurrently.
+
+    Tools are balanced between instances using test durations recorded in
+    previous ``test_output_json`` and ``test_output_xunit`` reports. Each
+    instance has its own configuration directory (and so its own database,
+    file path and job files) and port. Results of all instances are merged
+    into a single set of reports.
+    """
+    tool_runnables = _unique_tool_runnables(ctx, runnables)
+    shards = _instance_shards(ctx, tool_runnables, **kwds)
+    if len(shards) < 2:
+        with config_factory(ctx, runnables, **kwds) as config:
+            return run_in_config(ctx, config, run=run, **kwds)
+
+    info(INSTANCES_MESSAGE % (len(tool_runnables), len(shards)))
+    with _instance_configs(ctx, shards, config_factory, kwds, set()) as configs:
+        # Instances share a Galaxy root - prepare it once rather than letting
+        # each instance's run_tests.sh run common_startup.sh concurrently.
+        startup_exit_code = _run_common_startup(ctx, configs[0], run, kwds)
+        if startup_exit_code:
+            error(COMMON_STARTUP_FAILED_MESSAGE % startup_exit_code)
+            return EXIT_CODE_GENERIC_FAILURE
+
+        def run_instance(config):
+            return _run_instance(ctx, config, run, kwds)
+
+        pool = ThreadPool(len(configs))
+        try:
+            instance_results = pool.map(run_instance, configs)
+        finally:
+            pool.close()
+            pool.join()
+
+        # Instance reports live in their configuration directories, merge
+        # them before the configurations are cleaned up.
+        structured_data, exit_code = _merge_instance_results(instance_results, kwds)
+        return handle_reports_and_summary(
+            ctx,
+            structured_data,
+            exit_code=exit_code,
+            kwds=kwds
+        )
+
+
+@contextlib.contextmanager
+def _instance_configs(ctx, shards, config_factory, kwds, ports):
+    """Enter a Galaxy configuration for each shard and yield them as a list.
+
+    Configurations are nested so an exception raised while any of them is
+    in use reaches the ``__exit__`` of every one entered.
+    """
+    if not shards:
+        yield []
+        return
+
+    # Each instance's run_tests.sh serves Galaxy on the port of its
+    # configuration, make sure no two instances share one.
+    port = get_free_port()
+    while port in ports:
+        port = get_free_port()
+    instance_kwds = kwds.copy()
+    instance_kwds.update(config_directory=None, port=port)
+    with config_factory(ctx, shards[0], **instance_kwds) as config:
+        # Only install Galaxy once - later instances reuse the same root.
+        if getattr(config, "galaxy_root", None):
+            instance_kwds.update(galaxy_root=config.galaxy_root, install_galaxy=False)
+        with _instance_configs(ctx, shards[1:], config_factory, instance_kwds, ports | set([port])) as configs:
+            yield [config] + configs
+
+
+def _unique_tool_runnables(ctx, runnables):
+    tool_runnables = []
+    tool_paths = set()
+    for _, runnable in _tool_runnables(ctx, runnables):
+        if runnable.path not in tool_paths:
+            tool_paths.add(runnable.path)
+            tool_runnables.append(runnable)
+    return tool_runnables
+
+
+def _instance_shards(ctx, tool_runnables, **kwds):
+    # planemo.ci reads Galaxy test structures, so import it lazily.
+    from planemo.ci import (
+        balanced_chunks,
+        expected_durations,
+    )
+
+    instances = kwds.get("instances", 1)
+    duration_paths = [
+        p for p in [kwds.get("test_output_json", None), kwds.get("test_output_xunit", None)]
+        if p and os.path.exists(p)
+    ]
+    paths = [r.path for r in tool_runnables]
+    costs = expected_durations(ctx, paths, duration_paths)
+    runnables_by_path = dict((r.path, r) for r in tool_runnables)
+    shards = balanced_chunks(paths, costs, max(min(instances, len(paths)), 1))
+    return [[runnables_by_path[p] for p in shard] for shard in shards if shard]
+
+
+def _run_instance(ctx, config, run, kwds):
+    # Reports are written to the instance's configuration directory and
+    # merged once all instances finish.
+    instance_kwds = kwds.copy()
+    instance_kwds.update(
+        test_output=os.path.join(config.config_directory, "tool_test_output.html"),
+        test_output_json=None,
+        test_output_xunit=None,
+        skip_common_startup=True,
+    )
+    config.env["GALAXY_TEST_PORT"] = str(config.port)
+    structured_data, exit_code = _run_tests_in_config(ctx, config, run=run, **instance_kwds)
+    return structured_data, exit_code, _xunit_state(instance_kwds, config)
+
+
+def _merge_instance_results(instance_results, kwds):
+    tests = []
+    exit_code = EXIT_CODE_OK
+    for structured_data, instance_exit_code, _ in instance_results:
+        tests.extend(structured_data.get("tests", []))
+        if exit_code == EXIT_CODE_OK and instance_exit_code:
+            exit_code = instance_exit_code
+
+    sd = StructuredData(data={"version": "0.1", "tests": tests})
+    sd.calculate_summary_data()
+    sd.set_exit_code(exit_code)
+    structured_report_file = kwds.get("test_output_json", None)
+    if structured_report_file:
+        write_structured_data(structured_report_file, sd.structured_data)
+
+    xunit_report_file = kwds.get("test_output_xunit", None)
+    if xunit_report_file:
+        xunit_report_paths = [p for (_, _, p) in instance_results if os.path.exists(p)]
+        test_structures.merge_xunit_reports(xunit_report_paths, xunit_report_file)
+    return sd.structured_data, exit_code
+
+
+def _run_tests_in_config(ctx, config, run=run_galaxy_command, **kwds):
     config_directory = config.config_directory
     html_report_file = kwds["test_output"]
 
@@ -66,6 +264,11 @@ def run_in_config(ctx, config, run=run_galaxy_command, **kwds):
     config.env["GALAXY_TEST_VERBOSE_ERRORS"] = "true"
     config.env["GALAXY_TEST_SAVE"] = job_output_files
 
+    test_cache = _GalaxyTestCache(ctx, config, **kwds)
+    if test_cache.cached_tests and not test_cache.uncached_test_ids:
+        info(ALL_TESTS_CACHED_MESSAGE)
+        return test_cache.cached_only_results(structured_report_file, xunit_report_file)
+
     cd_to_galaxy_command = "cd %s" % config.galaxy_root
     test_cmd = test_structures.GalaxyTestCommand(
         html_report_file,
@@ -73,19 +276,13 @@ def run_in_config(ctx, config, run=run_galaxy_command, **kwds):
         structured_report_file,
         failed=kwds.get("failed", False),
         installed=kwds.get("installed", False),
+        test_ids=test_cache.uncached_test_ids,
+        skip_common_startup=kwds.get("skip_common_startup", False),
     ).build()
-    setup_common_startup_args = ""
-    if kwds.get("skip_venv", False):
-        setup_common_startup_args = (
-            'COMMON_STARTUP_ARGS=--skip-venv; '
-            'export COMMON_STARTUP_ARGS; '
-            'echo "Set COMMON_STARTUP_ARGS to ${COMMON_STARTUP_ARGS}"'
-        )
-    setup_venv_command = setup_venv(ctx, kwds)
     cmd = shell_join(
         cd_to_galaxy_command,
-        setup_common_startup_args,
-        setup_venv_command,
+        _setup_common_startup_args(kwds),
+        setup_venv(ctx, kwds),
         test_cmd,
     )
     action = "Testing tools"
@@ -107,13 +304,29 @@ def run_in_config(ctx, config, run=run_galaxy_command, **kwds):
         return_code,
     )
 
-    structured_data = test_results.structured_data
-    return handle_reports_and_summary(
-        ctx,
-        structured_data,
-        exit_code=test_results.exit_code,
-        kwds=kwds
+    test_cache.merge(test_results)
+    return test_results.structured_data, test_results.exit_code
+
+
+def _run_common_startup(ctx, config, run, kwds):
+    cmd = shell_join(
+        "cd %s" % config.galaxy_root,
+        _setup_common_startup_args(kwds),
+        setup_venv(ctx, kwds),
+        COMMAND_STARTUP_COMMAND,
     )
+    return run(ctx, cmd, config.env, "Preparing Galaxy")
+
+
+def _setup_common_startup_args(kwds):
+    setup_common_startup_args = ""
+    if kwds.get("skip_venv", False):
+        setup_common_startup_args = (
+            'COMMON_STARTUP_ARGS=--skip-venv; '
+            'export COMMON_STARTUP_ARGS; '
+            'echo "Set COMMON_STARTUP_ARGS to ${COMMON_STARTUP_ARGS}"'
+        )
+    return setup_common_startup_args
 
 
 def handle_reports_and_summary(ctx, structured_data, exit_code=None, kwds={}):
@@ -137,8 +350,7 @@ def handle_reports(ctx, structured_data, kwds):
     structured_report_file = kwds.get("test_output_json", None)
     if structured_report_file and not os.path.exists(structured_report_file):
         try:
-            with open(structured_report_file, "w") as f:
-                json.dump(structured_data, f)
+            write_structured_data(structured_report_file, structured_data)
         except Exception as e:
             exceptions.append(e)
 
@@ -166,8 +378,11 @@ def _handle_test_output_file(ctx, report_type, test_data, kwds):
         return
 
     try:
-        contents = build_report.build_report(
-            test_data, report_type=report_type
+        build_report.write_report(
+            path,
+            test_data,
+            report_type=report_type,
+            html_mode=kwds.get("test_output_html_mode", None) or build_report.HTML_MODE_INLINE,
         )
     except Exception:
         message = "Problem producing report file %s for %s" % (
@@ -176,16 +391,6 @@ def _handle_test_output_file(ctx, report_type, test_data, kwds):
         ctx.vlog(message, exception=True)
         raise
 
-    try:
-        with open(path, 'w') as handle:
-            handle.write(contents)
-    except Exception:
-        message = "Problem writing output file %s for %s" % (
-            kwd_name, path
-        )
-        ctx.vlog(message, exception=True)
-        raise
-
 
 def _handle_summary(
     structured_data,
@@ -328,6 +533,122 @@ def _structured_report_file(kwds, config):
     return structured_report_file
 
 
+class _GalaxyTestCache(object):
+    """Track which tools' tests can be skipped using cached results.
+
+    Disabled unless ``--test_cache`` is set, and when re-running failed or
+    installed tool tests.
+    """
+
+    def __init__(self, ctx, config, **kwds):
+        self.enabled = (
+            kwds.get("test_cache", False) and
+            not kwds.get("failed", False) and
+            not kwds.get("installed", False)
+        )
+        self.cached_tests = []
+        self.uncached_test_ids = None
+        self._uncached = {}
+        # Tool names in runnable order, each with its cached tests (or None).
+        self._tools = []
+        galaxy_version = galaxy_version_id(ctx, galaxy_root=config.galaxy_root) if self.enabled else None
+        if galaxy_version is None:
+            if self.enabled:
+                ctx.vlog("Galaxy version cannot be determined, not caching test results.")
+            self.enabled = False
+            return
+
+        cache_directory = os.path.join(ctx.workspace, "test_cache")
+        self._cache = TestResultCache(cache_directory, "galaxy_run_tests:%s" % galaxy_version, **kwds)
+        self.uncached_test_ids = []
+        for tool_id, runnable in _tool_runnables(ctx, config.runnables):
+            tool_name = tool_id.replace(" ", "_")
+            key = self._cache.key(runnable)
+            cached_tests = self._cache.get(runnable, key=key)
+            if cached_tests is not None:
+                ctx.vlog("Using cached test results for tool [%s]" % tool_id)
+                self.cached_tests.extend(cached_tests)
+            else:
+                self._uncached[tool_name] = (runnable, key)
+                self.uncached_test_ids.append(test_structures.tool_test_id(tool_id))
+            self._tools.append((tool_name, cached_tests))
+
+    def merge(self, test_results):
+        """Cache newly passing tools and merge cached entries into ``test_results`` in tool order."""
+        if not self.enabled:
+            return
+
+        tests_by_tool = {}
+        for test in test_results.structured_data_tests:
+            tool_name = _test_tool_name(test)
+            tests_by_tool.setdefault(tool_name, []).append(test)
+        for tool_name, (runnable, key) in self._uncached.items():
+            self._cache.put(runnable, tests_by_tool.get(tool_name, []), key=key)
+
+        if self.cached_tests:
+            tests = []
+            for tool_name, cached_tests in self._tools:
+                if cached_tests is not None:
+                    tests.extend(cached_tests)
+                else:
+                    tests.extend(tests_by_tool.get(tool_name, []))
+            tool_names = set(tool_name for (tool_name, _) in self._tools)
+            tests.extend(t for t in test_results.structured_data_tests if _test_tool_name(t) not in tool_names)
+
+            sd = test_results.sd
+            sd.set_tests(tests)
+            sd.structured_data["summary"]["num_tests"] += len(self.cached_tests)
+            sd.read_summary()
+            sd.update()
+            self._merge_xunit(test_results.output_xml_path)
+
+    def _merge_xunit(self, xunit_report_file):
+        # Galaxy's xUnit report only covers the tests it ran, append the cached ones.
+        if not os.path.exists(xunit_report_file):
+            return
+        cached_xunit_report_file = "%s.cached" % xunit_report_file
+        merged_xunit_report_file = "%s.merged" % xunit_report_file
+        try:
+            test_structures.write_xunit_report(self.cached_tests, cached_xunit_report_file)
+            test_structures.merge_xunit_reports(
+                [xunit_report_file, cached_xunit_report_file], merged_xunit_report_file
+            )
+            shutil.move(merged_xunit_report_file, xunit_report_file)
+        finally:
+            if os.path.exists(cached_xunit_report_file):
+                os.remove(cached_xunit_report_file)
+
+    def cached_only_results(self, structured_report_file, xunit_report_file):
+        """Return structured data and exit code for cached tests without running Galaxy.
+
+        Reports Galaxy would have written are written for the cached tests.
+        """
+        sd = StructuredData(
+            json_path=structured_report_file,
+            data={"version": "0.1", "tests": self.cached_tests},
+        )
+        sd.calculate_summary_data()
+        sd.set_exit_code(EXIT_CODE_OK)
+        sd.update()
+        test_structures.write_xunit_report(self.cached_tests, xunit_report_file)
+        return sd.structured_data, EXIT_CODE_OK
+
+
+def _tool_runnables(ctx, runnables):
+    for runnable in runnables:
+        if runnable.type == RunnableType.galaxy_tool:
+            yield tool_summary(ctx, runnable.path).parse_id(), runnable
+        elif runnable.type == RunnableType.directory:
+            for (tool_path, tool_summary_) in yield_tool_summaries_on_paths(ctx, [runnable.path]):
+                tool_runnable = for_path(tool_path)
+                if tool_runnable.type == RunnableType.galaxy_tool:
+                    yield tool_summary_.parse_id(), tool_runnable
+
+
+def _test_tool_name(test):
+    return test_structures.case_id(raw_id=test["id"]).name
+
+
 class _FileChangeTracker(object):
 
     def __init__(self, path):
@@ -348,6 +669,8 @@ class _FileChangeTracker(object):
 
 __all__ = (
     "run_in_config",
+    "run_in_instances",
+    "run_in_pooled_galaxy",
     "handle_reports",
     "handle_reports_and_summary",
 )
@@ -10,10 +10,16 @@ from planemo.io import error
 from planemo.test.results import StructuredData as BaseStructuredData
 
 
+TOOL_TEST_ID_TEMPLATE = "functional.test_toolbox:TestForTool_%s"
 RUN_TESTS_CMD = (
-    "sh run_tests.sh $COMMON_STARTUP_ARGS --report_file %s %s %s %s"
+    "sh run_tests.sh $COMMON_STARTUP_ARGS %s--report_file %s %s %s %s"
 )
+SKIP_COMMON_STARTUP_ARG = "--skip-common-startup "
 
+# Child elements of an xUnit testcase and the testsuite attribute counting them.
+XUNIT_PROBLEM_COUNTS = {"error": "errors", "failure": "failures", "skipped": "skip"}
+# Structured data test statuses and the xUnit testcase child element describing them.
+STATUS_XUNIT_PROBLEMS = {"error": "error", "failure": "failure", "skip": "skipped"}
 NO_STRUCTURED_FILE = (
     "Warning: Problem with target Galaxy, it did not "
     "produce a structured test results file [%s] - summary "
@@ -31,12 +37,16 @@ class GalaxyTestCommand(object):
         structured_report_file,
         failed=False,
         installed=False,
+        test_ids=None,
+        skip_common_startup=False,
     ):
         self.html_report_file = html_report_file
         self.xunit_report_file = xunit_report_file
         self.structured_report_file = structured_report_file
         self.failed = failed
         self.installed = installed
+        self.test_ids = test_ids
+        self.skip_common_startup = skip_common_startup
 
     def build(self):
         xunit_report_file = self.xunit_report_file
@@ -58,7 +68,10 @@ class GalaxyTestCommand(object):
                 sd = StructuredData(self.structured_report_file)
                 failed_ids = sd.failed_ids
                 tests = " ".join(failed_ids)
-        return RUN_TESTS_CMD % (html_report_file, xunit_arg, sd_arg, tests)
+            elif self.test_ids:
+                tests = " ".join(self.test_ids)
+        startup_arg = SKIP_COMMON_STARTUP_ARG if self.skip_common_startup else ""
+        return RUN_TESTS_CMD % (startup_arg, html_report_file, xunit_arg, sd_arg, tests)
 
 
 class StructuredData(BaseStructuredData):
@@ -70,8 +83,20 @@ class StructuredData(BaseStructuredData):
         super(StructuredData, self).__init__(json_path)
 
     def merge_xunit(self, xunit_root):
+        self._merge_xunit_summary(xunit_root.attrib)
+        for testcase_el in xunit_t_elements_from_root(xunit_root):
+            self._merge_xunit_case(testcase_el)
+
+    def merge_xunit_report(self, xunit_report_path):
+        """Merge an xUnit report into this data without building its whole tree."""
+        for event, el in _iterparse_xunit(xunit_report_path):
+            if event == "start":
+                self._merge_xunit_summary(el.attrib)
+            else:
+                self._merge_xunit_case(el)
+
+    def _merge_xunit_summary(self, xunit_attrib):
         self.has_details = True
-        xunit_attrib = xunit_root.attrib
         num_tests = int(xunit_attrib.get("tests", 0))
         num_failures = int(xunit_attrib.get("failures", 0))
         num_errors = int(xunit_attrib.get("errors", 0))
@@ -85,23 +110,23 @@ class StructuredData(BaseStructuredData):
 
         self.structured_data["summary"] = summary
 
-        for testcase_el in xunit_t_elements_from_root(xunit_root):
-            test = case_id(testcase_el)
-            test_data = self.structured_data_by_id.get(test.id)
-            if not test_data:
-                continue
-            problem_el = None
-            for problem_type in ["skip", "failure", "error"]:
-                problem_el = testcase_el.find(problem_type)
-                if problem_el is not None:
-                    break
+    def _merge_xunit_case(self, testcase_el):
+        test = case_id(testcase_el)
+        test_data = self.structured_data_by_id.get(test.id)
+        if not test_data:
+            return
+        problem_el = None
+        for problem_type in ["skip", "failure", "error"]:
+            problem_el = testcase_el.find(problem_type)
             if problem_el is not None:
-                status = problem_el.tag
-                test_data["problem_type"] = problem_el.attrib["type"]
-                test_data["problem_log"] = problem_el.text
-            else:
-                status = "success"
-            test_data["status"] = status
+                break
+        if problem_el is not None:
+            status = problem_el.tag
+            test_data["problem_type"] = problem_el.attrib["type"]
+            test_data["problem_log"] = problem_el.text
+        else:
+            status = "success"
+        test_data["status"] = status
 
 
 class GalaxyTestResults(object):
@@ -118,19 +143,29 @@ class GalaxyTestResults(object):
         exit_code,
     ):
         self.output_html_path = output_html_path
+        self.output_xml_path = output_xml_path
         sd = StructuredData(output_json_path)
         self.sd = sd
-        self.structured_data = sd.structured_data
-        self.structured_data_tests = sd.structured_data_tests
-        self.structured_data_by_id = sd.structured_data_by_id
 
-        self.xunit_tree = parse_xunit_report(output_xml_path)
-        sd.merge_xunit(self._xunit_root)
+        self._xunit_tree = None
+        sd.merge_xunit_report(output_xml_path)
 
         self.sd.set_exit_code(exit_code)
         self.sd.read_summary()
         self.sd.update()
 
+    @property
+    def structured_data(self):
+        return self.sd.structured_data
+
+    @property
+    def structured_data_tests(self):
+        return self.sd.structured_data_tests
+
+    @property
+    def structured_data_by_id(self):
+        return self.sd.structured_data_by_id
+
     @property
     def exit_code(self):
         return self.sd.exit_code
@@ -147,6 +182,12 @@ class GalaxyTestResults(object):
     def num_problems(self):
         return self.sd.num_problems
 
+    @property
+    def xunit_tree(self):
+        if self._xunit_tree is None:
+            self._xunit_tree = parse_xunit_report(self.output_xml_path)
+        return self._xunit_tree
+
     @property
     def _xunit_root(self):
         return self.xunit_tree.getroot()
@@ -157,7 +198,7 @@ class GalaxyTestResults(object):
 
     @property
     def xunit_testcase_elements(self):
-        return xunit_t_elements_from_root(self._xunit_root)
+        return iter_xunit_cases(self.output_xml_path)
 
 
 def xunit_t_elements_from_root(xunit_root):
@@ -169,10 +210,84 @@ def parse_xunit_report(xunit_report_path):
     return ET.parse(xunit_report_path)
 
 
+def iter_xunit_cases(xunit_report_path):
+    """Lazily yield the testcase elements of an xUnit report.
+
+    Each element is discarded once the next is parsed, so memory use does not
+    grow with the size of the report.
+    """
+    for event, el in _iterparse_xunit(xunit_report_path):
+        if event == "end":
+            yield el
+
+
+def merge_xunit_reports(xunit_report_paths, output_path):
+    """Write the testcases of several xUnit reports to a single report at ``output_path``."""
+    suite_el = ET.Element("testsuite", name="nosetests")
+    counts = dict(tests=0, errors=0, failures=0, skip=0)
+    for xunit_report_path in xunit_report_paths:
+        for testcase_el in iter_xunit_cases(xunit_report_path):
+            counts["tests"] += 1
+            for child_el in testcase_el:
+                if child_el.tag in XUNIT_PROBLEM_COUNTS:
+                    counts[XUNIT_PROBLEM_COUNTS[child_el.tag]] += 1
+            suite_el.append(testcase_el)
+    for key, count in counts.items():
+        suite_el.set(key, str(count))
+    ET.ElementTree(suite_el).write(output_path, encoding="UTF-8", xml_declaration=True)
+
+
+def write_xunit_report(tests, output_path):
+    """Write an xUnit report describing structured data ``tests`` to ``output_path``.
+
+    Used for tests that did not run in Galaxy (e.g. cached results), so the
+    report has the same testcase ids as ``run_tests.sh`` would have written.
+    """
+    suite_el = ET.Element("testsuite", name="nosetests")
+    counts = dict(tests=0, errors=0, failures=0, skip=0)
+    for test in tests:
+        data = test.get("data", None) or {}
+        classname, _, name = test["id"].rpartition(".")
+        testcase_el = ET.SubElement(suite_el, "testcase", classname=classname, name=name)
+        testcase_el.set("time", str(data.get("time_seconds", None) or 0))
+        counts["tests"] += 1
+        problem_tag = STATUS_XUNIT_PROBLEMS.get(data.get("status", None), None)
+        if problem_tag is not None:
+            problem_el = ET.SubElement(testcase_el, problem_tag, type=data.get("problem_type", None) or "")
+            problem_el.text = data.get("problem_log", None)
+            counts[XUNIT_PROBLEM_COUNTS[problem_tag]] += 1
+    for key, count in counts.items():
+        suite_el.set(key, str(count))
+    ET.ElementTree(suite_el).write(output_path, encoding="UTF-8", xml_declaration=True)
+
+
+def _iterparse_xunit(xunit_report_path):
+    # Yield ("start", root) and then ("end", testcase) for each testcase
+    # directly below the root - dropping each testcase once handled.
+    root = None
+    depth = 0
+    for event, el in ET.iterparse(xunit_report_path, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if root is None:
+                root = el
+                yield event, el
+        else:
+            depth -= 1
+            if depth == 1 and el.tag == "testcase":
+                yield event, el
+                root.remove(el)
+
+
 def find_cases(xunit_root):
     return xunit_root.findall("testcase")
 
 
+def tool_test_id(tool_id):
+    """Return the ``run_tests.sh`` selector for all tests of the supplied tool id."""
+    return TOOL_TEST_ID_TEMPLATE % tool_id.replace(" ", "_")
+
+
 def case_id(testcase_el=None, raw_id=None):
     if raw_id is None:
         assert testcase_el is not None
@@ -0,0 +1,167 @@
+"""Wait for Galaxy jobs, histories and workflow invocations to finish.
+
+A :class:`GalaxyStateWatcher` tracks every job, history and invocation being
+waited on for a Galaxy user - possibly from many threads at once - and
+refreshes their states together, with at most one refresh of each kind of
+object in flight at a time. Jobs are listed in one batched API request,
+histories and invocations are requested individually. Each wait backs off
+from ``POLLING_DELAY`` up to ``MAX_POLLING_DELAY`` seconds between checks
+the longer its object takes to reach a terminal state.
+"""
+import threading
+import time
+
+NON_TERMINAL_STATES = ["running", "queued", "new", "ready"]
+DEFAULT_TIMEOUT = 100
+POLLING_DELAY = 0.25
+MAX_POLLING_DELAY = 5.0
+POLLING_BACKOFF = 1.5
+
+JOB = "job"
+HISTORY = "history"
+INVOCATION = "invocation"
+
+
+class GalaxyStateWatcher(object):
+    """Share state polling between everything waiting on one Galaxy instance."""
+
+    def __init__(self, gi, polling_delay=POLLING_DELAY, max_polling_delay=MAX_POLLING_DELAY):
+        self.gi = gi
+        self.polling_delay = polling_delay
+        self.max_polling_delay = max_polling_delay
+        self._lock = threading.Lock()
+        # kind -> {key: number of waiters}
+        self._watched = {JOB: {}, HISTORY: {}, INVOCATION: {}}
+        self._states = {}
+        self._refreshed = {}
+        self._refreshing = set()
+        # Number of fetches started - and how many had started when each
+        # key was watched, so fetches older than a wait are not trusted.
+        self._fetches = 0
+        self._watch_fetches = {}
+
+    def wait_for_job(self, job_id, timeout=DEFAULT_TIMEOUT):
+        """Wait for job to reach a terminal state and return that state."""
+        return self._wait(JOB, job_id, timeout)
+
+    def wait_for_history(self, history_id, timeout=DEFAULT_TIMEOUT):
+        """Wait for history to reach a terminal state and return that state."""
+        return self._wait(HISTORY, history_id, timeout)
+
+    def wait_for_invocation(self, workflow_id, invocation_id, timeout=DEFAULT_TIMEOUT):
+        """Wait for a workflow invocation to be scheduled (or fail) and return its state."""
+        return self._wait(INVOCATION, (workflow_id, invocation_id), timeout)
+
+    def _wait(self, kind, key, timeout):
+        self._watch(kind, key)
+        try:
+            start = time.time()
+            delay = self.polling_delay
+            while True:
+                state = self._state(kind, key)
+                if state is not None and str(state) not in NON_TERMINAL_STATES:
+                    return state
+                if time.time() - start > timeout:
+                    raise Exception("Timed out waiting on %s state." % kind)
+                time.sleep(delay)
+                delay = min(delay * POLLING_BACKOFF, self.max_polling_delay)
+        finally:
+            self._unwatch(kind, key)
+
+    def _watch(self, kind, key):
+        with self._lock:
+            watched = self._watched[kind]
+            if key not in watched:
+                # Don't trust a state cached for an earlier wait on this key.
+                self._states.pop((kind, key), None)
+                self._watch_fetches[(kind, key)] = self._fetches
+            watched[key] = watched.get(key, 0) + 1
+
+    def _unwatch(self, kind, key):
+        with self._lock:
+            watched = self._watched[kind]
+            watched[key] -= 1
+            if not watched[key]:
+                del watched[key]
+                self._states.pop((kind, key), None)
+                self._watch_fetches.pop((kind, key), None)
+
+    def _state(self, kind, key):
+        with self._lock:
+            state = self._states.get((kind, key), None)
+            stale = time.time() - self._refreshed.get(kind, 0) >= self.polling_delay
+            if kind in self._refreshing or not (stale or state is None):
+                # Another waiter is refreshing or the state is fresh enough.
+                return state
+            self._refreshing.add(kind)
+            self._fetches += 1
+            fetch = self._fetches
+            keys = list(self._watched[kind].keys())
+
+        # Don't hold the lock during API requests, so other waiters only
+        # wait on the lock for cached states rather than on Galaxy.
+        states = {}
+        try:
+            states = self._fetch_states(kind, keys)
+        finally:
+            with self._lock:
+                self._refreshing.discard(kind)
+                for state_key, state in states.items():
+                    if self._watch_fetches.get((kind, state_key), fetch) < fetch:
+                        self._states[(kind, state_key)] = state
+                self._refreshed[kind] = time.time()
+        return states.get(key, None)
+
+    def _fetch_states(self, kind, keys):
+        if kind == JOB:
+            return self._job_states(keys)
+        elif kind == HISTORY:
+            return self._history_states(keys)
+        else:
+            return self._invocation_states(keys)
+
+    def _job_states(self, job_ids):
+        states = {}
+        if len(job_ids) > 1:
+            # Finished jobs drop out of this listing and are checked individually below.
+            jobs = self._get_json("jobs", params={"state": NON_TERMINAL_STATES})
+            for job in jobs:
+                if job["id"] in job_ids:
+                    states[job["id"]] = job["state"]
+        for job_id in job_ids:
+            if job_id not in states:
+                states[job_id] = self.gi.jobs.show_job(job_id)["state"]
+        return states
+
+    def _history_states(self, history_ids):
+        # Only the watched histories are requested - listing every history of
+        # the user each tick gets slower the more histories tests create.
+        states = {}
+        for history_id in history_ids:
+            history = self._get_json("histories/%s" % history_id, params={"keys": "state"})
+            if "state" not in history:
+                # Galaxy ignored keys, fall back to the full history.
+                history = self.gi.histories.show_history(history_id)
+            states[history_id] = history["state"]
+        return states
+
+    def _get_json(self, path, params):
+        # Not every supported bioblend version exposes these parameters
+        # (job states, history keys), so call the API directly.
+        response = self.gi.make_get_request("%s/%s" % (self.gi.url, path), params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def _invocation_states(self, keys):
+        # Galaxy has no API to list the invocations of several workflows at once.
+        states = {}
+        for workflow_id, invocation_id in keys:
+            invocation = self.gi.workflows.show_invocation(workflow_id, invocation_id)
+            states[(workflow_id, invocation_id)] = invocation["state"]
+        return states
+
+
+__all__ = (
+    "DEFAULT_TIMEOUT",
+    "GalaxyStateWatcher",
+)
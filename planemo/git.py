@@ -79,7 +79,7 @@ def diff(ctx, directory, range):
     stdout, _ = io.communicate(
         cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
     )
-    return [l.strip() for l in text_type(stdout).splitlines() if l]
+    return [l.strip() for l in _decode(stdout).splitlines() if l]
 
 
 def clone(*args, **kwds):
@@ -91,13 +91,13 @@ def clone(*args, **kwds):
     return io.communicate(command)
 
 
-def rev(ctx, directory):
+def rev(ctx, directory, revision="HEAD"):
     """Raw revision for git directory specified.
 
     Throws ``RuntimeError`` if not a git directory.
     """
-    cmd_template = "cd '%s' && git rev-parse HEAD"
-    cmd = cmd_template % directory
+    cmd_template = "cd '%s' && git rev-parse '%s'"
+    cmd = cmd_template % (directory, revision)
     stdout, _ = io.communicate(
         cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
     )
@@ -121,3 +121,9 @@ def rev_if_git(ctx, directory):
         return the_rev
     except RuntimeError:
         return None
+
+
+def _decode(output):
+    if isinstance(output, bytes):
+        output = output.decode("utf-8")
+    return text_type(output)
@@ -158,6 +158,17 @@ def publish_as_gist_file(ctx, path, name="index"):
     return gist.files[name].raw_url
 
 
+def get_github_auth(ctx):
+    """Return ``(username, password)`` for Github API requests or ``None`` if not configured."""
+    try:
+        github_config = _get_raw_github_config(ctx)
+    except KeyError:
+        return None
+    if not github_config or "username" not in github_config or "password" not in github_config:
+        return None
+    return (github_config["username"], github_config["password"])
+
+
 def get_repository_object(ctx, name):
     github_object = get_github_config(ctx, allow_anonymous=True)
     return github_object._github.get_repo(name)
@@ -167,6 +178,7 @@ __all__ = (
     "clone_fork_branch",
     "ensure_hub",
     "fork",
+    "get_github_auth",
     "get_github_config",
     "get_hub_env",
     "publish_as_gist_file",
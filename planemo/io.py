@@ -7,15 +7,13 @@ import os
 import shutil
 import sys
 import tempfile
+import threading
 import time
 
 from sys import platform as _platform
 from xml.sax.saxutils import escape
 
 import click
-
-from galaxy.tools.deps import commands
-from galaxy.tools.deps.commands import download_command
 from six import StringIO
 
 from .exit_codes import (
@@ -28,6 +26,7 @@ IS_OS_X = _platform == "darwin"
 
 
 def communicate(cmds, **kwds):
+    commands = _galaxy_commands()
     if isinstance(cmds, list):
         cmds = commands.argv_to_str(cmds)
     info(cmds)
@@ -46,7 +45,14 @@ def communicate(cmds, **kwds):
 
 def shell(cmds, **kwds):
     info(cmds)
-    return commands.shell(cmds, **kwds)
+    return _galaxy_commands().shell(cmds, **kwds)
+
+
+def _galaxy_commands():
+    # Importing galaxy.tools.deps is slow and this module is imported by the
+    # CLI entry point itself, so defer it until a command is actually run.
+    from galaxy.tools.deps import commands
+    return commands
 
 
 def info(message, *args):
@@ -95,7 +101,7 @@ def write_file(path, content, force=True):
 
 
 def untar_to(url, path=None, tar_args=None):
-    download_cmd = " ".join(download_command(url, quote_url=True))
+    download_cmd = " ".join(_galaxy_commands().download_command(url, quote_url=True))
     if tar_args:
         if path:
             if not os.path.exists(path):
@@ -243,11 +249,18 @@ class Capturing(list):
     to that, but this is easier.
 
     This swaps sys.std{out,err} with StringIOs and then makes that output
-    available.
+    available. Inside :func:`thread_routed_io` only output written by the
+    current thread is captured.
     """
     # http://stackoverflow.com/a/16571630
 
     def __enter__(self):
+        self._routed = isinstance(sys.stdout, _ThreadRoutedStream) and \
+            isinstance(sys.stderr, _ThreadRoutedStream)
+        if self._routed:
+            self._stringio_stdout = sys.stdout.push()
+            self._stringio_stderr = sys.stderr.push()
+            return self
         self._stdout = sys.stdout
         self._stderr = sys.stderr
         sys.stdout = self._stringio_stdout = StringIO()
@@ -260,10 +273,59 @@ class Capturing(list):
         self.extend([{'logger': 'stderr', 'data': x} for x in
                      self._stringio_stderr.getvalue().splitlines()])
 
+        if self._routed:
+            sys.stdout.pop()
+            sys.stderr.pop()
+            return
         sys.stdout = self._stdout
         sys.stderr = self._stderr
 
 
+class _ThreadRoutedStream(object):
+    """Send writes to the innermost capture of the writing thread (if any)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def push(self):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = []
+        buffer = StringIO()
+        buffers.append(buffer)
+        return buffer
+
+    def pop(self):
+        self._local.buffers.pop()
+
+    def write(self, data):
+        buffers = getattr(self._local, "buffers", None)
+        target = buffers[-1] if buffers else self.stream
+        target.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextlib.contextmanager
+def thread_routed_io():
+    """Allow threads to capture their own output with :class:`Capturing`.
+
+    Output written by threads outside of a capture still goes to the original
+    streams.
+    """
+    stdout = sys.stdout
+    stderr = sys.stderr
+    sys.stdout = _ThreadRoutedStream(stdout)
+    sys.stderr = _ThreadRoutedStream(stderr)
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
+        sys.stderr = stderr
+
+
 def tee_captured_output(output):
     """For messages captured with Capturing, send them to their correct
     locations so as to not interfere with normal user experience.
@@ -1,19 +1,15 @@
 """Utilities to help linting various targets."""
 from __future__ import absolute_import
+from __future__ import print_function
 
+import contextlib
+import importlib
 import os
-
-import requests
+import re
+from collections import namedtuple
+from multiprocessing import Pool
 
 from galaxy.tools.lint import LintContext
-from six.moves.urllib.error import (
-    HTTPError,
-    URLError,
-)
-from six.moves.urllib.request import (
-    Request,
-    urlopen,
-)
 
 import planemo.linters.biocontainer_registered
 import planemo.linters.conda_requirements
@@ -21,10 +17,29 @@ import planemo.linters.doi
 import planemo.linters.urls
 import planemo.linters.xsd
 
-from planemo.io import error
+from planemo.conda import load_best_practice_index
+from planemo.io import Capturing, error, info
 from planemo.shed import find_urls_for_xml
+from planemo.url_checker import UrlChecker
 from planemo.xml import validation
 
+DOI_BASE_URL = "http://dx.doi.org"
+# This is from Google Chome 53.0.2785.143, current at time of writing:
+BROWSER_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/53.0.2785.143 Safari/537.36"
+URL_CACHE_FILE_NAME = "lint_url_cache.json"
+
+# Linter functions only receive the XML and lint context, so the URL checker
+# shared across all targets being linted is tracked at the module level.
+_UrlChecking = namedtuple("_UrlChecking", ["checker", "urls", "dois"])
+_url_checking = None
+
+# A linter applied to a target and the (level, message) pairs it reported. Records
+# with no linter carry planemo's own progress messages (e.g. "Linting tool ...").
+LintRecord = namedtuple("LintRecord", ["linter", "status", "messages"])
+# How LintContext prints the result of applying a linter.
+LINTER_HEADER_PATTERN = re.compile(r"^Applying linter (\S+)\.\.\. (\w+)$")
+LINTER_MESSAGE_PATTERN = re.compile(r"^\.\. (\w+): (.*)$")
+
 
 def build_lint_args(ctx, **kwds):
     """Handle common report, error, and skip linting arguments."""
@@ -37,6 +52,10 @@ def build_lint_args(ctx, **kwds):
             skip = ",".join(skip)
 
     skip_types = [s.strip() for s in skip.split(",")]
+    if kwds.get("conda_requirements", False):
+        # Load the index linters search once - before any worker
+        # processes are forked so they share it (or its failure).
+        load_best_practice_index(ctx)
     lint_args = dict(
         level=report_level,
         fail_level=fail_level,
@@ -79,10 +98,160 @@ def handle_lint_complete(lint_ctx, lint_args, failed=False):
     if not failed:
         failed = lint_ctx.failed(lint_args["fail_level"])
     if failed:
-        error("Failed linting")
+        if isinstance(lint_ctx, RecordingLintContext):
+            lint_ctx.note("Failed linting", level="ERROR")
+        else:
+            error("Failed linting")
     return 1 if failed else 0
 
 
+class RecordingLintContext(LintContext):
+    """A :class:`LintContext` that records messages instead of printing them.
+
+    Messages are collected as :class:`LintRecord` tuples in ``records`` - these
+    can be sent back from worker processes and reported in order by the parent
+    with :func:`print_lint_records`.
+    """
+
+    def __init__(self, level, skip_types=[]):
+        super(RecordingLintContext, self).__init__(level, skip_types=skip_types)
+        self.records = []
+
+    def lint(self, name, lint_func, lint_target):
+        # Let LintContext decide what to report and record what it prints.
+        with Capturing() as captured:
+            super(RecordingLintContext, self).lint(name, lint_func, lint_target)
+        self.records.extend(_lint_output_records(captured))
+
+    def note(self, message, level="INFO"):
+        """Record a planemo progress message about the target being linted."""
+        self.records.append(LintRecord(None, None, [(level, message)]))
+
+
+def _lint_output_records(captured):
+    """Convert :class:`planemo.io.Capturing` output of ``LintContext.lint`` to records."""
+    records = []
+    for line in captured:
+        data = line["data"]
+        header = LINTER_HEADER_PATTERN.match(data)
+        message = LINTER_MESSAGE_PATTERN.match(data)
+        linter_record = records and records[-1].linter is not None
+        if line["logger"] == "stdout" and header:
+            records.append(LintRecord(header.group(1), header.group(2), []))
+        elif line["logger"] == "stdout" and message and linter_record:
+            records[-1].messages.append((message.group(1), message.group(2)))
+        elif line["logger"] == "stdout" and linter_record and records[-1].messages:
+            # Continuation of a multi-line lint message.
+            level, text = records[-1].messages[-1]
+            records[-1].messages[-1] = (level, text + "\n" + data)
+        else:
+            # Output of the linter itself, printed before LintContext reports.
+            level = "ERROR" if line["logger"] == "stderr" else "INFO"
+            records.append(LintRecord(None, None, [(level, data)]))
+    return records
+
+
+def print_lint_records(records):
+    """Print records in the same format :class:`LintContext` prints messages."""
+    for record in records:
+        if record.linter is None:
+            for (level, message) in record.messages:
+                (error if level == "ERROR" else info)(message)
+            continue
+        print("Applying linter %s... %s" % (record.linter, record.status))
+        for (level, message) in record.messages:
+            print(".. %s: %s" % (level, message))
+
+
+def lint_in_processes(worker, tasks, jobs):
+    """Map worker over tasks using ``jobs`` processes and print the results.
+
+    ``worker`` must be a picklable (module level) function returning a list of
+    ``(exit_code, records)`` pairs. Records are printed in the order of
+    ``tasks`` regardless of the order workers finish in. Returns the list
+    of exit codes.
+    """
+    exit_codes = []
+    if not tasks:
+        return exit_codes
+    pool = Pool(min(jobs, len(tasks)))
+    try:
+        for results in pool.imap(worker, tasks):
+            for (exit_code, records) in results:
+                print_lint_records(records)
+                exit_codes.append(exit_code)
+    finally:
+        pool.close()
+        pool.join()
+    return exit_codes
+
+
+def picklable_lint_args(lint_args):
+    """Replace linter modules in ``lint_args`` with module names to send to workers."""
+    lint_args = lint_args.copy()
+    lint_args["extra_modules"] = [m.__name__ for m in lint_args["extra_modules"]]
+    return lint_args
+
+
+def unpickle_lint_args(lint_args):
+    """Inverse of :func:`picklable_lint_args`."""
+    lint_args = lint_args.copy()
+    lint_args["extra_modules"] = [importlib.import_module(m) for m in lint_args["extra_modules"]]
+    return lint_args
+
+
+@contextlib.contextmanager
+def url_checking(ctx, **kwds):
+    """Share URL and DOI check results across every target linted in this context.
+
+    Results are cached in the planemo workspace for ``url_cache_ttl`` seconds
+    (settable in ``~/.planemo.yml``) so they are also reused across runs.
+    """
+    global _url_checking
+    urls = kwds.get("urls", False)
+    dois = kwds.get("doi", False)
+    if not (urls or dois):
+        yield
+        return
+
+    cache_path = os.path.join(ctx.workspace, URL_CACHE_FILE_NAME)
+    ttl = ctx.global_config.get("url_cache_ttl", None)
+    checker_kwds = {} if ttl is None else dict(ttl=int(ttl))
+    checker = UrlChecker(cache_path, **checker_kwds)
+    _url_checking = _UrlChecking(checker, urls, dois)
+    try:
+        yield
+    finally:
+        _url_checking = None
+        checker.save()
+
+
+def prefetch_urls(roots):
+    """Concurrently check URLs and DOIs referenced in the supplied XML roots.
+
+    Does nothing outside of a :func:`url_checking` context. Linters later
+    checking these targets reuse the results.
+    """
+    url_checking = _url_checking
+    if url_checking is None:
+        return
+    targets = []
+    for root in roots:
+        if url_checking.urls:
+            urls, docs = find_urls_for_xml(root)
+            targets.extend([(url, None) for url in urls])
+            targets.extend([(url, BROWSER_USER_AGENT) for url in docs])
+        if url_checking.dois:
+            targets.extend([(_doi_url(doi), None) for doi in _find_dois_for_root(root)])
+    url_checking.checker.check_all(targets)
+
+
+def _url_checker():
+    if _url_checking is not None:
+        return _url_checking.checker
+    return UrlChecker(threads=1)
+
+
 def lint_dois(tool_xml, lint_ctx):
     """Find referenced DOIs and check they have valid with http://dx.doi.org."""
     dois = find_dois_for_xml(tool_xml)
@@ -91,29 +260,38 @@ def lint_dois(tool_xml, lint_ctx):
 
 
 def find_dois_for_xml(tool_xml):
+    return _find_dois_for_root(tool_xml.getroot())
+
+
+def _find_dois_for_root(root):
     dois = []
-    for element in tool_xml.getroot().findall("citations"):
+    for element in root.findall("citations"):
         for citation in list(element):
             if citation.tag == 'citation' and citation.attrib.get('type', '') == 'doi':
                 dois.append(citation.text)
     return dois
 
 
+def _doi_url(publication_id):
+    doiless_publication_id = publication_id.split("doi:", 1)[-1]
+    return "%s/%s" % (DOI_BASE_URL, doiless_publication_id)
+
+
 def is_doi(publication_id, lint_ctx):
     """Check if dx.doi knows about the ``publication_id``."""
-    base_url = "http://dx.doi.org"
     doiless_publication_id = publication_id.split("doi:", 1)[-1]
-    url = "%s/%s" % (base_url, doiless_publication_id)
-    r = requests.get(url)
-    if r.status_code == 200:
+    result = _url_checker().check(_doi_url(publication_id))
+    if result.error:
+        lint_ctx.warn("Problem accessing dx.doi for %s: %s" % (publication_id, result.error))
+    elif result.status_code == 200:
         if publication_id != doiless_publication_id:
             lint_ctx.error("%s is valid, but Galaxy expects DOI without 'doi:' prefix" % publication_id)
         else:
             lint_ctx.info("%s is a valid DOI" % publication_id)
-    elif r.status_code == 404:
+    elif result.status_code == 404:
         lint_ctx.error("%s is not a valid DOI" % publication_id)
     else:
-        lint_ctx.warn("dx.doi returned unexpected status code %d" % r.status_code)
+        lint_ctx.warn("dx.doi returned unexpected status code %d" % result.status_code)
 
 
 def lint_xsd(lint_ctx, schema_path, path):
@@ -121,6 +299,17 @@ def lint_xsd(lint_ctx, schema_path, path):
     name = os.path.basename(path)
     validator = validation.get_validator(require=True)
     validation_result = validator.validate(schema_path, path)
+    _handle_validation_result(lint_ctx, name, validation_result)
+
+
+def lint_xsd_tree(lint_ctx, schema_path, tree, name):
+    """Lint an in-memory XML tree (described by ``name`` in messages) with supplied schema."""
+    validator = validation.get_validator(require=True)
+    validation_result = validator.validate_tree(schema_path, tree)
+    _handle_validation_result(lint_ctx, name, validation_result)
+
+
+def _handle_validation_result(lint_ctx, name, validation_result):
     if not validation_result.passed:
         msg = "Invalid %s found. Errors [%s]"
         msg = msg % (name, validation_result.output)
@@ -132,30 +321,16 @@ def lint_xsd(lint_ctx, schema_path, path):
 def lint_urls(root, lint_ctx):
     """Find referenced URLs and verify they are valid."""
     urls, docs = find_urls_for_xml(root)
-
-    # This is from Google Chome 53.0.2785.143, current at time of writing:
-    BROWSER_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/53.0.2785.143 Safari/537.36"
+    checker = _url_checker()
 
     def validate_url(url, lint_ctx, user_agent=None):
-        is_valid = True
-        if user_agent:
-            req = Request(url, headers={"User-Agent": user_agent})
+        result = checker.check(url, user_agent)
+        if result.error:
+            lint_ctx.error("URL Error %s accessing %s" % (result.error, url))
+        elif result.status_code >= 400 and result.status_code != 429:
+            # 429 is too many requests - not a problem with the URL.
+            lint_ctx.error("HTTP Error %s accessing %s" % (result.status_code, url))
         else:
-            req = url
-        try:
-            handle = urlopen(req)
-            handle.read(100)
-        except HTTPError as e:
-            if e.code == 429:
-                # too many requests
-                pass
-            else:
-                is_valid = False
-                lint_ctx.error("HTTP Error %s accessing %s" % (e.code, url))
-        except URLError as e:
-            is_valid = False
-            lint_ctx.error("URL Error %s accessing %s" % (str(e), url))
-        if is_valid:
             lint_ctx.info("URL OK %s" % url)
 
     for url in urls:
@@ -167,7 +342,16 @@ def lint_urls(root, lint_ctx):
 __all__ = (
     "build_lint_args",
     "handle_lint_complete",
+    "lint_in_processes",
     "lint_dois",
     "lint_urls",
     "lint_xsd",
+    "lint_xsd_tree",
+    "LintRecord",
+    "picklable_lint_args",
+    "prefetch_urls",
+    "print_lint_records",
+    "RecordingLintContext",
+    "unpickle_lint_args",
+    "url_checking",
 )
@@ -5,16 +5,41 @@ The extend Galaxy/galaxy-lib's features with planemo specific idioms.
 from __future__ import absolute_import
 
 import os
+import shutil
+import string
+import subprocess
+import tempfile
+from multiprocessing.pool import ThreadPool
 
+from galaxy.tools.deps import (
+    commands,
+    docker_util,
+)
 from galaxy.tools.deps.mulled.mulled_build import (
+    DEFAULT_BINDS,
     DEFAULT_CHANNELS,
+    DEFAULT_REPOSITORY_TEMPLATE,
     ensure_installed,
     InvolucroContext,
+    mull_targets,
+)
+from galaxy.tools.deps.mulled.util import (
+    build_target,
+    v2_image_name,
 )
-from galaxy.tools.deps.mulled.util import build_target
 
 from planemo.conda import collect_conda_target_lists
-from planemo.io import IS_OS_X, shell
+from planemo.docker import docker_host_args
+from planemo.io import (
+    Capturing,
+    error,
+    info,
+    IS_OS_X,
+    shell,
+    thread_routed_io,
+)
+
+MULL_LOGS_DIRECTORY = "mull_logs"
 
 
 def conda_to_mulled_targets(conda_targets):
@@ -64,9 +89,180 @@ def build_mull_target_kwds(ctx, **kwds):
     return target_kwds
 
 
+class MullBuild(object):
+    """A distinct combination of mulled targets and the image built for it."""
+
+    def __init__(self, targets, image, repository):
+        self.targets = targets
+        self.image = image
+        self.repository = repository
+
+    @property
+    def log_name(self):
+        return "%s.log" % self.image.replace(":", "_")
+
+
+def mulled_image_name(targets):
+    """Return the name ``mull_targets`` gives the image for ``targets``."""
+    targets = list(targets)
+    # Like mull_targets, force an image build for combinations of targets.
+    image_build = "0" if len(targets) > 1 else None
+    return v2_image_name(targets, image_build=image_build)
+
+
+def mull_builds(target_lists, namespace="biocontainers", repository_template=DEFAULT_REPOSITORY_TEMPLATE):
+    """Return a :class:`MullBuild` for each distinct image ``target_lists`` describe.
+
+    Tools sharing requirements share an image, so each image is only listed
+    once (in the order of the first target list describing it).
+    """
+    builds = []
+    seen_images = set()
+    for targets in target_lists:
+        targets = list(targets)
+        image = mulled_image_name(targets)
+        if image in seen_images:
+            continue
+        seen_images.add(image)
+        repository = string.Template(repository_template).safe_substitute(
+            namespace=namespace,
+            image=image,
+        )
+        builds.append(MullBuild(targets, image, repository))
+    return builds
+
+
+def local_image_exists(repository, **kwds):
+    """Return ``True`` if the Docker image ``repository`` is in the local image store.
+
+    Docker is invoked as described by the ``docker_cmd``, ``docker_sudo``,
+    ``docker_sudo_cmd`` and ``docker_host`` options in ``kwds``.
+    """
+    cmd = docker_util.command_shell("inspect", ["--type=image", repository], **docker_host_args(**kwds))
+    with open(os.devnull, "w") as devnull:
+        return commands.shell(cmd, stdout=devnull, stderr=devnull) == 0
+
+
+def mull(ctx, target_lists, **kwds):
+    """Build (and test or push) the distinct images for ``target_lists``.
+
+    The involucro context is resolved once for all builds. Unless
+    ``rebuild_existing`` is set, images already in the local Docker image
+    store are not built again - unless they are to be pushed. With ``jobs``
+    greater than 1 images are built concurrently, with the output of each
+    build written to a log in planemo's workspace. Returns an exit code.
+    """
+    mull_target_kwds = build_mull_target_kwds(ctx, **kwds)
+    command = kwds.get("mulled_command", "build-and-test")
+    builds = mull_builds(target_lists, namespace=mull_target_kwds["namespace"])
+    if not kwds.get("rebuild_existing", False) and "push" not in command:
+        builds = _skip_existing(builds, **kwds)
+    jobs = kwds.get("jobs", 1) or 1
+    if jobs < 2 or len(builds) < 2:
+        failed = []
+        for build in builds:
+            build_kwds = dict(mull_target_kwds, binds=list(DEFAULT_BINDS))
+            if mull_targets(build.targets, command=command, **build_kwds):
+                failed.append(build.image)
+        for image in failed:
+            error("Failed to mull image [%s]." % image)
+        return 1 if failed else 0
+
+    log_directory = os.path.join(ctx.workspace, MULL_LOGS_DIRECTORY)
+    if not os.path.exists(log_directory):
+        os.makedirs(log_directory)
+    info("Building %d images with %d jobs, logs are written to %s." % (len(builds), jobs, log_directory))
+    tasks = [(build, mull_target_kwds, command, log_directory) for build in builds]
+    pool = ThreadPool(min(jobs, len(builds)))
+    failed = False
+    try:
+        with thread_routed_io():
+            for build, exit_code, log_path in pool.imap(_mull_logged, tasks):
+                if exit_code:
+                    failed = True
+                    error("Failed to mull image [%s], see %s." % (build.image, log_path))
+                else:
+                    info("Mulled image [%s]." % build.image)
+    finally:
+        pool.close()
+        pool.join()
+    return 1 if failed else 0
+
+
+def _skip_existing(builds, **kwds):
+    remaining = []
+    for build in builds:
+        if local_image_exists(build.repository, **kwds):
+            info("Image [%s] already exists locally, skipping." % build.repository)
+        else:
+            remaining.append(build)
+    return remaining
+
+
+def _mull_logged(args):
+    build, mull_target_kwds, command, log_directory = args
+    log_path = os.path.join(log_directory, build.log_name)
+    working_directory = tempfile.mkdtemp(prefix="planemo_mull_")
+    try:
+        with open(log_path, "w") as log:
+            involucro_context = _LoggedInvolucroContext(
+                mull_target_kwds["involucro_context"], working_directory, log
+            )
+            build_kwds = dict(mull_target_kwds, involucro_context=involucro_context, binds=list(DEFAULT_BINDS))
+            try:
+                # mull_targets prints the involucro command, the log records it.
+                with Capturing():
+                    exit_code = mull_targets(build.targets, command=command, **build_kwds)
+            except Exception as e:
+                log.write("Failed to mull targets: %s\n" % e)
+                exit_code = 1
+        return build, exit_code, log_path
+    finally:
+        shutil.rmtree(working_directory, ignore_errors=True)
+
+
+class _LoggedInvolucroContext(InvolucroContext):
+    """Run involucro in ``working_directory`` writing its output to ``log``.
+
+    galaxy-lib runs involucro in - and creates the ``build`` directory it binds
+    into containers below - the current working directory, so builds running
+    concurrently each need a directory of their own.
+    """
+
+    def __init__(self, involucro_context, working_directory, log):
+        InvolucroContext.__init__(
+            self,
+            involucro_bin=os.path.abspath(involucro_context.involucro_bin),
+            verbose=involucro_context.verbose,
+        )
+        self.working_directory = working_directory
+        self.log = log
+
+    def exec_command(self, involucro_args):
+        cmd = " ".join(self.build_command(involucro_args))
+        self.log.write("%s\n" % cmd)
+        self.log.flush()
+        build_directory = os.path.join(self.working_directory, "build")
+        os.mkdir(build_directory)
+        try:
+            return commands.shell(
+                cmd,
+                cwd=self.working_directory,
+                stdout=self.log,
+                stderr=subprocess.STDOUT,
+            )
+        finally:
+            shutil.rmtree(build_directory, ignore_errors=True)
+
+
 __all__ = (
     "build_involucro_context",
     "build_mull_target_kwds",
     "collect_mulled_target_lists",
     "conda_to_mulled_targets",
+    "local_image_exists",
+    "mull",
+    "mull_builds",
+    "mulled_image_name",
+    "MullBuild",
 )
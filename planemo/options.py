@@ -515,6 +515,25 @@ def conda_global_option():
     )
 
 
+def conda_install_batch_option():
+    return planemo_option(
+        "--batch",
+        is_flag=True,
+        default=False,
+        help=("Build one environment per tool with all of its requirements "
+              "(as Galaxy resolves them) instead of one per requirement. Each "
+              "distinct set of requirements is solved once and the solution "
+              "is cached in planemo's workspace for ``test`` and ``serve``."),
+    )
+
+
+def conda_install_jobs_option():
+    return jobs_option(
+        help=("Number of environments to build concurrently with --batch "
+              "(defaults to 1)."),
+    )
+
+
 def required_tool_arg(allow_uris=False):
     """ Decorate click method as requiring the path to a single tool.
     """
@@ -905,6 +924,7 @@ def shed_target_options():
         shed_key_from_env_option(),
         shed_password_option(),
         shed_target_option(),
+        shed_retries_option(),
     )
 
 
@@ -1016,6 +1036,18 @@ def shed_fail_fast_option():
     )
 
 
+def shed_cache_realizations_option():
+    return planemo_option(
+        "--cache_realizations",
+        is_flag=True,
+        default=False,
+        use_global_config=True,
+        help="Keep realized repositories and their tarballs in planemo's "
+             "workspace and skip repositories whose contents are unchanged "
+             "since they were last linted or uploaded successfully."
+    )
+
+
 def lint_xsd_option():
     return planemo_option(
         "--xsd/--no_xsd",
@@ -1025,6 +1057,45 @@ def lint_xsd_option():
     )
 
 
+def shed_retries_option():
+    return planemo_option(
+        "--shed_retries",
+        type=int,
+        default=3,
+        use_global_config=True,
+        help=("Number of times to retry Tool Shed requests failing with a "
+              "connection problem or a transient HTTP error (defaults to 3). "
+              "Requests creating or uploading to repositories are only retried "
+              "if the connection to the Tool Shed could not be established. "
+              "Retries back off exponentially starting at one second."),
+    )
+
+
+def jobs_option(help="Number of jobs to run concurrently (defaults to 1).", use_global_config=False):
+    return planemo_option(
+        "--jobs",
+        type=int,
+        default=1,
+        use_global_config=use_global_config,
+        help=help,
+    )
+
+
+def lint_jobs_option():
+    return jobs_option(
+        help=("Number of processes used to lint tools or repositories in "
+              "parallel (defaults to 1). Output is still reported in order."),
+        use_global_config=True,
+    )
+
+
+def shed_jobs_option():
+    return jobs_option(
+        help=("Number of repositories to process concurrently (defaults to "
+              "1). Output is still reported in repository order."),
+    )
+
+
 def report_level_option():
     return planemo_option(
         "--report_level",
@@ -1090,15 +1161,100 @@ def tool_test_json():
     )
 
 
+def galaxy_pool_option():
+    return planemo_option(
+        "--galaxy_pool",
+        is_flag=True,
+        default=False,
+        use_global_config=True,
+        help=("Lease an already running Galaxy server from planemo's pool "
+              "of warm servers (booting one if none is idle) instead of "
+              "starting a fresh Galaxy, and return it to the pool afterward. "
+              "Galaxy tool tests are run against the leased server with "
+              "Galaxy's run_tests.sh (not combined with --instances). Pooled "
+              "servers keep running between planemo invocations, stop them "
+              "with 'planemo pool_clear'. Not supported with docker_galaxy."),
+    )
+
+
 def engine_options():
     return _compose(
         run_engine_option(),
+        galaxy_pool_option(),
+        job_timeout_option(),
+        link_inputs_option(),
         non_strict_cwl_option(),
         cwltool_no_container_option(),
         docker_galaxy_image_option(),
     )
 
 
+def job_timeout_option():
+    return planemo_option(
+        "--job_timeout",
+        type=int,
+        default=100,
+        use_global_config=True,
+        help=("Maximum number of seconds to wait for each Galaxy job, history "
+              "or workflow invocation to finish when running artifacts with "
+              "the Galaxy engine (defaults to 100)."),
+    )
+
+
+def link_inputs_option():
+    return planemo_option(
+        "--link_inputs",
+        is_flag=True,
+        default=False,
+        use_global_config=True,
+        help=("Link local input files into Galaxy through a data library "
+              "instead of uploading them. Only applies to Galaxy servers "
+              "started locally by planemo (not docker_galaxy)."),
+    )
+
+
+def test_parallel_option():
+    return planemo_option(
+        "--parallel",
+        type=int,
+        default=1,
+        use_global_config=True,
+        help=("Number of test cases to run concurrently when testing workflows "
+              "or CWL artifacts (defaults to 1). With cwltool each test case "
+              "runs in its own process, with Galaxy test cases are submitted "
+              "concurrently to one Galaxy server - each in its own history."),
+    )
+
+
+def test_instances_option():
+    return planemo_option(
+        "--instances",
+        type=int,
+        default=1,
+        use_global_config=True,
+        help=("Number of Galaxy instances to split tools between when testing "
+              "Galaxy tools (defaults to 1). Each instance gets its own "
+              "configuration, database, file path and port and instances run "
+              "concurrently. Tools are balanced between instances using test "
+              "durations recorded in previous test reports and results are "
+              "merged into a single report."),
+    )
+
+
+def test_postgres_database_option():
+    return planemo_option(
+        "--postgres_test_database",
+        is_flag=True,
+        default=False,
+        use_global_config=True,
+        help=("Run Galaxy tool tests against a throwaway postgres database "
+              "instead of sqlite. Planemo keeps a database migrated to the "
+              "target Galaxy's schema as a template and copies it for each "
+              "test instance, so Galaxy does not migrate a fresh database. "
+              "Connection settings are read from the --postgres_* options."),
+    )
+
+
 def test_report_options():
     return _compose(
         planemo_option(
@@ -1109,6 +1265,16 @@ def test_report_options():
             help=("Output test report (HTML - for humans) defaults to "
                   "tool_test_output.html."),
         ),
+        planemo_option(
+            "--test_output_html_mode",
+            type=click.Choice(["inline", "sharded"]),
+            use_global_config=True,
+            default="inline",
+            help=("Embed every test's details in the HTML report (inline) or "
+                  "write a compact, paginated index page with per-test details "
+                  "in shards alongside it that are loaded on demand (sharded) - "
+                  "use the latter for very large test suites."),
+        ),
         planemo_option(
             "--test_output_text",
             type=click.Path(file_okay=True, resolve_path=True),
@@ -1224,7 +1390,8 @@ def test_options():
             type=click.Path(file_okay=True, resolve_path=True),
             use_global_config=True,
             help=("Output test report (planemo json) defaults to "
-                  "tool_test_output.json."),
+                  "tool_test_output.json. Paths ending with .jsonl are "
+                  "written as JSON lines as each test finishes."),
             default="tool_test_output.json",
         ),
         planemo_option(
@@ -1240,6 +1407,16 @@ def test_options():
             help=("Summary style printed to planemo's standard output (see "
                   "output reports for more complete summary). Set to 'none' "
                   "to disable completely.")
+        ),
+        planemo_option(
+            "--test_cache",
+            is_flag=True,
+            default=False,
+            use_global_config=True,
+            help=("Skip tests for tools whose contents, test definitions, test "
+                  "data and target engine are unchanged since their tests last "
+                  "passed - reporting the cached results instead. Results are "
+                  "stored in planemo's workspace.")
         )
     )
 
@@ -1283,7 +1460,9 @@ def filter_exclude_from_option():
 def filter_changed_in_commit_option():
     return planemo_option(
         "--changed_in_commit_range",
-        help="Exclude paths unchanged in git commit range.",
+        help=("Exclude paths unchanged in git commit range. Tools and repositories "
+              "are kept if macros, test-data or included files they depend on "
+              "changed."),
     )
 
 
@@ -1306,6 +1485,30 @@ def ci_chunk_option():
     )
 
 
+def ci_chunk_durations_option():
+    return planemo_option(
+        "--chunk_durations",
+        type=click.Path(exists=True, file_okay=True, dir_okay=False, resolve_path=True),
+        multiple=True,
+        help=("Structured test data (e.g. tool_test_output.json) or xUnit report "
+              "from an earlier test run. If specified, tools and repositories "
+              "are split into --chunk_count chunks balancing their recorded "
+              "test times rather than by position. May be specified multiple "
+              "times."),
+    )
+
+
+def ci_chunk_default_duration_option():
+    return planemo_option(
+        "--chunk_default_duration",
+        type=float,
+        default=None,
+        help=("Expected test time in seconds for tools without a recorded "
+              "duration when chunking with --chunk_durations, defaults to "
+              "the mean recorded duration."),
+    )
+
+
 def ci_output_option():
     return planemo_option(
         "--output",
@@ -1321,6 +1524,8 @@ def ci_find_options():
         filter_changed_in_commit_option(),
         ci_chunk_count_option(),
         ci_chunk_option(),
+        ci_chunk_durations_option(),
+        ci_chunk_default_duration_option(),
         ci_output_option(),
     )
 
@@ -1600,6 +1805,24 @@ def mulled_action_option():
     )
 
 
+def mull_rebuild_existing_option():
+    return planemo_option(
+        "--rebuild_existing",
+        is_flag=True,
+        default=False,
+        help=("Build containers even if an image with the same name is "
+              "already present in the local Docker image store."),
+    )
+
+
+def mull_jobs_option():
+    return jobs_option(
+        help=("Number of containers to build concurrently (defaults to 1). "
+              "With more than one job the output of each build is logged "
+              "to a file in planemo's workspace."),
+    )
+
+
 def mulled_options():
     return _compose(
         mulled_conda_option(),
@@ -1,14 +1,58 @@
+import io
 import json
+import os
+import shutil
 
 from jinja2 import Environment, PackageLoader
 from pkg_resources import resource_string
 
+from planemo.test.results import StructuredDataEncoder
+
 env = Environment(loader=PackageLoader('planemo', 'reports'))
 
+HTML_MODE_INLINE = "inline"
+HTML_MODE_SHARDED = "sharded"
+HTML_MODES = [HTML_MODE_INLINE, HTML_MODE_SHARDED]
+DEFAULT_SHARD_SIZE = 50
+SHARD_FILENAME_TEMPLATE = "shard_%05d.js"
+
 
 def build_report(structured_data, report_type="html", **kwds):
     """ Use report_{report_type}.tpl to build page for report.
     """
+    environment = _report_environment(structured_data, report_type)
+    return template_data(environment, 'report_%s.tpl' % report_type)
+
+
+def write_report(path, structured_data, report_type="html", html_mode=HTML_MODE_INLINE, **kwds):
+    """ Stream report_{report_type}.tpl to ``path`` without building the page in memory.
+
+    With ``html_mode`` set to ``sharded`` the HTML report only embeds a
+    compact index of the tests - per-test details are written in shards to a
+    directory next to ``path`` and loaded by the page on demand.
+    """
+    if report_type == "html" and html_mode == HTML_MODE_SHARDED:
+        structured_data = _write_detail_shards(path, structured_data, **kwds)
+    environment = _report_environment(structured_data, report_type)
+    template = env.get_template('report_%s.tpl' % report_type)
+    with io.open(path, "w", encoding="utf-8") as handle:
+        for chunk in template.generate(**environment):
+            handle.write(chunk)
+
+
+def details_directory(path):
+    """Return the directory holding test detail shards for the HTML report at ``path``."""
+    return "%s_details" % os.path.splitext(path)[0]
+
+
+def template_data(environment, template_name="report_html.tpl", **kwds):
+    """Build an arbitrary templated page.
+    """
+    template = env.get_template(template_name)
+    return template.render(**environment)
+
+
+def _report_environment(structured_data, report_type):
     environment = dict(
         title="Tool Test Results (powered by Planemo)",
         raw_data=structured_data,
@@ -23,17 +67,53 @@ def build_report(structured_data, report_type="html", **kwds):
             'bootstrap_style': __style("bootstrap.min.css"),
             'jquery_script': __script("jquery.min"),
             'bootstrap_script': __script("bootstrap.min"),
-            'json': json,
+            'json': _StructuredDataJson,
         })
+    return environment
 
-    return template_data(environment, 'report_%s.tpl' % report_type)
 
+def _write_detail_shards(path, structured_data, shard_size=DEFAULT_SHARD_SIZE, **kwds):
+    """Write tests to detail shards in one pass and return the compact index data."""
+    directory = details_directory(path)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
 
-def template_data(environment, template_name="report_html.tpl", **kwds):
-    """Build an arbitrary templated page.
-    """
-    template = env.get_template(template_name)
-    return template.render(**environment)
+    index = []
+    shard = []
+
+    def write_shard():
+        shard_index = index[-1]["shard"]
+        shard_path = os.path.join(directory, SHARD_FILENAME_TEMPLATE % shard_index)
+        with io.open(shard_path, "w", encoding="utf-8") as f:
+            f.write(u"registerTestShard(%d, %s);\n" % (shard_index, _StructuredDataJson.dumps(shard)))
+        del shard[:]
+
+    for test in structured_data.get("tests", []):
+        test_data = test.get("data", None) or {}
+        index.append({
+            "id": test["id"],
+            "status": test_data.get("status", None),
+            "shard": len(index) // shard_size,
+        })
+        shard.append(test)
+        if len(shard) == shard_size:
+            write_shard()
+    if shard:
+        write_shard()
+
+    index_data = dict((k, v) for (k, v) in structured_data.items() if k != "tests")
+    index_data["tests"] = index
+    index_data["details_path"] = os.path.basename(directory)
+    return index_data
+
+
+class _StructuredDataJson(object):
+    """Stand-in for :mod:`json` in templates that handles lazily read tests."""
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj, cls=StructuredDataEncoder)
 
 
 def __style(filename):
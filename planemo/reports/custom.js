@@ -1,6 +1,120 @@
 
 var renderTestResults = function(testData) {
-	var summary = testData["summary"];
+	renderSummary(testData["summary"]);
+
+	var $sidebar = $("#nav-sidebar-tests");
+	for(var index in testData["tests"]) {
+		var testResult = new TestResult(testData["tests"][index]);
+		var $panel = renderTestPanel(testResult, index, $sidebar);
+		renderTestDetails(testResult, $panel.find(".panel-body"));
+		$(".main").append($panel);
+	}
+}
+
+var TESTS_PER_PAGE = 100;
+
+// Render the compact index of a sharded report - one page of tests at a time,
+// each test's details are only loaded from its shard once it is expanded.
+var renderTestIndex = function(indexData) {
+	renderSummary(indexData["summary"]);
+
+	var entries = indexData["tests"];
+	var page = 0;
+	var filtered = entries;
+
+	var applyFilters = function() {
+		var text = $("#test-filter-text").val().toLowerCase();
+		var status = $("#test-filter-status").val();
+		filtered = $.grep(entries, function(entry) {
+			var passed = entry["status"] == "success";
+			if(status == "passed" && !passed) {
+				return false;
+			}
+			if(status == "failed" && passed) {
+				return false;
+			}
+			return entry["id"].toLowerCase().indexOf(text) > -1;
+		});
+		page = 0;
+		renderPage();
+	};
+
+	var renderPage = function() {
+		var numPages = Math.max(1, Math.ceil(filtered.length / TESTS_PER_PAGE));
+		var $sidebar = $("#nav-sidebar-tests").empty();
+		var $panels = $("#test-panels").empty();
+		var start = page * TESTS_PER_PAGE;
+		$.each(filtered.slice(start, start + TESTS_PER_PAGE), function(i, entry) {
+			var testResult = new TestResult({"id": entry["id"], "data": {"status": entry["status"]}});
+			var $panel = renderTestPanel(testResult, start + i, $sidebar);
+			var $panelBody = $panel.find(".panel-body");
+			$panel.find(".panel-title a").one("click", function() {
+				$panelBody.text("Loading...");
+				loadTestDetails(indexData["details_path"], entry["shard"], entry["id"], function(test) {
+					$panelBody.empty();
+					renderTestDetails(new TestResult(test), $panelBody);
+				});
+			});
+			$panels.append($panel);
+		});
+		$("#test-pager-label").text("Page " + (page + 1) + " of " + numPages + " (" + filtered.length + " tests)");
+		$("#test-pager .previous").toggleClass("disabled", page == 0);
+		$("#test-pager .next").toggleClass("disabled", page >= numPages - 1);
+	};
+
+	$("#test-pager .previous a").click(function() {
+		if(page > 0) {
+			page -= 1;
+			renderPage();
+		}
+	});
+	$("#test-pager .next a").click(function() {
+		if((page + 1) * TESTS_PER_PAGE < filtered.length) {
+			page += 1;
+			renderPage();
+		}
+	});
+	$("#test-filter-text").on("input", applyFilters);
+	$("#test-filter-status").change(applyFilters);
+	renderPage();
+}
+
+// Detail shards are plain scripts calling registerTestShard so they can be
+// loaded from file:// URLs where AJAX requests are blocked.
+var testShards = {};
+var testShardCallbacks = {};
+
+var registerTestShard = function(shardIndex, tests) {
+	testShards[shardIndex] = tests;
+	var callbacks = testShardCallbacks[shardIndex] || [];
+	delete testShardCallbacks[shardIndex];
+	$.each(callbacks, function(i, callback) { callback(tests); });
+}
+
+var loadTestDetails = function(detailsPath, shardIndex, testId, callback) {
+	var findTest = function(tests) {
+		$.each(tests, function(i, test) {
+			if(test["id"] == testId) {
+				callback(test);
+				return false;
+			}
+		});
+	};
+	if(testShards[shardIndex]) {
+		findTest(testShards[shardIndex]);
+		return;
+	}
+	if(!testShardCallbacks[shardIndex]) {
+		testShardCallbacks[shardIndex] = [];
+		var shardName = "shard_" + ("0000" + shardIndex).slice(-5) + ".js";
+		var script = document.createElement("script");
+		script.src = detailsPath + "/" + shardName;
+		document.body.appendChild(script);
+	}
+	testShardCallbacks[shardIndex].push(findTest);
+}
+
+var renderSummary = function(summary) {
 	var numTests = summary["num_tests"];
 	var numProblems = summary["num_errors"] + summary["num_failures"] + summary["num_skips"];
 	var $overview = $("#overview-content");
@@ -18,85 +132,85 @@ var renderTestResults = function(testData) {
 		$overview.addClass("alert").addClass("alert-success").text("All " + numTests + " test(s) successfully executed.");
 		$progress.append($('<div class="progress-bar progress-bar-success" role="progressbar" style="width: 100%" />'));
 	}
+}
 
-	var $sidebar = $("#nav-sidebar-tests");
-	for(var index in testData["tests"]) {
-		var test = testData["tests"][index];
-		var testResult = new TestResult(test);
-		var rawId = testResult.rawId;
-
-		var panelType = testResult.passed ? "panel-success panel-success-custom" : "panel-danger panel-danger-custom";
-		var $panel = $('<div class="panel">');
-		$panel.addClass(panelType);
-
-		var $panelHeading = $('<div class="panel-heading">');
-		var $panelTitle = $('<div class="panel-title">');
-		var $a = $('<a class="collapsed" data-toggle="collapse">');
-		$a.attr("id", rawId);
-		$a.attr("data-target", "#collapse"  + index);
-		var testName = testResult.toolName + " (Test #" + (testResult.testIndex + 1) + (testResult.passed ? "" : ", Failed") + ")";
-		$a.text(testName);
-		var $navLink = $('<a>').attr('href', '#' + rawId).text(testName)
-		if(!testResult.passed) {
-			$navLink.addClass("text-danger text-danger-custom");
-		} else {
-			$navLink.addClass("text-success text-success-custom");
-		}
-		$sidebar.append($('<li>').append( $navLink ) );
-		$panelTitle.append($a)
-		$panelHeading.append($panelTitle);
-
-		var $panelBody = $('<div class="panel-body panel-collapse collapse" >');
-		$panelBody.attr("id", "collapse" + index);
-
-		var $status = $('<div>').text("status: " + testResult.status);
-		$panelBody.append($status);
-		if(testResult.problems.length > 0) {
-			var $problemsLabel = $('<div>').text("problems: ");
-			var $problemsDiv = $('<div style="margin-left:10px;">');
-			var $problemsUl = $('<ul>');
-			for(var problemIndex in testResult.problems) {
-				$problemsUl.append($('<li>').append($('<pre>').text(testResult.problems[problemIndex])));
-			}
-			$problemsDiv.append($problemsUl);
-			$panelBody.append($problemsLabel).append($problemsDiv);
-		}
-		var $commandLabel = $('<div>command:</div>');
-		var $stdoutLabel = $('<div>job standard output:</div>');
-		var $stderrLabel = $('<div>job standard error:</div>');
-		var $command;
-		if(testResult.command !== null) {
-			$command = $('<pre class="pre-scrollable" style="margin-left:10px;">').text(testResult.command);
-		} else {
-			$command = $('<div class="alert alert-warning" style="margin-left:10px;">').text("No command recorded.");
-		}
-		var $stdout;
-		if(testResult.stdout !== null) {
-			$stdout = $('<pre class="pre-scrollable" style="margin-left:10px;">').text(testResult.stdout);
-		} else {
-			$stdout = $('<div class="alert alert-warning" style="margin-left:10px;">').text("No standard output recorded.");
-		}
-		var $stderr;
-		if(testResult.stderr !== null) {
-			$stderr = $('<pre class="pre-scrollable" style="margin-left:10px;">').text(testResult.stderr);
-		} else {
-			$stderr = $('<div class="alert alert-warning" style="margin-left:10px;">').text("No standard error recorded.");
-		}
-		$panelBody
-			.append($commandLabel)
-			.append($command)
-			.append($stdoutLabel)
-			.append($stdout)
-			.append($stderrLabel)
-			.append($stderr);
-		if(!testResult.passed) {
-			var $logLabel = $('<div>log:</div>');
-			var $log = $('<pre class="pre-scrollable" style="margin-left: 10px;">').text(testResult.problemLog);
-			$panelBody.append($logLabel).append($log);
-		}
+// Build the collapsible panel (with an empty body) and sidebar link for a test.
+var renderTestPanel = function(testResult, index, $sidebar) {
+	var rawId = testResult.rawId;
 
-		$panel.append($panelHeading).append($panelBody);
-		$(".main").append($panel);
+	var panelType = testResult.passed ? "panel-success panel-success-custom" : "panel-danger panel-danger-custom";
+	var $panel = $('<div class="panel">');
+	$panel.addClass(panelType);
+
+	var $panelHeading = $('<div class="panel-heading">');
+	var $panelTitle = $('<div class="panel-title">');
+	var $a = $('<a class="collapsed" data-toggle="collapse">');
+	$a.attr("id", rawId);
+	$a.attr("data-target", "#collapse"  + index);
+	var testName = testResult.toolName + " (Test #" + (testResult.testIndex + 1) + (testResult.passed ? "" : ", Failed") + ")";
+	$a.text(testName);
+	var $navLink = $('<a>').attr('href', '#' + rawId).text(testName)
+	if(!testResult.passed) {
+		$navLink.addClass("text-danger text-danger-custom");
+	} else {
+		$navLink.addClass("text-success text-success-custom");
+	}
+	$sidebar.append($('<li>').append( $navLink ) );
+	$panelTitle.append($a)
+	$panelHeading.append($panelTitle);
+
+	var $panelBody = $('<div class="panel-body panel-collapse collapse" >');
+	$panelBody.attr("id", "collapse" + index);
+
+	$panel.append($panelHeading).append($panelBody);
+	return $panel;
+}
+
+var renderTestDetails = function(testResult, $panelBody) {
+	var $status = $('<div>').text("status: " + testResult.status);
+	$panelBody.append($status);
+	if(testResult.problems.length > 0) {
+		var $problemsLabel = $('<div>').text("problems: ");
+		var $problemsDiv = $('<div style="margin-left:10px;">');
+		var $problemsUl = $('<ul>');
+		for(var problemIndex in testResult.problems) {
+			$problemsUl.append($('<li>').append($('<pre>').text(testResult.problems[problemIndex])));
+		}
+		$problemsDiv.append($problemsUl);
+		$panelBody.append($problemsLabel).append($problemsDiv);
+	}
+	var $commandLabel = $('<div>command:</div>');
+	var $stdoutLabel = $('<div>job standard output:</div>');
+	var $stderrLabel = $('<div>job standard error:</div>');
+	var $command;
+	if(testResult.command !== null) {
+		$command = $('<pre class="pre-scrollable" style="margin-left:10px;">').text(testResult.command);
+	} else {
+		$command = $('<div class="alert alert-warning" style="margin-left:10px;">').text("No command recorded.");
+	}
+	var $stdout;
+	if(testResult.stdout !== null) {
+		$stdout = $('<pre class="pre-scrollable" style="margin-left:10px;">').text(testResult.stdout);
+	} else {
+		$stdout = $('<div class="alert alert-warning" style="margin-left:10px;">').text("No standard output recorded.");
+	}
+	var $stderr;
+	if(testResult.stderr !== null) {
+		$stderr = $('<pre class="pre-scrollable" style="margin-left:10px;">').text(testResult.stderr);
+	} else {
+		$stderr = $('<div class="alert alert-warning" style="margin-left:10px;">').text("No standard error recorded.");
+	}
+	$panelBody
+		.append($commandLabel)
+		.append($command)
+		.append($stdoutLabel)
+		.append($stdout)
+		.append($stderrLabel)
+		.append($stderr);
+	if(!testResult.passed) {
+		var $logLabel = $('<div>log:</div>');
+		var $log = $('<pre class="pre-scrollable" style="margin-left: 10px;">').text(testResult.problemLog);
+		$panelBody.append($logLabel).append($log);
 	}
 }
 
@@ -115,7 +229,6 @@ var TestResult = function(data) {
 	var testIndex = splitParts[1];
 	this.toolName = toolName;
 	this.testIndex = parseInt(testIndex);
-	console.log(data);
 	this.status = data["data"]["status"];
 	var job = data["data"]["job"];
 	if(job) {
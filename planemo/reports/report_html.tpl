@@ -60,6 +60,22 @@
           </div>
           <h2 id="tests">Tests</h2>
           <p>The remainder of this contains a description for each test executed to run these jobs.</p>
+          {% if raw_data.details_path is defined -%}
+          <div class="form-inline" id="test-filters">
+            <input type="text" class="form-control" id="test-filter-text" placeholder="Filter tests">
+            <select class="form-control" id="test-filter-status">
+              <option value="all">All tests</option>
+              <option value="failed">Failed tests</option>
+              <option value="passed">Passed tests</option>
+            </select>
+          </div>
+          <ul class="pager" id="test-pager">
+            <li class="previous"><a href="#tests">&larr; Previous</a></li>
+            <li id="test-pager-label"></li>
+            <li class="next"><a href="#tests">Next &rarr;</a></li>
+          </ul>
+          <div id="test-panels"></div>
+          {%- endif %}
         </div>
       </div>
     </div>
@@ -79,7 +95,11 @@
         .failure(function() { alert("Failed to load test data.")} );
       } else {
         var test_data = {{ json.dumps(raw_data) }};
+        {% if raw_data.details_path is defined -%}
+        renderTestIndex(test_data);
+        {%- else -%}
         renderTestResults(test_data);
+        {%- endif %}
       }
     </script>
   </body>
@@ -17,12 +17,12 @@ from galaxy.tools.loader_directory import (
     looks_like_a_tool_cwl,
     looks_like_a_tool_xml,
 )
-from galaxy.tools.parser import get_tool_source
 
 from planemo.exit_codes import EXIT_CODE_UNKNOWN_FILE_TYPE, ExitCodeException
 from planemo.galaxy.workflows import describe_outputs
 from planemo.io import error
 from planemo.test import check_output
+from planemo.tool_cache import load_tool_source
 
 TEST_SUFFIXES = [
     "-tests", "_tests", "-test", "_test"
@@ -182,6 +182,7 @@ class TestCase(object):
                            },
                            "output_problems": [],
                            "execution_problem": "",
+                           "time_seconds": 1.5,
                            "inputs" = {},
                            "problem_log": ""
                        }
@@ -220,6 +221,9 @@ class TestCase(object):
         job_info = run_response.job_info
         if job_info is not None:
             data_dict["job"] = job_info
+        time_seconds = getattr(run_response, "time_seconds", None)
+        if time_seconds is not None:
+            data_dict["time_seconds"] = time_seconds
         data_dict["inputs"] = self._job
         return dict(
             id=("%s_%s" % (self._test_id, self.index)),
@@ -267,7 +271,7 @@ class TestCase(object):
             RunnableType.cwl_tool,
             RunnableType.galaxy_tool,
         ]:
-            return get_tool_source(self.runnable.path).parse_id()
+            return load_tool_source(self.runnable.path).parse_id()
         else:
             return os.path.basename(self.runnable.path)
 
@@ -311,7 +315,7 @@ def get_outputs(runnable):
     if not runnable.is_single_artifact:
         raise NotImplementedError("Cannot generate outputs for a directory.")
     if runnable.type in [RunnableType.galaxy_tool, RunnableType.cwl_tool]:
-        tool_source = get_tool_source(runnable.path)
+        tool_source = load_tool_source(runnable.path)
         # TODO: do something with collections at some point
         output_datasets, _ = tool_source.parse_outputs(None)
         return [ToolOutput(o) for o in output_datasets.values()]
@@ -359,6 +363,9 @@ class RunResponse(object):
 
     __metaclass__ = abc.ABCMeta
 
+    # Wall clock seconds taken to execute the runnable, if recorded.
+    time_seconds = None
+
     @abc.abstractproperty
     def was_successful(self):
         """Indicate whether an error was encountered while executing this runnble.
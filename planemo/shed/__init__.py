@@ -9,8 +9,11 @@ import re
 import shutil
 import sys
 import tarfile
+import threading
+import weakref
 
 from collections import namedtuple
+from multiprocessing.pool import ThreadPool
 from tempfile import (
     mkstemp,
 )
@@ -26,12 +29,15 @@ from planemo import glob
 from planemo import templates
 from planemo.io import (
     can_write_to_path,
+    Capturing,
     coalesce_return_codes,
     error,
     find_matching_directories,
     info,
     shell,
+    tee_captured_output,
     temp_directory,
+    thread_routed_io,
     warn,
 )
 from planemo.shed2tap.base import BasePackage
@@ -40,15 +46,24 @@ from planemo.tools import yield_tool_sources
 from .diff import diff_and_remove
 from .interface import (
     api_exception_to_message,
+    DEFAULT_RETRIES,
     download_tar,
     find_category_ids,
     find_repository,
     latest_installable_revision,
+    RepositoryIndex,
     tool_shed_instance,
     username,
 )
+from .realization_cache import (
+    realization_cache_directory,
+    RealizationCache,
+)
 
 SHED_CONFIG_NAME = '.shed.yml'
+# Besides the repository contents, options an earlier successful upload
+# must have matched for planemo to skip uploading again.
+UPLOAD_OPERATION_OPTIONS = ["owner", "name", "message", "fail_on_missing"]
 REPO_DEPENDENCIES_CONFIG_NAME = "repository_dependencies.xml"
 TOOL_DEPENDENCIES_CONFIG_NAME = "tool_dependencies.xml"
 
@@ -284,10 +299,14 @@ def report_non_existent_repository(realized_repository):
 
 def upload_repository(ctx, realized_repository, **kwds):
     """Upload a tool directory as a tarball to a tool shed."""
-    path = realized_repository.path
     tar_path = kwds.get("tar", None)
+    operation = _upload_operation(ctx, realized_repository, **kwds)
+    if not tar_path and not kwds.get("tar_only", False) and realized_repository.unchanged_since_success(operation):
+        name = realized_repository.name
+        info("Repository [%s] unchanged since last successful upload, skipping." % name)
+        return 0
     if not tar_path:
-        tar_path = build_tarball(path, **kwds)
+        tar_path, _ = realized_repository.build_tarball(**kwds)
     if kwds.get("tar_only", False):
         name = realized_repository.pattern_to_file_name("shed_upload.tar.gz")
         shell("cp '%s' '%s'" % (tar_path, name))
@@ -306,7 +325,7 @@ def upload_repository(ctx, realized_repository, **kwds):
         if not is_diff:
             name = realized_repository.name
             info("Repository [%s] not different, skipping upload." % name)
-            return 0
+            return realized_repository.record_result(operation, 0)
 
     # TODO: support updating repo information if it changes in the config file
     try:
@@ -317,13 +336,26 @@ def upload_repository(ctx, realized_repository, **kwds):
         if isinstance(e, bioblend.ConnectionError) and e.status_code == 400 and \
                 e.body == '{"content_alert": "", "err_msg": "No changes to repository."}':
             warn("Repository %s was not updated because there were no changes" % realized_repository.name)
-            return 0
+            return realized_repository.record_result(operation, 0)
         message = api_exception_to_message(e)
         error("Could not update %s" % realized_repository.name)
         error(message)
         return -1
     info("Repository %s updated successfully." % realized_repository.name)
-    return 0
+    return realized_repository.record_result(operation, 0)
+
+
+def _upload_operation(ctx, realized_repository, **kwds):
+    """Identify an upload by its target and every option shaping what is uploaded."""
+    options = dict(
+        shed_url=tool_shed_url(ctx, **kwds),
+        owner=realized_repository.owner,
+        name=realized_repository.name,
+    )
+    for key in UPLOAD_OPERATION_OPTIONS:
+        options[key] = kwds.get(key, None)
+    options_json = json.dumps(options, sort_keys=True)
+    return "upload:%s" % hashlib.sha1(options_json.encode("utf-8")).hexdigest()
 
 
 def _update_commit_message(ctx, realized_repository, update_kwds, **kwds):
@@ -345,12 +377,27 @@ def diff_repo(ctx, realized_repository, **kwds):
     Returns 0 if and only the repositories are effectively the same
     given supplied kwds for comparison description.
     """
+    operation = "diff:%s:%s" % (
+        kwds.get("shed_target_source", None),
+        tool_shed_url(ctx, **kwds),
+    )
+    if not kwds.get("output", None) and realized_repository.unchanged_since_success(operation):
+        ctx.vlog("Repository [%s] unchanged since last diff found no differences." % realized_repository.name)
+        return 0
     with temp_directory("tool_shed_diff_") as working:
-        return _diff_in(ctx, working, realized_repository, **kwds)
+        exit_code = _diff_in(ctx, working, realized_repository, **kwds)
+    return realized_repository.record_result(operation, exit_code)
+
+
+def _extract_realized_tarball(realized_repository, destination):
+    tar_path, temporary = realized_repository.build_tarball()
+    cmd_template = 'mkdir "%s"; tar -xzf "%s" -C "%s"'
+    shell(cmd_template % (destination, tar_path, destination))
+    if temporary:
+        os.remove(tar_path)
 
 
 def _diff_in(ctx, working, realized_repository, **kwds):
-    path = realized_repository.path
     shed_target_source = kwds.get("shed_target_source", None)
 
     label_a = "_%s_" % (shed_target_source if shed_target_source else "workingdir")
@@ -395,9 +442,7 @@ def _diff_in(ctx, working, realized_repository, **kwds):
             **new_kwds
         )
     else:
-        tar_path = build_tarball(path)
-        cmd_template = 'mkdir "%s"; tar -xzf "%s" -C "%s"; rm -rf %s'
-        shell(cmd_template % (mine, tar_path, mine, tar_path))
+        _extract_realized_tarball(realized_repository, mine)
 
     output = kwds.get("output", None)
     raw = kwds.get("raw", False)
@@ -458,7 +503,10 @@ def get_shed_context(ctx=None, **kwds):
         email = prop("email")
         password = prop("password")
 
-    tsi = tool_shed_instance(url, key, email, password)
+    retries = kwds.get("shed_retries", None)
+    if retries is None:
+        retries = DEFAULT_RETRIES
+    tsi = tool_shed_instance(url, key, email, password, retries=retries)
     owner = username
     return ShedContext(tsi, shed_config, owner)
 
@@ -518,10 +566,32 @@ def find_repository_id(ctx, shed_context, path, **kwds):
     return _find_repository_id(ctx, shed_context, name, repo_config, **find_kwds)
 
 
+# Repository indices shared by shed contexts, keyed on planemo context and then
+# Tool Shed URL.
+_REPOSITORY_INDICES = weakref.WeakKeyDictionary()
+_REPOSITORY_INDICES_LOCK = threading.Lock()
+
+
+def repository_index(ctx, tsi):
+    """Return a :class:`RepositoryIndex` for tsi's Tool Shed.
+
+    The index is shared by every shed context targeting the same Tool Shed
+    for the lifetime of the supplied planemo context.
+    """
+    if ctx is None:
+        return RepositoryIndex(tsi)
+    with _REPOSITORY_INDICES_LOCK:
+        indices = _REPOSITORY_INDICES.setdefault(ctx, {})
+        if tsi.url not in indices:
+            indices[tsi.url] = RepositoryIndex(tsi)
+        return indices[tsi.url]
+
+
 def _find_repository_id(ctx, shed_context, name, repo_config, **kwds):
     # TODO: modify to consume shed_context
     owner = _owner(ctx, repo_config, shed_context, **kwds)
-    matching_repository = find_repository(shed_context.tsi, owner, name)
+    index = repository_index(ctx, shed_context.tsi)
+    matching_repository = index.find(owner, name)
     if matching_repository is None:
         if not kwds.get("allow_none", False):
             message = "Failed to find repository for owner/name %s/%s"
@@ -755,17 +825,46 @@ def find_raw_repositories(ctx, paths, **kwds):
     return raw_repo_objects
 
 
-def for_each_repository(ctx, function, paths, **kwds):
+def for_each_repository(ctx, function, paths, map_function=None, **kwds):
+    """Apply function to each repository realized from paths and coalesce return codes.
+
+    By default repositories are processed one at a time as they are realized.
+    If ``map_function`` is supplied, all repositories for a path are realized
+    first and ``map_function(function, realized_repositories)`` must return the
+    list of return codes (e.g. processing the repositories concurrently).
+    """
     ret_codes = []
     for path in paths:
+        path_kwds = kwds
+        if _git_path(path) is not None:
+            # Clones land in fresh temporary directories, nothing to reuse.
+            path_kwds = dict(kwds, cache_realizations=False)
         with _path_on_disk(ctx, path) as raw_path:
             try:
-                for realized_repository in _realize_effective_repositories(
-                    ctx, raw_path, **kwds
-                ):
-                    ret_codes.append(
-                        function(realized_repository)
-                    )
+                if map_function is None:
+                    for realized_repository in _realize_effective_repositories(
+                        ctx, raw_path, **path_kwds
+                    ):
+                        ret_codes.append(
+                            function(realized_repository)
+                        )
+                else:
+                    with temp_directory() as base_dir:
+                        realized_repositories = []
+                        realization_failed = False
+                        try:
+                            for realized_repository in _realize_effective_repositories(
+                                ctx, raw_path, base_dir=base_dir, **path_kwds
+                            ):
+                                realized_repositories.append(realized_repository)
+                        except RealizationException:
+                            # Still process the repositories that could be realized.
+                            realization_failed = True
+                        ret_codes.extend(
+                            map_function(function, realized_repositories)
+                        )
+                        if realization_failed:
+                            raise RealizationException()
             except RealizationException:
                 error(REALIZAION_PROBLEMS_MESSAGE)
                 return 254
@@ -773,6 +872,42 @@ def for_each_repository(ctx, function, paths, **kwds):
     return coalesce_return_codes(ret_codes)
 
 
+def concurrent_map_function(jobs):
+    """Return a ``map_function`` for :func:`for_each_repository` using ``jobs`` threads.
+
+    Suited to network bound functions (e.g. uploads to a Tool Shed). Each
+    repository's output is captured and echoed in repository order once it
+    has been processed. Returns ``None`` (process repositories serially) if
+    ``jobs`` is less than 2.
+    """
+    if not jobs or jobs < 2:
+        return None
+
+    def run(args):
+        function, realized_repository = args
+        with Capturing() as captured:
+            ret_code = function(realized_repository)
+        return ret_code, captured
+
+    def map_function(function, realized_repositories):
+        if not realized_repositories:
+            return []
+        ret_codes = []
+        pool = ThreadPool(min(jobs, len(realized_repositories)))
+        try:
+            with thread_routed_io():
+                tasks = [(function, r) for r in realized_repositories]
+                for ret_code, captured in pool.imap(run, tasks):
+                    tee_captured_output(captured)
+                    ret_codes.append(ret_code)
+        finally:
+            pool.close()
+            pool.join()
+        return ret_codes
+
+    return map_function
+
+
 def path_to_repo_name(path):
     return os.path.basename(os.path.abspath(path))
 
@@ -802,7 +937,7 @@ def _shed_config_to_url(shed_config):
     return url
 
 
-def _realize_effective_repositories(ctx, path, **kwds):
+def _realize_effective_repositories(ctx, path, base_dir=None, **kwds):
     """ Expands folders in a source code repository into tool shed
     repositories.
 
@@ -810,27 +945,35 @@ def _realize_effective_repositories(ctx, path, **kwds):
     to many repositories (for instance if a folder has n tools in the source
     code repository but are published to the tool shed as one repository per
     tool).
+
+    Repositories are realized in a temporary directory removed once this
+    generator is exhausted, unless the caller manages ``base_dir`` itself.
     """
+    if base_dir is None:
+        with temp_directory() as base_dir:
+            for realized_repo in _realize_effective_repositories(ctx, path, base_dir=base_dir, **kwds):
+                yield realized_repo
+        return
+
     raw_repo_objects = _find_raw_repositories(ctx, path, **kwds)
     failed = False
-    with temp_directory() as base_dir:
-        for raw_repo_object in raw_repo_objects:
-            if isinstance(raw_repo_object, Exception):
-                _handle_realization_error(raw_repo_object, **kwds)
+    for raw_repo_object in raw_repo_objects:
+        if isinstance(raw_repo_object, Exception):
+            _handle_realization_error(raw_repo_object, **kwds)
+            failed = True
+            continue
+
+        realized_repos = raw_repo_object.realizations(
+            ctx,
+            base_dir,
+            **kwds
+        )
+        for realized_repo in realized_repos:
+            if isinstance(realized_repo, Exception):
+                _handle_realization_error(realized_repo, **kwds)
                 failed = True
                 continue
-
-            realized_repos = raw_repo_object.realizations(
-                ctx,
-                base_dir,
-                **kwds
-            )
-            for realized_repo in realized_repos:
-                if isinstance(realized_repo, Exception):
-                    _handle_realization_error(realized_repo, **kwds)
-                    failed = True
-                    continue
-                yield realized_repo
+            yield realized_repo
     if failed:
         raise RealizationException()
 
@@ -898,11 +1041,7 @@ def _parse_repos_from_workflow(path):
 
 @contextlib.contextmanager
 def _path_on_disk(ctx, path):
-    git_path = None
-    if path.startswith("git:"):
-        git_path = path
-    elif path.startswith("git+"):
-        git_path = path[len("git+"):]
+    git_path = _git_path(path)
     if git_path is None:
         yield path
     else:
@@ -911,6 +1050,14 @@ def _path_on_disk(ctx, path):
             yield git_repo
 
 
+def _git_path(path):
+    if path.startswith("git:"):
+        return path
+    elif path.startswith("git+"):
+        return path[len("git+"):]
+    return None
+
+
 def _find_raw_repositories(ctx, path, **kwds):
     name = kwds.get("name", None)
     recursive = kwds.get("recursive", False)
@@ -1006,16 +1153,25 @@ class RawRepositoryDirectory(object):
         names = self._repo_names()
 
         for name in names:
-            directory = os.path.join(parent_directory, self._hash(name), name)
+            # Include the source path so same-named repositories realized into
+            # a shared parent directory don't clobber each other.
+            directory = os.path.join(parent_directory, self._hash("%s:%s" % (self.path, name)), name)
             multiple = self.multiple or len(names) > 1
             if not os.path.exists(directory):
                 os.makedirs(directory)
             r_kwds = kwds.copy()
             if "name" in r_kwds:
                 del r_kwds["name"]
-            yield self._realize_to(ctx, directory, name, multiple, **r_kwds)
-
-    def _realize_to(self, ctx, directory, name, multiple, **kwds):
+            cache = None
+            if kwds.get("cache_realizations", False):
+                cache_directory = os.path.join(
+                    realization_cache_directory(ctx),
+                    self._hash("%s:%s" % (self.path, name)),
+                )
+                cache = RealizationCache(cache_directory)
+            yield self._realize_to(ctx, directory, name, multiple, cache=cache, **r_kwds)
+
+    def _realize_to(self, ctx, directory, name, multiple, cache=None, **kwds):
         fail_on_missing = kwds.get("fail_on_missing", True)
         ignore_list = []
         config = self._realize_config(name)
@@ -1031,18 +1187,38 @@ class RawRepositoryDirectory(object):
             msg = "Failed to include files for %s" % missing
             return RuntimeError(msg)
 
+        included_files = []
         for realized_file in realized_files.files:
             relative_dest = realized_file.dest
             implicit_ignore = self._implicit_ignores(relative_dest)
             explicit_ignore = (realized_file.absolute_src in ignore_list)
             if implicit_ignore or explicit_ignore:
                 continue
-            realized_file.realize_to(directory)
+            included_files.append(realized_file)
+
+        realize = True
+        if cache is not None:
+            key = cache.compute_key(
+                config,
+                [(f.dest, f.absolute_src) for f in included_files],
+                missing,
+            )
+            directory = cache.realized_directory(os.path.basename(directory))
+            if key == cache.key and os.path.isdir(directory):
+                ctx.vlog("Reusing cached realization of repository [%s]" % name)
+                realize = False
+            else:
+                cache.reset(key)
+                os.makedirs(directory)
 
-        for (name, contents) in six.iteritems(config.get("_files", {})):
-            path = os.path.join(directory, name)
-            with open(path, "w") as f:
-                f.write(contents)
+        if realize:
+            for realized_file in included_files:
+                realized_file.realize_to(directory)
+
+            for (name, contents) in six.iteritems(config.get("_files", {})):
+                path = os.path.join(directory, name)
+                with open(path, "w") as f:
+                    f.write(contents)
 
         return RealizedRepositry(
             realized_path=directory,
@@ -1050,8 +1226,17 @@ class RawRepositoryDirectory(object):
             config=config,
             multiple=multiple,
             missing=missing,
+            cache=cache,
         )
 
+    def included_paths(self):
+        """Return absolute paths of the files included in these repositories."""
+        paths = set()
+        for name in self._repo_names():
+            for realized_file in self._realized_files(name).files:
+                paths.add(realized_file.absolute_src)
+        return paths
+
     def _repo_names(self):
         return self.config.get("repositories").keys()
 
@@ -1199,13 +1384,33 @@ class RealizedFile(object):
 
 class RealizedRepositry(object):
 
-    def __init__(self, realized_path, real_path, config, multiple, missing):
+    def __init__(self, realized_path, real_path, config, multiple, missing, cache=None):
         self.path = realized_path
         self.real_path = real_path
         self.config = config
         self.name = config["name"]
         self.multiple = multiple
         self.missing = missing
+        self.cache = cache
+
+    def build_tarball(self, **kwds):
+        """Return the path to a tarball of this repository and whether the caller should delete it.
+
+        Cached realizations reuse the tarball built for unchanged contents.
+        """
+        if self.cache is None:
+            return build_tarball(self.path, **kwds), True
+        return self.cache.tarball(lambda: build_tarball(self.path, **kwds)), False
+
+    def unchanged_since_success(self, operation):
+        """Return True if operation last succeeded on identical repository contents."""
+        return self.cache is not None and self.cache.previous_result(operation) == 0
+
+    def record_result(self, operation, exit_code):
+        """Remember the outcome of operation for cached realizations."""
+        if self.cache is not None:
+            self.cache.record_result(operation, exit_code)
+        return exit_code
 
     @property
     def owner(self):
@@ -1284,6 +1489,7 @@ class RealizedRepositry(object):
                 self.name,
                 self.config,
             )
+            repository_index(ctx, shed_context.tsi).add(repo)
             return repo['id']
 
         return self._with_ts_exception_handling(_create)
@@ -1408,16 +1614,19 @@ class RealizationException(Exception):
 
 __all__ = (
     'api_exception_to_message',
+    'concurrent_map_function',
     'CURRENT_CATEGORIES',
     'diff_repo',
     'download_tarball',
     'find_raw_repositories',
+    'find_repository',
     'for_each_repository',
     'get_shed_context',
     'path_to_repo_name',
     'REPO_TYPE_SUITE',
     'REPO_TYPE_TOOL_DEP',
     'REPO_TYPE_UNRESTRICTED',
+    'repository_index',
     'shed_init',
     'tool_shed_client',  # Deprecated...
     'tool_shed_url',
@@ -1,6 +1,12 @@
 """Interface over bioblend and direct access to ToolShed API via requests."""
 
+import functools
 import json
+import threading
+import time
+
+import requests
+from requests.packages.urllib3.exceptions import NewConnectionError
 
 from planemo.bioblend import (
     ensure_module,
@@ -13,8 +19,33 @@ REPOSITORY_DOWNLOAD_TEMPLATE = (
     "&changeset_revision=default&file_type=gz"
 )
 
-
-def tool_shed_instance(url, key, email, password):
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 1.0
+# Status codes indicating the Tool Shed (or a proxy in front of it) did not
+# handle the request and it is worth sending again.
+TRANSIENT_STATUS_CODES = [429, 502, 503, 504]
+# Requests that can safely be sent again after the Tool Shed may have acted
+# on them. POSTs (e.g. creating a repository or uploading a tarball) are
+# only retried if they provably never reached the Tool Shed.
+IDEMPOTENT_REQUEST_METHODS = [
+    "make_get_request",
+    "make_put_request",
+    "make_delete_request",
+]
+NON_IDEMPOTENT_REQUEST_METHODS = [
+    "make_post_request",
+]
+
+
+def tool_shed_instance(url, key, email, password, retries=0, retry_backoff=DEFAULT_RETRY_BACKOFF):
+    """Build a bioblend ``ToolShedInstance``.
+
+    If ``retries`` is greater than 0, GET, PUT and DELETE requests failing
+    with a connection problem or a transient HTTP status are retried that many
+    times - waiting ``retry_backoff`` seconds before the first retry and
+    doubling the wait after each subsequent failure. POST requests are only
+    retried if the connection to the Tool Shed could not be established.
+    """
     ensure_module()
     tsi = toolshed.ToolShedInstance(
         url=url,
@@ -22,23 +53,107 @@ def tool_shed_instance(url, key, email, password):
         email=email,
         password=password
     )
+    if retries > 0:
+        for method in IDEMPOTENT_REQUEST_METHODS + NON_IDEMPOTENT_REQUEST_METHODS:
+            idempotent = method in IDEMPOTENT_REQUEST_METHODS
+            retrying = _retrying_request(getattr(tsi, method), retries, retry_backoff, idempotent=idempotent)
+            setattr(tsi, method, retrying)
     return tsi
 
 
+def _retrying_request(make_request, retries, retry_backoff, idempotent=True):
+    is_retryable_error = _is_transient_error if idempotent else _is_connect_error
+    retryable_status_codes = TRANSIENT_STATUS_CODES if idempotent else []
+
+    @functools.wraps(make_request)
+    def wrapped(url, *args, **kwds):
+        payload = kwds.get("payload", None)
+        for attempt in range(retries + 1):
+            if isinstance(payload, dict):
+                # bioblend serializes payloads in place and consumes attached
+                # files, send a fresh copy with rewound files each time.
+                for value in payload.values():
+                    fd = getattr(value, "fd", None)
+                    if fd is not None:
+                        fd.seek(0)
+                kwds["payload"] = payload.copy()
+            try:
+                response = make_request(url, *args, **kwds)
+            except Exception as e:
+                if attempt == retries or not is_retryable_error(e):
+                    raise
+            else:
+                status_code = getattr(response, "status_code", None)
+                if attempt == retries or status_code not in retryable_status_codes:
+                    return response
+            time.sleep(retry_backoff * (2 ** attempt))
+
+    return wrapped
+
+
+def _is_transient_error(e):
+    if isinstance(e, requests.exceptions.ConnectionError):
+        return True
+    return getattr(e, "status_code", None) in TRANSIENT_STATUS_CODES
+
+
+def _is_connect_error(e):
+    """Return ``True`` if ``e`` means the request was never sent to the server."""
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(e, requests.exceptions.ConnectionError) or not e.args:
+        return False
+    # requests wraps urllib3's MaxRetryError, whose reason is the underlying error.
+    reason = getattr(e.args[0], "reason", e.args[0])
+    return isinstance(reason, NewConnectionError)
+
+
 def find_repository(tsi, owner, name):
     """ Find repository information for given owner and repository
     name.
     """
-    repos = tsi.repositories.get_repositories()
+    return RepositoryIndex(tsi).find(owner, name)
 
-    def matches(r):
-        return r["owner"] == owner and r["name"] == name
 
-    matching_repos = list(filter(matches, repos))
-    if not matching_repos:
-        return None
-    else:
-        return matching_repos[0]
+class RepositoryIndex(object):
+    """Index Tool Shed repositories on ``(owner, name)``.
+
+    Repositories are fetched lazily, one owner at a time, so repeated lookups
+    only query the Tool Shed once per owner rather than listing every
+    repository in the Tool Shed for each lookup.
+    """
+
+    def __init__(self, tsi):
+        self.tsi = tsi
+        self._lock = threading.Lock()
+        self._repositories = {}
+
+    def find(self, owner, name):
+        """Return the repository dictionary for owner and name or ``None``."""
+        with self._lock:
+            if owner not in self._repositories:
+                self._load(owner)
+            return self._repositories[owner].get(name, None)
+
+    def add(self, repository):
+        """Record a repository created after the index was loaded."""
+        with self._lock:
+            owner = repository["owner"]
+            if owner in self._repositories:
+                self._repositories[owner][repository["name"]] = repository
+
+    def _load(self, owner):
+        response = self.tsi.make_get_request(
+            self.tsi.url + "/repositories",
+            params={"owner": owner},
+        )
+        response.raise_for_status()
+        self._repositories.setdefault(owner, {})
+        # Older Tool Sheds ignore the owner filter and list everything, index
+        # all of it so other owners don't need to be fetched again.
+        for repository in response.json():
+            repositories = self._repositories.setdefault(repository["owner"], {})
+            repositories[repository["name"]] = repository
 
 
 def latest_installable_revision(tsi, repository_id):
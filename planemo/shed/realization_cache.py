@@ -0,0 +1,129 @@
+"""Persist realized shed repositories in planemo's workspace between runs.
+
+Each repository gets a cache directory holding its realized directory, its
+tarball and a record of the last successful operations (e.g. lint or upload)
+performed on it. All of these are tied to a key hashing the repository's
+realized ``.shed.yml`` configuration together with the paths and contents of
+every included file - contents are only re-hashed when a file's size or
+modification time changes.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+CACHE_VERSION = "1"
+STATE_FILE_NAME = "realization.json"
+FILE_HASHES_FILE_NAME = "file_hashes.json"
+TARBALL_NAME = "shed_upload.tar.gz"
+
+
+def realization_cache_directory(ctx):
+    """Return the workspace directory storing cached shed realizations."""
+    return os.path.join(ctx.workspace, "shed_realizations")
+
+
+class RealizationCache(object):
+    """Cached realization of a single shed repository."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._state = _load_json(os.path.join(directory, STATE_FILE_NAME))
+        self._file_hashes = _load_json(os.path.join(directory, FILE_HASHES_FILE_NAME))
+
+    @property
+    def key(self):
+        return self._state.get("key", None)
+
+    def realized_directory(self, name):
+        return os.path.join(self.directory, name)
+
+    def compute_key(self, config, realized_files, missing):
+        """Hash ``config`` and the ``(dest, absolute_src)`` pairs in realized_files."""
+        digest = hashlib.sha1()
+
+        def update(value):
+            digest.update(value.encode("utf-8"))
+            digest.update(b"\0")
+
+        update(CACHE_VERSION)
+        update(json.dumps(config, sort_keys=True, default=str))
+        update(json.dumps(missing, sort_keys=True, default=str))
+        for (dest, absolute_src) in sorted(realized_files):
+            update(dest)
+            update(absolute_src)
+            if os.path.isfile(absolute_src):
+                update(self._file_hash(absolute_src))
+        self._save_json(FILE_HASHES_FILE_NAME, self._file_hashes)
+        return digest.hexdigest()
+
+    def reset(self, key):
+        """Clear the cached realization and prepare to store a new one for key."""
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+            if name == FILE_HASHES_FILE_NAME:
+                continue
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        self._state = dict(key=key, results={})
+        self._save_json(STATE_FILE_NAME, self._state)
+
+    def tarball(self, build_tarball):
+        """Return the cached tarball path - building it with ``build_tarball()`` if needed.
+
+        The returned file belongs to the cache and must not be deleted.
+        """
+        tar_path = os.path.join(self.directory, TARBALL_NAME)
+        if not os.path.exists(tar_path):
+            shutil.move(build_tarball(), tar_path)
+        return tar_path
+
+    def previous_result(self, operation):
+        """Return the exit code last recorded for operation on this realization."""
+        return self._state.get("results", {}).get(operation, None)
+
+    def record_result(self, operation, exit_code):
+        self._state.setdefault("results", {})[operation] = exit_code
+        self._save_json(STATE_FILE_NAME, self._state)
+
+    def _file_hash(self, path):
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime]
+        cached = self._file_hashes.get(path)
+        if cached is not None and cached[:2] == signature:
+            return cached[2]
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+        self._file_hashes[path] = signature + [file_hash]
+        return file_hash
+
+    def _save_json(self, name, value):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        path = os.path.join(self.directory, name)
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump(value, f)
+        os.rename(tmp_path, path)
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except ValueError:
+        # Corrupt cache entries are just rebuilt.
+        return {}
+
+
+__all__ = (
+    "RealizationCache",
+    "realization_cache_directory",
+)
@@ -1,6 +1,8 @@
 """Logic related to linting shed repositories."""
 from __future__ import absolute_import
 
+import hashlib
+import json
 import os
 
 import xml.etree.ElementTree as ET
@@ -10,12 +12,16 @@ import yaml
 from galaxy.tools.lint import lint_tool_source_with
 from galaxy.tools.linters.help import rst_invalid
 
-from planemo.io import info
+from planemo import shed
 from planemo.lint import (
+    build_lint_args,
     handle_lint_complete,
+    lint_in_processes,
     lint_urls,
     lint_xsd,
-    setup_lint,
+    prefetch_urls,
+    print_lint_records,
+    RecordingLintContext,
 )
 from planemo.shed import (
     CURRENT_CATEGORIES,
@@ -26,10 +32,11 @@ from planemo.shed import (
     validate_repo_owner,
 )
 from planemo.shed2tap import base
-from planemo.tool_lint import (
-    handle_tool_load_error,
+from planemo.tool_lint import MALFORMED_XML_MESSAGE
+from planemo.tools import (
+    is_tool_load_error,
+    yield_tool_sources,
 )
-from planemo.tools import yield_tool_sources
 from planemo.xml import XSDS_PATH
 
 
@@ -52,16 +59,53 @@ SHED_METADATA = [
 ]
 
 
+def lint_repositories(ctx, paths, **kwds):
+    """Lint all shed repositories found on paths.
+
+    If ``jobs`` is greater than 1, repositories are linted in that many
+    worker processes - output is still reported in repository order.
+    """
+    def lint(realized_repository):
+        return lint_repository(ctx, realized_repository, **kwds)
+
+    def lint_in_workers(function, realized_repositories):
+        # function is a closure and cannot be sent to workers, lint
+        # each repository with a module-level equivalent.
+        tasks = [(ctx, r, kwds) for r in realized_repositories]
+        return lint_in_processes(_lint_repository_in_process, tasks, jobs)
+
+    jobs = kwds.get("jobs", None) or 1
+    map_function = lint_in_workers if jobs > 1 else None
+    return shed.for_each_repository(ctx, lint, paths, map_function=map_function, **kwds)
+
+
 def lint_repository(ctx, realized_repository, **kwds):
     """Lint a realized shed repository.
 
     See :module:`planemo.shed` for details on constructing a realized
     repository data structure.
     """
+    exit_code, records = _lint_repository(ctx, realized_repository, **kwds)
+    print_lint_records(records)
+    return exit_code
+
+
+def _lint_repository_in_process(args):
+    ctx, realized_repository, kwds = args
+    return [_lint_repository(ctx, realized_repository, **kwds)]
+
+
+def _lint_repository(ctx, realized_repository, **kwds):
     failed = False
     path = realized_repository.real_path
-    info("Linting repository %s" % path)
-    lint_args, lint_ctx = setup_lint(ctx, **kwds)
+    lint_args = build_lint_args(ctx, **kwds)
+    lint_ctx = RecordingLintContext(lint_args["level"])
+    lint_ctx.note("Linting repository %s" % path)
+    # URLs can break without the repository changing, never skip checking them.
+    operation = None if kwds["urls"] else _lint_operation(lint_args, **kwds)
+    if operation is not None and realized_repository.unchanged_since_success(operation):
+        lint_ctx.note("Repository unchanged since last successful lint, skipping.")
+        return 0, lint_ctx.records
     lint_ctx.lint(
         "lint_expansion",
         lint_expansion,
@@ -102,14 +146,18 @@ def lint_repository(ctx, realized_repository, **kwds):
         lint_readme,
         realized_repository,
     )
+    tool_sources = None
+    if kwds["tools"]:
+        tool_sources = list(yield_tool_sources(ctx, realized_repository.path, recursive=True))
     if kwds["urls"]:
+        prefetch_urls(_url_roots(realized_repository, tool_sources or []))
         lint_ctx.lint(
             "lint_urls",
             lint_tool_dependencies_urls,
             realized_repository,
         )
     if kwds["tools"]:
-        tools_failed = lint_repository_tools(ctx, realized_repository, lint_ctx, lint_args)
+        tools_failed = lint_repository_tools(ctx, realized_repository, lint_ctx, lint_args, tool_sources)
         failed = failed or tools_failed
     if kwds["ensure_metadata"]:
         lint_ctx.lint(
@@ -117,16 +165,35 @@ def lint_repository(ctx, realized_repository, **kwds):
             lint_shed_metadata,
             realized_repository,
         )
-    return handle_lint_complete(lint_ctx, lint_args, failed=failed)
+    exit_code = handle_lint_complete(lint_ctx, lint_args, failed=failed)
+    if operation is not None:
+        realized_repository.record_result(operation, exit_code)
+    return exit_code, lint_ctx.records
+
+
+def _lint_operation(lint_args, **kwds):
+    """Identify a shed_lint run by every option affecting its outcome."""
+    options = dict(
+        fail_level=lint_args["fail_level"],
+        skip_types=sorted(lint_args["skip_types"]),
+        extra_modules=[m.__name__ for m in lint_args["extra_modules"]],
+    )
+    for key in ["tools", "ensure_metadata"]:
+        options[key] = kwds.get(key)
+    options_json = json.dumps(options, sort_keys=True)
+    return "lint:%s" % hashlib.sha1(options_json.encode("utf-8")).hexdigest()
 
 
-def lint_repository_tools(ctx, realized_repository, lint_ctx, lint_args):
+def lint_repository_tools(ctx, realized_repository, lint_ctx, lint_args, tool_sources=None):
+    """Lint the tools of a repository, recording messages on a :class:`RecordingLintContext`."""
     path = realized_repository.path
-    for (tool_path, tool_source) in yield_tool_sources(ctx, path,
-                                                       recursive=True):
+    if tool_sources is None:
+        tool_sources = yield_tool_sources(ctx, path, recursive=True)
+    for (tool_path, tool_source) in tool_sources:
         original_path = tool_path.replace(path, realized_repository.real_path)
-        info("+Linting tool %s" % original_path)
-        if handle_tool_load_error(tool_path, tool_source):
+        lint_ctx.note("+Linting tool %s" % original_path)
+        if is_tool_load_error(tool_source):
+            lint_ctx.note(MALFORMED_XML_MESSAGE % tool_path)
             return True
         lint_tool_source_with(
             lint_ctx,
@@ -135,6 +202,19 @@ def lint_repository_tools(ctx, realized_repository, lint_ctx, lint_args):
         )
 
 
+def _url_roots(realized_repository, tool_sources):
+    """Collect XML roots from which URLs will be checked for this repository."""
+    roots = []
+    tool_dependencies = os.path.join(realized_repository.real_path, "tool_dependencies.xml")
+    if os.path.exists(tool_dependencies):
+        roots.append(ET.parse(tool_dependencies).getroot())
+    for (tool_path, tool_source) in tool_sources:
+        root = getattr(tool_source, "root", None)
+        if root is not None and not is_tool_load_error(tool_source):
+            roots.append(root)
+    return roots
+
+
 def lint_expansion(realized_repository, lint_ctx):
     missing = realized_repository.missing
     if missing:
@@ -354,5 +434,6 @@ def _validate_categories(categories, realized_repository):
 
 
 __all__ = (
+    "lint_repositories",
     "lint_repository",
 )
@@ -1,9 +1,21 @@
-"""Check an output file from a generalize artifact test."""
+"""Check an output file from a generalize artifact test.
 
+Outputs are streamed from disk when checked against a checksum, compared with
+``sim_size``, or byte-for-byte identical to the expected file. Any other
+outcome - assertions, ``re_match``/``contains``/other comparisons, and ``diff``
+comparisons of files that are not identical - still reads the output into
+memory for galaxy-lib to apply tolerances and describe the difference.
+"""
+
+import hashlib
 import os
+import shutil
+import threading
 
 from galaxy.tools.verify import verify
 
+HASH_CHUNK_SIZE = 1024 * 1024
+
 
 def check_output(runnable, output_properties, test_properties, **kwds):
     """Use galaxy-lib to check a test output.
@@ -17,27 +29,134 @@ def check_output(runnable, output_properties, test_properties, **kwds):
     """
     get_filename = _test_filename_getter(runnable)
     path = output_properties["path"]
-    output_content = open(path, "rb").read()
     expected_file = test_properties.get("file", None)
     job_output_files = kwds.get("job_output_files", None)
     item_label = "Output with path %s" % path
     problems = []
     try:
-        verify(
+        verified = _verify_streaming(
             item_label,
-            output_content,
-            attributes=test_properties,
-            filename=expected_file,
-            get_filename=get_filename,
-            keep_outputs_dir=job_output_files,
-            verify_extra_files=None,
+            path,
+            test_properties,
+            expected_file,
+            get_filename,
+            job_output_files,
         )
+        if not verified:
+            with open(path, "rb") as f:
+                output_content = f.read()
+            verify(
+                item_label,
+                output_content,
+                attributes=test_properties,
+                filename=expected_file,
+                get_filename=get_filename,
+                keep_outputs_dir=job_output_files,
+                verify_extra_files=None,
+            )
     except AssertionError as e:
         problems.append(str(e))
 
     return problems
 
 
+def _verify_streaming(item_label, path, attributes, expected_file, get_filename, keep_outputs_dir):
+    """Verify output without reading it into memory if possible.
+
+    Return ``True`` if the output was fully verified, ``False`` if the in-memory
+    galaxy-lib checks are needed (assertions or a non-identical comparison) and
+    throw an ``AssertionError`` if the output fails a streamed check.
+    """
+    if attributes.get("assert_list", None) is not None:
+        return False
+
+    if not _verify_checksum(item_label, path, attributes):
+        return False
+
+    if expected_file is None:
+        return True
+
+    compare = attributes.get("compare", "diff")
+    local_name = get_filename(expected_file)
+    if compare == "sim_size":
+        delta = int(attributes.get("delta", "100"))
+        s1 = os.path.getsize(path)
+        s2 = os.path.getsize(local_name)
+        if abs(s1 - s2) > delta:
+            raise AssertionError(
+                "%s different than expected, difference (using sim_size):\n"
+                "Files %s=%db but %s=%db - compare by size (delta=%s) failed" % (
+                    item_label, path, s1, local_name, s2, delta
+                )
+            )
+    elif compare != "diff" or not _files_identical(local_name, path):
+        # Outputs that differ at all need the full galaxy-lib comparison to
+        # apply tolerances (lines_diff, sort, decompress, ...) and describe
+        # the difference.
+        return False
+
+    if keep_outputs_dir:
+        shutil.copy(path, os.path.join(keep_outputs_dir, os.path.basename(local_name)))
+    return True
+
+
+def _verify_checksum(item_label, path, attributes):
+    """Check any md5 or checksum expectation, ``False`` if it can't be streamed."""
+    expected_checksum_type = None
+    if attributes.get("md5", None) is not None:
+        expected_checksum_type, expected_checksum = "md5", attributes["md5"]
+    elif attributes.get("checksum", None) is not None:
+        expected_checksum_type, expected_checksum = attributes["checksum"].split("$", 1)
+    if expected_checksum_type:
+        try:
+            actual_checksum = _stream_hash(path, expected_checksum_type)
+        except ValueError:
+            # Unknown hash type, let galaxy-lib report it.
+            return False
+        if actual_checksum != expected_checksum:
+            raise AssertionError(
+                "%s different than expected\nOutput checksum [%s] does not match expected [%s] (using %s hash)." % (
+                    item_label, actual_checksum, expected_checksum, expected_checksum_type
+                )
+            )
+    return True
+
+
+def _files_identical(expected_path, path):
+    """Compare sizes, then streamed hashes - memoizing the expected file's."""
+    if not os.path.exists(expected_path):
+        return False
+    if os.path.getsize(expected_path) != os.path.getsize(path):
+        return False
+    return _expected_hash(expected_path) == _stream_hash(path, "sha1")
+
+
+# Hashes of expected test files keyed on path, size and modification time -
+# the same test-data file is commonly compared against many outputs.
+_EXPECTED_HASHES = {}
+_EXPECTED_HASHES_LOCK = threading.Lock()
+
+
+def _expected_hash(path):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    with _EXPECTED_HASHES_LOCK:
+        file_hash = _EXPECTED_HASHES.get(memo_key, None)
+    if file_hash is None:
+        file_hash = _stream_hash(path, "sha1")
+        with _EXPECTED_HASHES_LOCK:
+            _EXPECTED_HASHES[memo_key] = file_hash
+    return file_hash
+
+
+def _stream_hash(path, hash_type):
+    digest = hashlib.new(hash_type)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def _test_filename_getter(runnable):
 
     def get_filename(name):
@@ -0,0 +1,169 @@
+"""A content-addressed cache of test results for runnables.
+
+Cached results are keyed on a hash of everything that can influence the
+outcome of a runnable's tests - the artifact itself (for Galaxy tools the
+XML after macro expansion), its requirements and containers, its test
+definitions, the test data files those tests reference, and a string
+identifying the engine (e.g. the Galaxy version) the tests ran against.
+Only results for runnables whose tests all passed are stored.
+"""
+import hashlib
+import json
+import os
+from xml.etree import ElementTree as ET
+
+import six
+import yaml
+
+from planemo.runnable import (
+    cases,
+    RunnableType,
+)
+from planemo.tool_cache import load_tool_source
+
+from .data import find_test_data_directory
+
+CACHE_VERSION = "1"
+
+
+class TestResultCache(object):
+    """Store and retrieve structured test data for runnables by content hash."""
+
+    def __init__(self, cache_directory, engine_id, **kwds):
+        """Create a cache rooted at ``cache_directory`` for tests run against ``engine_id``."""
+        self.cache_directory = cache_directory
+        self.engine_id = engine_id
+        self._kwds = kwds
+
+    def key(self, runnable):
+        """Return the hex digest content key for the supplied runnable."""
+        return runnable_cache_key(runnable, self.engine_id, **self._kwds)
+
+    def get(self, runnable, key=None):
+        """Return cached test entries marked as cached, or ``None`` if absent."""
+        path = self._path(key or self.key(runnable))
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                tests = json.load(f)["tests"]
+        except Exception:
+            return None
+        for test in tests:
+            test["data"]["cached"] = True
+        return tests
+
+    def put(self, runnable, tests, key=None):
+        """Cache test entries for runnable if all of them passed.
+
+        Returns ``True`` if the entries were stored.
+        """
+        if not tests or not all(_test_status(t) == "success" for t in tests):
+            return False
+        path = self._path(key or self.key(runnable))
+        parent = os.path.dirname(path)
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump({"tests": tests}, f)
+        os.rename(tmp_path, path)
+        return True
+
+    def _path(self, key):
+        return os.path.join(self.cache_directory, key[0:2], "%s.json" % key)
+
+
+def runnable_cache_key(runnable, engine_id, **kwds):
+    """Hash runnable contents, test definitions and test data for caching."""
+    digest = hashlib.sha1()
+
+    def update(value):
+        if isinstance(value, six.text_type):
+            value = value.encode("utf-8")
+        digest.update(value)
+        digest.update(b"\0")
+
+    update(CACHE_VERSION)
+    update(engine_id)
+    update(runnable.type.name)
+    path = runnable.path
+    search_directories = [os.path.dirname(os.path.abspath(path))]
+    if runnable.type == RunnableType.galaxy_tool:
+        tool_source = load_tool_source(path)
+        # Macros have been expanded in the parsed XML tree.
+        update(ET.tostring(tool_source.root))
+        requirements, containers = tool_source.parse_requirements_and_containers()
+        for requirement in requirements:
+            update("%s|%s|%s" % (requirement.type, requirement.name, requirement.version))
+        for container in containers:
+            update("%s|%s" % (container.type, container.identifier))
+        test_data_directory = find_test_data_directory([path], **kwds)
+        if test_data_directory:
+            search_directories.insert(0, test_data_directory)
+        tests_dict = tool_source.parse_tests_to_dict()
+        update(_referenced_files_hash(tests_dict, search_directories))
+    else:
+        update(_file_hash(path))
+
+    test_cases = cases(runnable) if runnable.is_single_artifact else []
+    for test_case in test_cases:
+        if test_case.job_path is not None:
+            update(_file_hash(test_case.job_path))
+            job_directory = os.path.dirname(test_case.job_path)
+            with open(test_case.job_path, "r") as f:
+                references = yaml.safe_load(f)
+        else:
+            job_directory = test_case.tests_directory
+            references = test_case.job
+            update(json.dumps(test_case.job, sort_keys=True))
+        update(json.dumps(test_case.output_expectations, sort_keys=True))
+        update(_referenced_files_hash(references, [job_directory, test_case.tests_directory]))
+        update(_referenced_files_hash(test_case.output_expectations, [test_case.tests_directory]))
+
+    return digest.hexdigest()
+
+
+def _referenced_files_hash(value, search_directories):
+    """Hash the contents of every file named by a string nested in value."""
+    digest = hashlib.sha1()
+    for reference in sorted(set(_strings(value))):
+        for directory in search_directories:
+            candidate = os.path.join(directory, reference)
+            if os.path.isfile(candidate):
+                digest.update(reference.encode("utf-8"))
+                digest.update(_file_hash(candidate).encode("utf-8"))
+                break
+    return digest.hexdigest()
+
+
+def _strings(value):
+    if isinstance(value, six.string_types):
+        if value and len(value) < 4096:
+            yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            for string in _strings(item):
+                yield string
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            for string in _strings(item):
+                yield string
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _test_status(test):
+    return (test.get("data") or {}).get("status")
+
+
+__all__ = (
+    "runnable_cache_key",
+    "TestResultCache",
+)
@@ -1,12 +1,23 @@
 """Describes results.
 
-Is a JSON.
+Is a JSON document or - for test output paths ending with ``.jsonl`` - an
+append-only JSON-lines file with one record per test. JSON-lines results are
+written as each test finishes and read back lazily so huge test suites never
+need to be held in memory.
 """
 import json
 import os
+import threading
 
 from planemo.io import error
 
+JSON_LINES_EXTENSION = ".jsonl"
+JSON_LINES_HEADER = '{"format": "planemo-jsonl", "version": "0.1"}'
+# Records are written with fixed prefixes so readers can tell tests and
+# metadata apart without parsing every line.
+TEST_RECORD_PREFIX = '{"test": '
+METADATA_RECORD_PREFIX = '{"metadata": '
+
 
 class StructuredData(object):
     """Abstraction around a simple data structure describing test results."""
@@ -19,12 +30,18 @@ class StructuredData(object):
                   "incorrect.")
 
         self.json_path = json_path
+        self.json_lines = False
         structured_data = {}
         structured_data_tests = {}
         if json_path and os.path.exists(json_path) and data is None:
             try:
-                with open(json_path, "r") as output_json_f:
-                    data = json.load(output_json_f)
+                if is_json_lines(json_path):
+                    self.json_lines = True
+                    data = read_json_lines_metadata(json_path)
+                    data["tests"] = JsonLinesTests(json_path)
+                else:
+                    with open(json_path, "r") as output_json_f:
+                        data = json.load(output_json_f)
             except Exception:
                 data_error()
         try:
@@ -35,18 +52,39 @@ class StructuredData(object):
 
         self.structured_data = structured_data
         self.structured_data_tests = structured_data_tests
-        structured_data_by_id = {}
-        for test in self.structured_data_tests:
-            structured_data_by_id[test["id"]] = test["data"]
-        self.structured_data_by_id = structured_data_by_id
+        self._structured_data_by_id = None
         self.has_details = "summary" in structured_data
         if self.has_details:
             self.read_summary()
 
+    @property
+    def structured_data_by_id(self):
+        """Map test IDs to test data - built on first use."""
+        if self._structured_data_by_id is None:
+            structured_data_by_id = {}
+            for test in self.structured_data_tests:
+                structured_data_by_id[test["id"]] = test["data"]
+            self._structured_data_by_id = structured_data_by_id
+        return self._structured_data_by_id
+
+    def set_tests(self, tests):
+        """Replace the test entries, invalidating the index of tests by ID."""
+        self.structured_data["tests"] = tests
+        self.structured_data_tests = tests
+        self._structured_data_by_id = None
+
     def update(self):
-        """Write out an updated version of this data structure to supplied json path."""
-        with open(self.json_path, "w") as out_f:
-            json.dump(self.structured_data, out_f)
+        """Write out an updated version of this data structure to supplied json path.
+
+        JSON-lines results are append-only, so only updated summary
+        information is appended to them.
+        """
+        if self.json_lines:
+            metadata = dict((k, v) for (k, v) in self.structured_data.items() if k != "tests")
+            with open(self.json_path, "a") as out_f:
+                out_f.write(_record_line(METADATA_RECORD_PREFIX, metadata))
+        else:
+            write_structured_data(self.json_path, self.structured_data)
 
     def set_exit_code(self, exit_code):
         """Set the exit_code for the this test."""
@@ -105,6 +143,101 @@ class StructuredData(object):
         return ids
 
 
+class JsonLinesTests(object):
+    """Lazily iterate the tests of a JSON-lines results file.
+
+    The file is re-read on each iteration, so tests are never all held in
+    memory at once.
+    """
+
+    def __init__(self, json_path):
+        self.json_path = json_path
+
+    def __iter__(self):
+        with open(self.json_path, "r") as f:
+            for line in f:
+                if line.startswith(TEST_RECORD_PREFIX):
+                    yield json.loads(line)["test"]
+
+
+class StructuredDataWriter(object):
+    """Append test results to a JSON-lines results file as they finish."""
+
+    def __init__(self, json_path):
+        self.json_path = json_path
+        self._lock = threading.Lock()
+        self._file = open(json_path, "w")
+        self._file.write(JSON_LINES_HEADER + "\n")
+        self._file.flush()
+
+    def write_test(self, test):
+        """Append the structured data for a single test."""
+        self._write(_record_line(TEST_RECORD_PREFIX, test))
+
+    def write_metadata(self, **metadata):
+        """Append summary information - later values replace earlier ones."""
+        self._write(_record_line(METADATA_RECORD_PREFIX, metadata))
+
+    def close(self):
+        """Close the underlying file."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, line):
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+
+class StructuredDataEncoder(json.JSONEncoder):
+    """JSON encoder aware of lazily read JSON-lines tests."""
+
+    def default(self, o):
+        if isinstance(o, JsonLinesTests):
+            return list(o)
+        return super(StructuredDataEncoder, self).default(o)
+
+
+def is_json_lines(json_path):
+    """Return ``True`` if the results file is in the JSON-lines format."""
+    with open(json_path, "r") as f:
+        return f.read(len(JSON_LINES_HEADER)) == JSON_LINES_HEADER
+
+
+def read_json_lines_metadata(json_path):
+    """Read the non-test records of a JSON-lines results file in a single pass."""
+    metadata = {}
+    with open(json_path, "r") as f:
+        for i, line in enumerate(f):
+            if i == 0:
+                metadata["version"] = json.loads(line)["version"]
+            elif line.startswith(METADATA_RECORD_PREFIX):
+                metadata.update(json.loads(line)["metadata"])
+    return metadata
+
+
+def write_structured_data(json_path, structured_data):
+    """Write structured data - as JSON lines if ``json_path`` ends with ``.jsonl``."""
+    if json_path.endswith(JSON_LINES_EXTENSION):
+        with StructuredDataWriter(json_path) as writer:
+            for test in structured_data.get("tests", []):
+                writer.write_test(test)
+            metadata = dict((k, v) for (k, v) in structured_data.items() if k not in ["tests", "version"])
+            writer.write_metadata(**metadata)
+    else:
+        with open(json_path, "w") as out_f:
+            json.dump(structured_data, out_f, cls=StructuredDataEncoder)
+
+
+def _record_line(prefix, value):
+    return "%s%s}\n" % (prefix, json.dumps(value))
+
+
 def get_dict_value(key, data):
     """Return data[key] with improved KeyError."""
     try:
@@ -114,6 +247,11 @@ def get_dict_value(key, data):
 
 
 __all__ = (
+    "is_json_lines",
+    "JsonLinesTests",
     "StructuredData",
+    "StructuredDataEncoder",
+    "StructuredDataWriter",
     "get_dict_value",
+    "write_structured_data",
 )
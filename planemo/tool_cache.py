@@ -0,0 +1,339 @@
+"""Cache parsed tools in-process and summaries of them on disk.
+
+Parsing a Galaxy tool means reading its XML and expanding its macros, which
+adds up when commands such as ``lint``, ``conda_install``, ``mull`` and
+``ci_find_tools`` walk large tool collections - and when the same tool is
+parsed again for every test case.
+
+:func:`load_tool_source` memoizes parsed tool sources for the lifetime of the
+process, re-parsing a tool only if it or a macro file it imports changed on
+disk. :class:`ToolIndex` additionally stores a :class:`ToolSummary` (ID,
+version, requirements, containers, tests and test-data references) of each
+tool in planemo's workspace keyed on the content hashes of the tool and its
+imported macros, so commands only needing these never parse unchanged tools
+again.
+"""
+import hashlib
+import json
+import os
+import threading
+from xml.etree import ElementTree
+
+from galaxy.tools.deps.requirements import parse_requirements_from_dict
+from galaxy.tools.parser import get_tool_source
+
+TOOL_CACHE_DIRECTORY = "tool_cache"
+TOOL_CACHE_VERSION = 2
+# Attributes of elements below <tests> that may name a test-data file.
+TEST_DATA_ATTRIBUTES = ["value", "file"]
+
+
+class ToolSummary(object):
+    """The parts of a tool most planemo commands need, without its XML tree.
+
+    Implements the ``parse_*`` methods of Galaxy's ``ToolSource`` used to find
+    requirements, so summaries can stand in for tool sources there.
+    """
+
+    def __init__(self, path, tool_id, name, version, requirements, containers,
+                 test_count=0, test_data=None, macro_paths=None, root_tag=None):
+        self.path = path
+        self.id = tool_id
+        self.name = name
+        self.version = version
+        self.requirements = requirements
+        self.containers = containers
+        self.test_count = test_count
+        self.test_data = test_data or []
+        self.macro_paths = macro_paths or []
+        self.root_tag = root_tag
+
+    def parse_id(self):
+        return self.id
+
+    def parse_name(self):
+        return self.name
+
+    def parse_version(self):
+        return self.version
+
+    def parse_requirements_and_containers(self):
+        return parse_requirements_from_dict(dict(
+            requirements=self.requirements,
+            containers=self.containers,
+        ))
+
+    def to_dict(self):
+        return dict(
+            path=self.path,
+            id=self.id,
+            name=self.name,
+            version=self.version,
+            requirements=self.requirements,
+            containers=self.containers,
+            test_count=self.test_count,
+            test_data=self.test_data,
+            macro_paths=self.macro_paths,
+            root_tag=self.root_tag,
+        )
+
+    @staticmethod
+    def from_dict(as_dict):
+        return ToolSummary(
+            as_dict["path"],
+            as_dict["id"],
+            as_dict["name"],
+            as_dict["version"],
+            as_dict["requirements"],
+            as_dict["containers"],
+            test_count=as_dict.get("test_count", 0),
+            test_data=as_dict.get("test_data", []),
+            macro_paths=as_dict.get("macro_paths", []),
+            root_tag=as_dict.get("root_tag", None),
+        )
+
+    @staticmethod
+    def from_tool_source(path, tool_source):
+        """Summarize a parsed Galaxy ``ToolSource``."""
+        requirements, containers = tool_source.parse_requirements_and_containers()
+        root = getattr(tool_source, "root", None)
+        test_count = 0
+        try:
+            test_count = len(tool_source.parse_tests_to_dict()["tests"])
+        except Exception:
+            # Not all tool formats describe tests.
+            pass
+        return ToolSummary(
+            os.path.abspath(path),
+            tool_source.parse_id(),
+            tool_source.parse_name(),
+            tool_source.parse_version(),
+            [r.to_dict() for r in requirements],
+            [c.to_dict() for c in containers],
+            test_count=test_count,
+            test_data=tool_test_data_references(root),
+            macro_paths=_macro_paths(path, tool_source),
+            root_tag=root.tag if root is not None else None,
+        )
+
+
+class ToolIndex(object):
+    """Summaries of tools stored on disk keyed on tool and macro contents.
+
+    If ``directory`` is ``None`` summaries are only kept in memory.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._summaries = {}
+
+    def summary(self, path):
+        """Return the :class:`ToolSummary` for the tool at ``path``.
+
+        Raises the exception from parsing the tool if it cannot be loaded.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            memoized = self._summaries.get(path, None)
+        if memoized is not None and memoized[0] == _stamps([path] + memoized[1].macro_paths):
+            return memoized[1]
+
+        summary = self._read(path)
+        if summary is None:
+            summary = ToolSummary.from_tool_source(path, load_tool_source(path))
+            self._write(summary)
+        with self._lock:
+            self._summaries[path] = (_stamps([path] + summary.macro_paths), summary)
+        return summary
+
+    def _read(self, path):
+        entry_path = self._entry_path(path)
+        if entry_path is None or not os.path.exists(entry_path):
+            return None
+        try:
+            with open(entry_path, "r") as f:
+                entry = json.load(f)
+            if entry["version"] != TOOL_CACHE_VERSION:
+                return None
+            for hashed_path, content_hash in entry["hashes"].items():
+                if _file_hash(hashed_path) != content_hash:
+                    return None
+            return ToolSummary.from_dict(entry["summary"])
+        except Exception:
+            # Corrupt entry or vanished macro file, just parse the tool again.
+            return None
+
+    def _write(self, summary):
+        entry_path = self._entry_path(summary.path)
+        if entry_path is None:
+            return
+        try:
+            entry = dict(
+                version=TOOL_CACHE_VERSION,
+                hashes=dict((p, _file_hash(p)) for p in [summary.path] + summary.macro_paths),
+                summary=summary.to_dict(),
+            )
+            parent = os.path.dirname(entry_path)
+            if not os.path.exists(parent):
+                os.makedirs(parent)
+            tmp_path = "%s.%d.%d.tmp" % (entry_path, os.getpid(), threading.current_thread().ident)
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.rename(tmp_path, entry_path)
+        except (IOError, OSError):
+            # The cache is an optimization - never fail a command over it.
+            pass
+
+    def _entry_path(self, path):
+        if self.directory is None:
+            return None
+        key = hashlib.sha1(path.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[0:2], "%s.json" % key)
+
+
+# Indices shared by every command run against the same planemo workspace.
+_TOOL_INDICES = {}
+_TOOL_INDICES_LOCK = threading.Lock()
+
+
+def tool_index(ctx):
+    """Return the :class:`ToolIndex` stored in ``ctx``'s planemo workspace.
+
+    ``ctx`` may be ``None`` to only cache summaries in memory.
+    """
+    directory = None
+    if ctx is not None and getattr(ctx, "planemo_directory", None):
+        directory = os.path.join(ctx.workspace, TOOL_CACHE_DIRECTORY)
+    with _TOOL_INDICES_LOCK:
+        index = _TOOL_INDICES.get(directory, None)
+        if index is None:
+            index = _TOOL_INDICES[directory] = ToolIndex(directory)
+        return index
+
+
+def tool_summary(ctx, path):
+    """Return the :class:`ToolSummary` for ``path`` from ``ctx``'s :func:`tool_index`."""
+    return tool_index(ctx).summary(path)
+
+
+# Parsed tool sources keyed on absolute path.
+_TOOL_SOURCES = {}
+_TOOL_SOURCES_LOCK = threading.Lock()
+
+
+def load_tool_source(path):
+    """Return a memoized Galaxy ``ToolSource`` for ``path``.
+
+    The tool is parsed again if it or any macro file it imports changed since
+    it was last loaded. Callers must not modify the returned object.
+    """
+    path = os.path.abspath(path)
+    with _TOOL_SOURCES_LOCK:
+        memoized = _TOOL_SOURCES.get(path, None)
+    if memoized is not None:
+        macro_paths, stamps, tool_source = memoized
+        if stamps == _stamps([path] + macro_paths):
+            return tool_source
+
+    tool_source = get_tool_source(path)
+    macro_paths = _macro_paths(path, tool_source)
+    stamps = _stamps([path] + macro_paths)
+    with _TOOL_SOURCES_LOCK:
+        _TOOL_SOURCES[path] = (macro_paths, stamps, tool_source)
+    return tool_source
+
+
+def tool_test_data_references(root):
+    """Return sorted file names ``<tests>`` in a tool XML ``root`` may reference."""
+    tests_el = root.find("tests") if root is not None else None
+    if tests_el is None:
+        return []
+    references = set()
+    for el in tests_el.iter():
+        for attribute in TEST_DATA_ATTRIBUTES:
+            for value in (el.get(attribute, None) or "").split(","):
+                value = value.strip()
+                if value:
+                    references.add(value)
+    return sorted(references)
+
+
+def _macro_paths(path, tool_source):
+    # Only XML tool sources import macros.
+    if getattr(tool_source, "root", None) is None:
+        return []
+    return _imported_macro_paths(path)
+
+
+def _imported_macro_paths(tool_path):
+    """Return the macro files a tool XML file imports, directly or through other macro files.
+
+    Imports are read from the ``<macros><import>`` elements of the files
+    themselves rather than from galaxy-lib internals. Like Galaxy, import
+    paths are resolved relative to the tool's directory.
+    """
+    tool_directory = os.path.dirname(os.path.abspath(tool_path))
+    macro_paths = []
+    pending = [tool_path]
+    while pending:
+        xml_path = pending.pop(0)
+        try:
+            root = ElementTree.parse(xml_path).getroot()
+        except (IOError, OSError, ElementTree.ParseError):
+            continue
+        macros_el = root if root.tag == "macros" else root.find("macros")
+        if macros_el is None:
+            continue
+        for import_el in macros_el.findall("import"):
+            name = (import_el.text or "").strip()
+            if not name:
+                continue
+            macro_path = os.path.abspath(os.path.join(tool_directory, name))
+            if macro_path not in macro_paths:
+                macro_paths.append(macro_path)
+                pending.append(macro_path)
+    return macro_paths
+
+
+def _stamps(paths):
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamps.append((path, None, None))
+            continue
+        stamps.append((path, stat.st_size, stat.st_mtime))
+    return stamps
+
+
+# Content hashes of files keyed on path, size and modification time.
+_FILE_HASHES = {}
+_FILE_HASHES_LOCK = threading.Lock()
+
+
+def _file_hash(path):
+    stat = os.stat(path)
+    memo_key = (path, stat.st_size, stat.st_mtime)
+    with _FILE_HASHES_LOCK:
+        file_hash = _FILE_HASHES.get(memo_key, None)
+    if file_hash is None:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+        with _FILE_HASHES_LOCK:
+            _FILE_HASHES[memo_key] = file_hash
+    return file_hash
+
+
+__all__ = (
+    "load_tool_source",
+    "tool_test_data_references",
+    "tool_index",
+    "tool_summary",
+    "ToolIndex",
+    "ToolSummary",
+)
@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
-from galaxy.tools.lint import lint_tool_source
+from galaxy.tools.lint import lint_tool_source_with
+from galaxy.tools.loader_directory import find_possible_tools_from_path
 
 from planemo.exit_codes import (
     EXIT_CODE_GENERIC_FAILURE,
@@ -8,40 +9,96 @@ from planemo.exit_codes import (
 )
 from planemo.io import (
     coalesce_return_codes,
-    error,
     info,
 )
+from planemo.lint import (
+    lint_in_processes,
+    picklable_lint_args,
+    prefetch_urls,
+    print_lint_records,
+    RecordingLintContext,
+    unpickle_lint_args,
+)
 from planemo.tools import (
     is_tool_load_error,
+    yield_tool_sources,
     yield_tool_sources_on_paths,
 )
 
 LINTING_TOOL_MESSAGE = "Linting tool %s"
+MALFORMED_XML_MESSAGE = "Could not lint %s due to malformed xml."
 
 
 def lint_tools_on_path(ctx, paths, lint_args, **kwds):
     assert_tools = kwds.get("assert_tools", True)
     recursive = kwds.get("recursive", False)
-    exit_codes = []
-    for (tool_path, tool_xml) in yield_tool_sources_on_paths(ctx, paths, recursive):
-        if handle_tool_load_error(tool_path, tool_xml):
-            exit_codes.append(EXIT_CODE_GENERIC_FAILURE)
-            continue
-        info("Linting tool %s" % tool_path)
-        if not lint_tool_source(tool_xml, **lint_args):
-            error("Failed linting")
-            exit_codes.append(EXIT_CODE_GENERIC_FAILURE)
-        else:
-            exit_codes.append(EXIT_CODE_OK)
+    jobs = kwds.get("jobs", None) or 1
+    if jobs > 1:
+        exit_codes = _lint_tools_in_processes(ctx, paths, lint_args, recursive, jobs)
+    else:
+        exit_codes = []
+        # Like the worker path, URLs are prefetched in a pass of their own
+        # (skipped without URL checks) so tools are loaded one at a time.
+        prefetch_urls(_xml_roots(yield_tool_sources_on_paths(ctx, paths, recursive)))
+        for (tool_path, tool_xml) in yield_tool_sources_on_paths(ctx, paths, recursive):
+            exit_code, records = lint_tool(tool_path, tool_xml, lint_args)
+            print_lint_records(records)
+            exit_codes.append(exit_code)
     return coalesce_return_codes(exit_codes, assert_at_least_one=assert_tools)
 
 
+def lint_tool(tool_path, tool_source, lint_args):
+    """Lint a loaded tool and return its exit code and :class:`planemo.lint.LintRecord` list."""
+    lint_ctx = RecordingLintContext(lint_args["level"], skip_types=lint_args["skip_types"])
+    if is_tool_load_error(tool_source):
+        lint_ctx.note(MALFORMED_XML_MESSAGE % tool_path)
+        return EXIT_CODE_GENERIC_FAILURE, lint_ctx.records
+    lint_ctx.note(LINTING_TOOL_MESSAGE % tool_path)
+    lint_tool_source_with(lint_ctx, tool_source, extra_modules=lint_args["extra_modules"])
+    if lint_ctx.failed(lint_args["fail_level"]):
+        lint_ctx.note("Failed linting", level="ERROR")
+        return EXIT_CODE_GENERIC_FAILURE, lint_ctx.records
+    return EXIT_CODE_OK, lint_ctx.records
+
+
+def _lint_tools_in_processes(ctx, paths, lint_args, recursive, jobs):
+    """Load and lint each tool file in a pool of worker processes."""
+    # Only parsed up front if URLs or DOIs are being checked.
+    prefetch_urls(_xml_roots(yield_tool_sources_on_paths(ctx, paths, recursive)))
+    tool_paths = []
+    for path in paths:
+        tool_paths.extend(find_possible_tools_from_path(
+            path,
+            recursive=recursive,
+            enable_beta_formats=True,
+        ))
+    lint_args = picklable_lint_args(lint_args)
+    tasks = [(ctx, tool_path, lint_args) for tool_path in tool_paths]
+    return lint_in_processes(_lint_tool_path_in_process, tasks, jobs)
+
+
+def _lint_tool_path_in_process(args):
+    ctx, tool_path, lint_args = args
+    lint_args = unpickle_lint_args(lint_args)
+    return [
+        lint_tool(tool_path, tool_source, lint_args)
+        for (tool_path, tool_source) in yield_tool_sources(ctx, tool_path)
+    ]
+
+
+def _xml_roots(tool_sources):
+    for (tool_path, tool_source) in tool_sources:
+        root = getattr(tool_source, "root", None)
+        if root is not None and not is_tool_load_error(tool_source):
+            yield root
+
+
 def handle_tool_load_error(tool_path, tool_xml):
     """ Return True if tool_xml is tool load error (invalid XML), and
     print a helpful error message.
     """
     is_error = False
     if is_tool_load_error(tool_xml):
-        info("Could not lint %s due to malformed xml." % tool_path)
+        info(MALFORMED_XML_MESSAGE % tool_path)
         is_error = True
     return is_error
@@ -9,6 +9,10 @@ from galaxy.tools import loader_directory
 from galaxy.tools.fetcher import ToolLocationFetcher
 
 from planemo.io import error, info
+from planemo.tool_cache import (
+    load_tool_source,
+    tool_index,
+)
 
 is_tool_load_error = loader_directory.is_tool_load_error
 SKIP_XML_MESSAGE = "Skipping XML file - does not appear to be a tool %s."
@@ -42,6 +46,50 @@ def yield_tool_sources(ctx, path, recursive=False, yield_load_errors=True):
         recursive,
         register_load_errors=True,
     )
+    return _filter_tool_sources(ctx, tools, yield_load_errors)
+
+
+def yield_tool_summaries_on_paths(ctx, paths, recursive=False, yield_load_errors=True):
+    """Like :func:`yield_tool_sources_on_paths` but yield cached tool summaries.
+
+    Summaries (see :class:`planemo.tool_cache.ToolSummary`) are read from
+    planemo's workspace and only tools that changed since they were last
+    summarized are parsed.
+    """
+    index = tool_index(ctx)
+    for path in paths:
+        tools = _load_tools_from_path(path, recursive, index.summary, register_load_errors=True)
+        for (tool_path, tool_summary) in _filter_tool_sources(ctx, tools, yield_load_errors):
+            yield (tool_path, tool_summary)
+
+
+def load_tool_sources_from_path(path, recursive, register_load_errors=False):
+    """Generator for tool sources on a path.
+
+    Tool sources are memoized for the life of the process - see
+    :func:`planemo.tool_cache.load_tool_source`.
+    """
+    return _load_tools_from_path(path, recursive, load_tool_source, register_load_errors)
+
+
+def _load_tools_from_path(path, recursive, loader_func, register_load_errors):
+    possible_tool_files = loader_directory.find_possible_tools_from_path(
+        path,
+        recursive=recursive,
+        enable_beta_formats=True,
+    )
+    for possible_tool_file in possible_tool_files:
+        try:
+            tool_source = loader_func(possible_tool_file)
+        except Exception:
+            _load_exception_handler(possible_tool_file, sys.exc_info())
+            if register_load_errors:
+                yield (possible_tool_file, loader_directory.TOOL_LOAD_ERROR)
+            continue
+        yield (possible_tool_file, tool_source)
+
+
+def _filter_tool_sources(ctx, tools, yield_load_errors):
     for (tool_path, tool_source) in tools:
         if is_tool_load_error(tool_source):
             if yield_load_errors:
@@ -55,16 +103,6 @@ def yield_tool_sources(ctx, path, recursive=False, yield_load_errors=True):
         yield (tool_path, tool_source)
 
 
-def load_tool_sources_from_path(path, recursive, register_load_errors=False):
-    """Generator for tool sources on a path."""
-    return loader_directory.load_tool_sources_from_path(
-        path,
-        _load_exception_handler,
-        recursive=recursive,
-        register_load_errors=register_load_errors,
-    )
-
-
 def _load_exception_handler(path, exc_info):
     error(LOAD_ERROR_MESSAGE % path)
     traceback.print_exception(*exc_info, limit=1, file=sys.stderr)
@@ -74,8 +112,9 @@ def _is_tool_source(ctx, tool_path, tool_source):
     if os.path.basename(tool_path) in SHED_FILES:
         return False
     root = getattr(tool_source, "root", None)
-    if root is not None:
-        if root.tag != "tool":
+    root_tag = root.tag if root is not None else getattr(tool_source, "root_tag", None)
+    if root_tag is not None:
+        if root_tag != "tool":
             if ctx.verbose:
                 info(SKIP_XML_MESSAGE % tool_path)
             return False
@@ -87,4 +126,5 @@ __all__ = (
     "load_tool_sources_from_path",
     "yield_tool_sources",
     "yield_tool_sources_on_paths",
+    "yield_tool_summaries_on_paths",
 )
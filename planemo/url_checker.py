@@ -0,0 +1,186 @@
+"""Check the availability of many URLs concurrently.
+
+A :class:`UrlChecker` checks each unique URL once, in a thread pool. It uses one
+pooled HTTP session per host and bounds the number of simultaneous requests
+made to any single host. Results can optionally be persisted to a JSON file,
+which is reused by later checkers until entries expire.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+import requests
+from six.moves.urllib.error import (
+    HTTPError,
+    URLError,
+)
+from six.moves.urllib.parse import urlparse
+from six.moves.urllib.request import (
+    Request,
+    urlopen,
+)
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_THREADS = 8
+DEFAULT_REQUESTS_PER_HOST = 2
+DEFAULT_TIMEOUT = 30
+# Number of bytes read from each response to confirm it can be downloaded.
+READ_BYTES = 100
+
+
+class UrlCheckResult(namedtuple("UrlCheckResult", ["url", "status_code", "error"])):
+    """Outcome of accessing a URL - an HTTP status code or a connection error."""
+
+    @property
+    def cacheable(self):
+        """Whether this result is definitive rather than a transient problem."""
+        status_code = self.status_code
+        return status_code is not None and status_code != 429 and status_code < 500
+
+
+class UrlChecker(object):
+    """Check URLs concurrently, caching results in memory and optionally on disk."""
+
+    def __init__(
+        self,
+        cache_path=None,
+        ttl=DEFAULT_TTL,
+        threads=DEFAULT_THREADS,
+        requests_per_host=DEFAULT_REQUESTS_PER_HOST,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.threads = threads
+        self.requests_per_host = requests_per_host
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._results = {}
+        self._dirty = False
+        if cache_path and os.path.exists(cache_path):
+            self._load()
+
+    def check(self, url, user_agent=None):
+        """Return a :class:`UrlCheckResult` for url - fetching it only if needed."""
+        key = _key(url, user_agent)
+        with self._lock:
+            cached = self._results.get(key)
+        if cached is not None and not self._expired(cached["time"]):
+            return UrlCheckResult(url, cached["status_code"], cached["error"])
+
+        result = self._fetch(url, user_agent)
+        with self._lock:
+            self._results[key] = dict(
+                time=time.time(),
+                status_code=result.status_code,
+                error=result.error,
+            )
+            self._dirty = self._dirty or result.cacheable
+        return result
+
+    def check_all(self, targets):
+        """Check each unique ``(url, user_agent)`` pair in targets concurrently."""
+        unique_targets = []
+        for target in targets:
+            if target not in unique_targets:
+                unique_targets.append(target)
+
+        threads = min(self.threads, len(unique_targets))
+        if threads <= 1:
+            return [self.check(*t) for t in unique_targets]
+
+        pool = ThreadPool(threads)
+        try:
+            return pool.map(lambda t: self.check(*t), unique_targets)
+        finally:
+            pool.close()
+            pool.join()
+
+    def save(self):
+        """Write definitive, unexpired results to ``cache_path`` (if set)."""
+        if not self.cache_path or not self._dirty:
+            return
+        with self._lock:
+            entries = dict(
+                (k, v) for (k, v) in self._results.items()
+                if not self._expired(v["time"]) and UrlCheckResult(None, v["status_code"], v["error"]).cacheable
+            )
+            self._dirty = False
+        parent = os.path.dirname(self.cache_path)
+        if parent and not os.path.exists(parent):
+            os.makedirs(parent)
+        tmp_path = "%s.%d.tmp" % (self.cache_path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.rename(tmp_path, self.cache_path)
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                entries = json.load(f)
+        except Exception:
+            # A corrupt cache just means checking URLs again.
+            return
+        for key, entry in entries.items():
+            if not self._expired(entry["time"]):
+                self._results[key] = entry
+
+    def _expired(self, checked_time):
+        return time.time() - checked_time > self.ttl
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.requests_per_host,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                semaphore = threading.BoundedSemaphore(self.requests_per_host)
+                self._hosts[host] = (session, semaphore)
+            return self._hosts[host]
+
+    def _fetch(self, url, user_agent):
+        session, semaphore = self._host(url)
+        with semaphore:
+            if urlparse(url).scheme not in ["http", "https"]:
+                return self._fetch_with_urlopen(url, user_agent)
+            headers = {"User-Agent": user_agent} if user_agent else {}
+            try:
+                response = session.get(url, headers=headers, stream=True, timeout=self.timeout)
+                try:
+                    next(response.iter_content(READ_BYTES), None)
+                finally:
+                    response.close()
+            except requests.exceptions.RequestException as e:
+                return UrlCheckResult(url, None, str(e))
+            return UrlCheckResult(url, response.status_code, None)
+
+    def _fetch_with_urlopen(self, url, user_agent):
+        # requests only speaks HTTP, fallback to urllib for FTP and friends.
+        req = Request(url, headers={"User-Agent": user_agent}) if user_agent else url
+        try:
+            handle = urlopen(req, timeout=self.timeout)
+            handle.read(READ_BYTES)
+        except HTTPError as e:
+            return UrlCheckResult(url, e.code, None)
+        except (URLError, IOError) as e:
+            return UrlCheckResult(url, None, str(e))
+        return UrlCheckResult(url, 200, None)
+
+
+def _key(url, user_agent):
+    return "%s %s" % (user_agent or "", url)
+
+
+__all__ = (
+    "UrlChecker",
+    "UrlCheckResult",
+)
@@ -1,8 +1,12 @@
 """Module describing abstractions for validating XML content."""
 import abc
+import os
 import subprocess
+import tempfile
+import threading
 
 from collections import namedtuple
+from xml.etree import ElementTree
 
 from galaxy.tools.deps.commands import which
 try:
@@ -11,6 +15,7 @@ except ImportError:
     etree = None
 
 XMLLINT_COMMAND = "xmllint --noout --schema {0} {1} 2>&1"
+XMLLINT_STDIN_COMMAND = "xmllint --noout --schema {0} - 2>&1"
 INSTALL_VALIDATOR_MESSAGE = ("This feature requires an external dependency "
                              "to function, pleaes install xmllint (e.g 'brew "
                              "install libxml2' or 'apt-get install "
@@ -29,6 +34,15 @@ class XsdValidator(object):
         :return type: ValidationResult
         """
 
+    def validate_tree(self, schema_path, tree):
+        """Validate an in-memory ``ElementTree`` or element against ``schema_path``.
+
+        :return type: ValidationResult
+        """
+        with tempfile.NamedTemporaryFile(suffix=".xml") as tf:
+            ElementTree.ElementTree(_root(tree)).write(tf.name)
+            return self.validate(schema_path, tf.name)
+
     @abc.abstractmethod
     def enabled(self):
         """Return True iff system has dependencies for this validator.
@@ -41,17 +55,39 @@ ValidationResult = namedtuple("ValidationResult", ["passed", "output"])
 
 
 class LxmlValidator(XsdValidator):
-    """Validate XSD files using lxml library."""
+    """Validate XSD files using lxml library.
+
+    Each schema is compiled once per process and cached - see
+    :func:`compiled_schema`.
+    """
 
     def validate(self, schema_path, target_path):
         try:
-            xsd_doc = etree.parse(schema_path)
-            xsd = etree.XMLSchema(xsd_doc)
             xml = etree.parse(target_path)
-            passed = xsd.validate(xml)
-            return ValidationResult(passed, xsd.error_log)
         except etree.XMLSyntaxError as e:
             return ValidationResult(False, str(e))
+        return self._validate(schema_path, xml)
+
+    def validate_tree(self, schema_path, tree):
+        root = _root(tree)
+        if not etree.iselement(root):
+            # Convert a standard library tree without touching the filesystem.
+            try:
+                root = etree.fromstring(ElementTree.tostring(root))
+            except etree.XMLSyntaxError as e:
+                return ValidationResult(False, str(e))
+        return self._validate(schema_path, root)
+
+    def _validate(self, schema_path, xml):
+        try:
+            xsd = compiled_schema(schema_path)
+        except etree.XMLSyntaxError as e:
+            return ValidationResult(False, str(e))
+        # The error log belongs to the shared schema object.
+        with _compiled_schemas_lock:
+            passed = xsd.validate(xml)
+            error_log = xsd.error_log
+        return ValidationResult(passed, error_log)
 
     def enabled(self):
         return etree is not None
@@ -67,12 +103,36 @@ class XmllintValidator(XsdValidator):
         passed = p.returncode == 0
         return ValidationResult(passed, stdout)
 
+    def validate_tree(self, schema_path, tree):
+        # Pipe the document to xmllint rather than writing a temp file.
+        command = XMLLINT_STDIN_COMMAND.format(schema_path)
+        p = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, shell=True)
+        stdout, _ = p.communicate(ElementTree.tostring(_root(tree)))
+        passed = p.returncode == 0
+        return ValidationResult(passed, stdout)
+
     def enabled(self):
         return bool(which("xmllint"))
 
 
 VALIDATORS = [LxmlValidator(), XmllintValidator()]
 
+_compiled_schemas = {}
+_compiled_schemas_lock = threading.RLock()
+
+
+def compiled_schema(schema_path):
+    """Return an lxml ``XMLSchema`` for ``schema_path`` - compiling it only once per process."""
+    schema_path = os.path.abspath(schema_path)
+    with _compiled_schemas_lock:
+        if schema_path not in _compiled_schemas:
+            _compiled_schemas[schema_path] = etree.XMLSchema(etree.parse(schema_path))
+        return _compiled_schemas[schema_path]
+
+
+def _root(tree):
+    return tree.getroot() if hasattr(tree, "getroot") else tree
+
 
 def get_validator(require=True):
     """Return a :class:`XsdValidator` object based on available dependencies."""
@@ -87,6 +147,7 @@ def get_validator(require=True):
 
 
 __all__ = (
+    "compiled_schema",
     "get_validator",
     "XsdValidator",
 )
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""Time ``planemo --help`` and fail if it exceeds a startup budget.
+
+Usage: benchmark_startup.py [BUDGET_SECONDS [RUNS]]
+
+The budget defaults to the ``PLANEMO_STARTUP_BUDGET`` environment variable
+or 0.4 seconds. The median of several fresh interpreter runs is compared
+against it so a single slow run doesn't fail the check.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DEFAULT_BUDGET = float(os.environ.get("PLANEMO_STARTUP_BUDGET", "0.4"))
+DEFAULT_RUNS = 5
+HELP_COMMAND = [sys.executable, "-c", "from planemo.cli import planemo; planemo()", "--help"]
+
+
+def time_help(runs):
+    timings = []
+    with open(os.devnull, "w") as devnull:
+        for _ in range(runs):
+            start = time.time()
+            subprocess.check_call(HELP_COMMAND, cwd=project_dir, stdout=devnull, stderr=devnull)
+            timings.append(time.time() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main(argv):
+    budget = float(argv[1]) if len(argv) > 1 else DEFAULT_BUDGET
+    runs = int(argv[2]) if len(argv) > 2 else DEFAULT_RUNS
+    median = time_help(runs)
+    print("planemo --help: median %.3fs over %d runs (budget %.3fs)" % (median, runs, budget))
+    if median > budget:
+        print("Startup time exceeds budget - check for new module level imports of heavy dependencies.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
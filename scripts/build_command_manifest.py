@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+"""Rebuild planemo/commands/manifest.py - run after adding or changing a command."""
+
+import json
+import os
+import sys
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, project_dir)
+
+from planemo.cli import build_command_manifest
+
+MANIFEST_TEMPLATE = '''"""Short help for each planemo command.
+
+Lets ``planemo --help`` list commands without importing them. Generated by
+``scripts/build_command_manifest.py`` (``make command-manifest``) - do not
+edit by hand.
+"""
+
+COMMANDS = {
+%s}
+'''
+
+manifest = build_command_manifest()
+entries = "".join(
+    "    %s: %s,\n" % (json.dumps(name), json.dumps(manifest[name])) for name in sorted(manifest)
+)
+manifest_path = os.path.join(project_dir, "planemo", "commands", "manifest.py")
+with open(manifest_path, "w") as f:
+    f.write(MANIFEST_TEMPLATE % entries)
@@ -0,0 +1,156 @@
+"""Tests for :mod:`planemo.ci` and the ``ci_find_*`` commands."""
+import json
+import os
+
+import click
+
+from planemo import ci
+from planemo import io
+from planemo.ci_dependencies import build_reverse_dependency_index
+
+from .test_utils import (
+    CliTestCase,
+    TEST_DATA_DIR,
+)
+
+TOOL_TEMPLATE = '<tool id="%s" name="%s" version="1.0"><command>true</command></tool>'
+MACRO_TOOL_TEMPLATE = """<tool id="%s" name="%s" version="1.0">
+    <macros><import>macros.xml</import></macros>
+    <command>true</command>
+    <tests><test><param name="input" value="%s" /></test></tests>
+</tool>
+"""
+SHED_TEMPLATE = "name: %s\nowner: iuc\ninclude:\n- %s\n"
+WORKFLOW = """class: GalaxyWorkflow
+steps:
+  - tool_id: toolshed.g2.bx.psu.edu/repos/iuc/a/tool_a/1.0
+  - run: sub.gxwf.yml
+"""
+
+
+def test_balanced_chunks():
+    paths = ["a", "b", "c", "d", "e"]
+    costs = [10.0, 1.0, 1.0, 8.0, 2.0]
+    chunks = ci.balanced_chunks(paths, costs, 2)
+    assert chunks == [["a", "b"], ["c", "d", "e"]]
+    assert sorted(p for c in chunks for p in c) == paths
+
+
+def test_chunk_out_of_range():
+    for durations in [None, ["durations.json"]]:
+        for chunk, chunk_count in [(2, 2), (-1, 2), (0, 0)]:
+            try:
+                ci.chunk_paths(None, ["a", "b"], chunk=chunk, chunk_count=chunk_count, chunk_durations=durations)
+            except click.UsageError as e:
+                assert "--chunk" in str(e)
+            else:
+                raise AssertionError("Expected chunk %d of %d to be rejected." % (chunk, chunk_count))
+
+
+def test_read_durations_skips_untimed_tests():
+    with io.temp_directory() as t:
+        tests = [
+            {"id": "timed_0", "data": {"status": "success", "time_seconds": 2.0}},
+            {"id": "timed_1", "data": {"status": "error"}},
+            {"id": "untimed_0", "data": {"status": "error", "time_seconds": None}},
+            {"id": "untimed_1"},
+        ]
+        _write(t, "tool_test_output.json", json.dumps({"version": "0.1", "tests": tests}))
+        durations = ci.read_test_durations([os.path.join(t, "tool_test_output.json")])
+        assert durations == {"timed": 2.0}
+
+
+def test_read_xunit_durations():
+    durations = ci.read_test_durations([os.path.join(TEST_DATA_DIR, "xunit_nose_1_3.xml")])
+    assert abs(durations["cat"] - 12.19) < 0.01
+
+
+def test_reverse_dependency_index():
+    with io.temp_directory() as t:
+        _write(t, "tool_a.xml", MACRO_TOOL_TEMPLATE % ("tool_a", "tool_a", "input.txt"))
+        _write(t, "macros.xml", "<macros />")
+        _write(t, os.path.join("test-data", "input.txt"), "a")
+        _write(t, "main.gxwf.yml", WORKFLOW)
+        _write(t, "sub.gxwf.yml", "class: GalaxyWorkflow\nsteps: []\n")
+        index = build_reverse_dependency_index(None, [t])
+        real_t = os.path.realpath(t)
+
+        def affected(path):
+            return sorted(os.path.basename(p) for p in index.affected([os.path.join(real_t, path)]))
+
+        assert affected("macros.xml") == ["macros.xml", "main.gxwf.yml", "tool_a.xml"]
+        assert affected(os.path.join("test-data", "input.txt")) == ["input.txt", "main.gxwf.yml", "tool_a.xml"]
+        assert affected("sub.gxwf.yml") == ["main.gxwf.yml", "sub.gxwf.yml"]
+        assert affected("main.gxwf.yml") == ["main.gxwf.yml"]
+
+
+def _write(directory, name, contents):
+    path = os.path.join(directory, name)
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        f.write(contents)
+
+
+class CiFindToolsTestCase(CliTestCase):
+
+    def test_chunk_durations(self):
+        with self._isolate() as f:
+            tests = []
+            for tool_id, time_seconds in [("slow", 100.0), ("fast1", 1.0), ("fast2", 1.0), ("fast3", 1.0)]:
+                with open(os.path.join(f, "%s.xml" % tool_id), "w") as tool_f:
+                    tool_f.write(TOOL_TEMPLATE % (tool_id, tool_id))
+                tests.append({
+                    "id": "%s_0" % tool_id,
+                    "data": {"status": "success", "time_seconds": time_seconds},
+                })
+            durations_path = os.path.join(f, "tool_test_output.json")
+            with open(durations_path, "w") as durations_f:
+                json.dump({"version": "0.1", "tests": tests}, durations_f)
+
+            chunks = []
+            for chunk in range(2):
+                output = os.path.join(f, "chunk%d.txt" % chunk)
+                self._check_exit_code([
+                    "ci_find_tools", "--chunk_count", "2", "--chunk", str(chunk),
+                    "--chunk_durations", durations_path, "--output", output, f,
+                ])
+                with open(output, "r") as output_f:
+                    chunks.append(output_f.read().split())
+
+            # The slow tool gets a chunk to itself.
+            assert chunks[0] == ["slow.xml"] or chunks[1] == ["slow.xml"], chunks
+            assert len(chunks[0] + chunks[1]) == 4
+
+    def test_changed_shared_files(self):
+        with self._isolate() as f:
+            _write(f, os.path.join("shared", "macros.xml"), "<macros />")
+            _write(f, os.path.join("shared", "data.txt"), "data")
+            for name in ["a", "b", "c"]:
+                _write(f, os.path.join(name, "tool_%s.xml" % name), MACRO_TOOL_TEMPLATE % (name, name, "1.txt"))
+                _write(f, os.path.join(name, "test-data", "1.txt"), name)
+            os.symlink(os.path.join("..", "shared", "macros.xml"), os.path.join(f, "a", "macros.xml"))
+            _write(f, os.path.join("b", "macros.xml"), "<macros />")
+            _write(f, os.path.join("c", "macros.xml"), "<macros />")
+            _write(f, os.path.join("a", ".shed.yml"), SHED_TEMPLATE % ("a", "'*'"))
+            _write(f, os.path.join("b", ".shed.yml"), SHED_TEMPLATE % ("b", "'*'"))
+            _write(f, os.path.join("c", ".shed.yml"), SHED_TEMPLATE % ("c", "../shared/data.txt"))
+            _git(f, "git init . && git add . && git commit -q -m initial")
+
+            _write(f, os.path.join("shared", "macros.xml"), "<macros><token name=\"@X@\">x</token></macros>")
+            _write(f, os.path.join("shared", "data.txt"), "new data")
+            _git(f, "git commit -q -a -m shared")
+
+            def find(command):
+                output = os.path.join(f, "%s.txt" % command)
+                self._check_exit_code([command, "--changed_in_commit_range", "HEAD~1..HEAD", "--output", output, f])
+                with open(output, "r") as output_f:
+                    return output_f.read().split()
+
+            assert find("ci_find_repos") == ["a", "c"]
+            assert find("ci_find_tools") == [os.path.join("a", "tool_a.xml")]
+
+
+def _git(directory, command):
+    env = "GIT_AUTHOR_NAME=a GIT_AUTHOR_EMAIL=a@example.com GIT_COMMITTER_NAME=a GIT_COMMITTER_EMAIL=a@example.com"
+    assert io.shell("cd '%s' && export %s && %s" % (directory, env, command)) == 0
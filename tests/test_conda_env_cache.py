@@ -0,0 +1,113 @@
+"""Unit tests for :mod:`planemo.conda_env_cache`."""
+import os
+import stat
+import sys
+
+from galaxy.tools.deps.conda_util import CondaTarget
+
+from planemo.conda_env_cache import (
+    build_environments,
+    CondaEnvironmentCache,
+    merged_environment_name,
+)
+
+from .test_utils import (
+    assert_equal,
+    TempDirectoryTestCase,
+)
+
+SAMTOOLS = CondaTarget("samtools", "1.3.1")
+BWA = CondaTarget("bwa", "0.7.15")
+
+
+def test_merged_environment_name():
+    assert_equal(merged_environment_name([SAMTOOLS]), "__samtools@1.3.1")
+    name = merged_environment_name([SAMTOOLS, BWA])
+    assert name.startswith("mulled-v1-")
+    assert name != merged_environment_name([BWA, SAMTOOLS])
+
+
+class CondaEnvironmentCacheTestCase(TempDirectoryTestCase):
+
+    def setUp(self):
+        super(CondaEnvironmentCacheTestCase, self).setUp()
+        self.conda_context = _FakeCondaContext(self.temp_directory)
+        self.cache = CondaEnvironmentCache(os.path.join(self.temp_directory, "cache"), self.conda_context)
+
+    def test_each_set_solved_once(self):
+        target_lists = [[SAMTOOLS, BWA], [BWA, SAMTOOLS], [SAMTOOLS, BWA], [SAMTOOLS]]
+        assert_equal(build_environments(None, target_lists, self.conda_context, jobs=2, cache=self.cache), 0)
+        assert_equal(self.conda_context.solves, 2)
+        assert_equal(self.conda_context.envs, set([
+            merged_environment_name([SAMTOOLS, BWA]),
+            merged_environment_name([BWA, SAMTOOLS]),
+            "__samtools@1.3.1",
+        ]))
+        explicit_path = self.cache.explicit_path([BWA, SAMTOOLS])
+        assert explicit_path is not None
+        with open(explicit_path, "r") as f:
+            explicit = f.read()
+        assert explicit.startswith("@EXPLICIT\n")
+        assert "# list --name mulled-v1-" in explicit
+        assert explicit.rstrip().endswith("--explicit")
+
+        # A fresh Conda prefix is populated from the cached solutions.
+        self.conda_context.envs.clear()
+        assert_equal(build_environments(None, target_lists, self.conda_context, cache=self.cache), 0)
+        assert_equal(self.conda_context.solves, 2)
+        assert_equal(len(self.conda_context.envs), 3)
+        assert_equal(len(self.conda_context.commands), 4)
+        assert all(c[0] == "create" for c in self.conda_context.commands)
+
+    def test_failed_solve(self):
+        self.conda_context.fail = True
+        assert_equal(build_environments(None, [[SAMTOOLS]], self.conda_context, cache=self.cache), 1)
+        assert self.cache.explicit_path([SAMTOOLS]) is None
+
+
+FAKE_CONDA_SCRIPT = """#!%s
+import sys
+print("@EXPLICIT")
+print("# " + " ".join(sys.argv[1:]))
+"""
+SHELL_METACHARACTERS = set("<>|&;$`")
+
+
+class _FakeCondaContext(object):
+    ensure_channels = ["bioconda"]
+    use_local = False
+    condarc_override = None
+
+    def __init__(self, directory):
+        self.envs = set()
+        self.solves = 0
+        self.fail = False
+        self.commands = []
+        self.conda_exec = os.path.join(directory, "conda")
+        with open(self.conda_exec, "w") as f:
+            f.write(FAKE_CONDA_SCRIPT % sys.executable)
+        os.chmod(self.conda_exec, os.stat(self.conda_exec).st_mode | stat.S_IEXEC)
+
+    def has_env(self, env_name):
+        return env_name in self.envs
+
+    def exec_create(self, args, allow_local=True):
+        self.solves += 1
+        if self.fail:
+            return 1
+        self.envs.add(args[1])
+        return 0
+
+    def exec_remove(self, args):
+        self.envs.discard(args[0])
+        return 0
+
+    def exec_command(self, operation, args):
+        # galaxy-lib quotes each argument, so nothing here may rely on a shell.
+        argv = [operation] + list(args)
+        for arg in argv:
+            assert not SHELL_METACHARACTERS.intersection(arg), argv
+        self.commands.append(argv)
+        if operation == "create":
+            self.envs.add(args[2])
+        return 0
@@ -0,0 +1,77 @@
+"""Unit tests for :mod:`planemo.conda_index`."""
+import json
+import os
+import time
+
+from galaxy.tools.deps.conda_util import CondaTarget
+
+from planemo.conda_index import (
+    compact_repodata,
+    CondaPackageIndex,
+)
+
+from .test_utils import (
+    assert_equal,
+    TempDirectoryTestCase,
+)
+
+REPODATA = {
+    "packages": {
+        "samtools-1.3.1-0.tar.bz2": {"name": "samtools", "version": "1.3.1", "build": "0", "build_number": 0},
+        "samtools-1.3.1-1.tar.bz2": {"name": "samtools", "version": "1.3.1", "build": "1", "build_number": 1},
+        "samtools-1.9-0.tar.bz2": {"name": "samtools", "version": "1.9", "build": "0", "build_number": 0},
+    }
+}
+
+
+def test_compact_repodata():
+    assert_equal(compact_repodata(REPODATA), {
+        "samtools": [["1.3.1", "0", 0], ["1.3.1", "1", 1], ["1.9", "0", 0]],
+    })
+
+
+class CondaPackageIndexTestCase(TempDirectoryTestCase):
+
+    def test_best_search_result(self):
+        index = _FakeCondaPackageIndex(["bioconda"], directory=self.temp_directory, subdirs=["linux-64"])
+        hit, exact = index.best_search_result(CondaTarget("samtools", "1.3.1"))
+        assert_equal((hit["version"], hit["channel"], exact), ("1.3.1", "bioconda", True))
+        hit, exact = index.best_search_result(CondaTarget("samtools", "1.2"))
+        assert_equal((hit["version"], exact), ("1.9", False))
+        hit, exact = index.best_search_result(CondaTarget("samtools"))
+        assert_equal((hit["version"], exact), ("1.9", True))
+        assert_equal(index.best_search_result(CondaTarget("bwa")), (None, None))
+        assert_equal(index.fetches, 1)
+
+        # A new index reuses the stored metadata until it expires.
+        index = _FakeCondaPackageIndex(["bioconda"], directory=self.temp_directory, subdirs=["linux-64"])
+        index.search("samtools")
+        assert_equal(index.fetches, 0)
+
+        cache_path = os.path.join(self.temp_directory, "bioconda_linux-64.json")
+        with open(cache_path, "r") as f:
+            entry = json.load(f)
+        entry["time"] = time.time() - 2 * index.ttl
+        with open(cache_path, "w") as f:
+            json.dump(entry, f)
+        index = _FakeCondaPackageIndex(["bioconda"], directory=self.temp_directory, subdirs=["linux-64"])
+        index.search("samtools")
+        assert_equal(index.fetches, 1)
+
+    def test_expired_metadata_used_offline(self):
+        index = _FakeCondaPackageIndex(["bioconda"], directory=self.temp_directory, subdirs=["linux-64"], ttl=-1)
+        index.search("samtools")
+        index = _FakeCondaPackageIndex(["bioconda"], directory=self.temp_directory, subdirs=["linux-64"], ttl=-1)
+        index.offline = True
+        assert_equal(len(index.search("samtools")), 3)
+
+
+class _FakeCondaPackageIndex(CondaPackageIndex):
+    fetches = 0
+    offline = False
+
+    def _fetch(self, channel, subdir):
+        if self.offline:
+            raise IOError("offline")
+        self.fetches += 1
+        return compact_repodata(REPODATA)
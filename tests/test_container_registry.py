@@ -0,0 +1,133 @@
+"""Tests for :mod:`planemo.container_registry` against a stand-in HTTP server."""
+import bz2
+import json
+import threading
+
+import requests
+from galaxy.tools.deps.conda_util import CondaTarget
+from six.moves import BaseHTTPServer
+
+from planemo.conda_index import CondaPackageIndex
+from planemo.container_registry import (
+    PullRequestTitleIndex,
+    RegistryLookups,
+)
+
+from .test_utils import (
+    assert_equal,
+    TempDirectoryTestCase,
+)
+
+EXISTING = "mulled-v2-0123456789abcdef"
+TAGGED = "mulled-v2-fedcba9876543210:0a1b2c3d"
+UNAVAILABLE = {"mulled-v2-cccc": 503, "mulled-v2-dddd": 429}
+REPODATA = {"packages": {"bwa-0.7.15-0.tar.bz2": {"name": "bwa", "version": "0.7.15", "build": "0"}}}
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):  # noqa
+        self.server.requested.append(self.path)
+        headers = {}
+        if self.path.startswith("/quay/repository/biocontainers/"):
+            name = self.path.rsplit("/", 1)[-1]
+            if name == EXISTING:
+                status, body = 200, {"tags": {"0": {}}}
+            elif name in UNAVAILABLE:
+                status, body = UNAVAILABLE[name], {"error_message": "Unavailable"}
+            else:
+                status, body = 404, {"error_type": "not_found"}
+        elif self.path.startswith("/github/repos/BioContainers/registry/pulls?"):
+            status, body = 200, [{"title": "Add container %s." % TAGGED}]
+            headers["Link"] = '<http://localhost:%d/github/page2>; rel="next"' % self.server.server_address[1]
+        elif self.path == "/github/page2":
+            status, body = 200, [{"title": "Update README"}]
+        elif self.path == "/conda/bioconda/linux-64/repodata.json.bz2":
+            self._respond(200, bz2.compress(json.dumps(REPODATA).encode("utf-8")), {})
+            return
+        elif self.path.startswith("/conda/broken/"):
+            status, body = 500, {}
+        else:
+            status, body = 404, {}
+        self._respond(status, json.dumps(body).encode("utf-8"), headers)
+
+    def _respond(self, status, content, headers):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class ContainerRegistryTestCase(TempDirectoryTestCase):
+
+    def setUp(self):  # noqa
+        super(ContainerRegistryTestCase, self).setUp()
+        self.server = BaseHTTPServer.HTTPServer(("localhost", 0), _Handler)
+        self.server.requested = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.base_url = "http://localhost:%d" % self.server.server_address[1]
+        self.lookups = RegistryLookups(
+            quay_api_url=self.base_url + "/quay",
+            github_api_url=self.base_url + "/github",
+            threads=4,
+        )
+
+    def tearDown(self):  # noqa
+        self.server.shutdown()
+        self.server.server_close()
+        super(ContainerRegistryTestCase, self).tearDown()
+
+    def test_quay_repositories(self):
+        names = [EXISTING, "mulled-v2-aaaa", EXISTING, "mulled-v2-bbbb"]
+        repositories = self.lookups.quay_repositories("biocontainers", names)
+        assert "tags" in repositories[EXISTING]
+        assert "tags" not in repositories["mulled-v2-aaaa"]
+        # Each distinct repository is requested once.
+        assert_equal(len(self.server.requested), 3)
+
+    def test_quay_unavailable(self):
+        repositories = self.lookups.quay_repositories("biocontainers", list(UNAVAILABLE.keys()) + ["mulled-v2-aaaa"])
+        for name in UNAVAILABLE:
+            assert repositories[name] is None, repositories
+        assert_equal(repositories["mulled-v2-aaaa"], {"error_type": "not_found"})
+
+        unreachable = RegistryLookups(quay_api_url="http://localhost:1/quay", timeout=1)
+        assert unreachable.quay_repository("biocontainers", EXISTING) is None
+
+    def test_pull_request_title_index(self):
+        titles = self.lookups.open_pull_request_titles("BioContainers/registry")
+        assert_equal(titles, ["Add container %s." % TAGGED, "Update README"])
+        index = PullRequestTitleIndex(titles)
+        assert TAGGED in index
+        assert TAGGED.split(":")[0] in index
+        assert EXISTING not in index
+
+    def test_conda_index(self):
+        index = CondaPackageIndex(["bioconda"], subdirs=["linux-64", "noarch"], channels_url=self.base_url + "/conda")
+        hit, exact = index.best_search_result(CondaTarget("bwa", "0.7.15"))
+        assert_equal((hit["channel"], exact), ("bioconda", True))
+        assert_equal(index.best_search_result(CondaTarget("samtools")), (None, None))
+        assert_equal(sorted(self.server.requested), [
+            "/conda/bioconda/linux-64/repodata.json.bz2",
+            "/conda/bioconda/noarch/repodata.json.bz2",
+        ])
+
+    def test_conda_index_failure_remembered(self):
+        index = CondaPackageIndex(["broken"], subdirs=["linux-64"], channels_url=self.base_url + "/conda", threads=1)
+        for _ in range(2):
+            try:
+                index.best_search_result(CondaTarget("bwa"))
+            except requests.exceptions.HTTPError:
+                pass
+            else:
+                raise AssertionError("Expected loading the index to fail.")
+        # The failure is remembered rather than downloading again per search.
+        assert_equal(self.server.requested, ["/conda/broken/linux-64/repodata.json.bz2"])
+        assert index.load_error is not None
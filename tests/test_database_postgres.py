@@ -0,0 +1,97 @@
+"""Unit tests for :mod:`planemo.database.postgres` against a fake connection."""
+import re
+
+from planemo.database.postgres import (
+    LocalPostgresDatabaseSource,
+    template_identifier,
+)
+
+from .test_utils import assert_equal
+
+
+def test_create_database_sql():
+    source, connection = _source()
+    connection.databases.add("plnmotmpl_1")
+    source.create_database('odd"name', template="plnmotmpl_1")
+    assert_equal(connection.statements[-1], 'CREATE DATABASE "odd""name" TEMPLATE "plnmotmpl_1";')
+
+
+def test_ensure_template_migrates_once():
+    source, connection = _source()
+    migrated = []
+    assert_equal(source.ensure_template(135, migrated.append), "plnmotmpl_135")
+    assert_equal(source.ensure_template(135, migrated.append), "plnmotmpl_135")
+    assert_equal(len(migrated), 1)
+    # The template is built under another name and only renamed once migrated.
+    assert not migrated[0].endswith("/plnmotmpl_135")
+    assert_equal(connection.databases, set(["postgres", "plnmotmpl_135"]))
+
+
+def test_failed_migration_drops_database():
+    source, connection = _source()
+
+    def migrate(url):
+        raise Exception("migration failed")
+
+    try:
+        source.ensure_template(135, migrate)
+    except Exception:
+        pass
+    else:
+        raise AssertionError("Expected migration failure.")
+    assert_equal(connection.databases, set(["postgres"]))
+
+
+def test_pooled_databases_taken_first():
+    source, connection = _source()
+    source.ensure_template(135, lambda url: None)
+    source.fill_pool(135, 2)
+    assert_equal(len(source.pool_databases(135)), 2)
+    source.fill_pool(135, 2)
+    assert_equal(len(source.pool_databases(135)), 2)
+
+    source.create_database_from_template("plnmotest_a", 135)
+    source.create_database_from_template("plnmotest_b", 135)
+    assert_equal(len(source.pool_databases(135)), 0)
+    assert_equal(connection.copies, 2)
+
+    # An empty pool falls back to copying the template.
+    source.create_database_from_template("plnmotest_c", 135)
+    assert_equal(connection.copies, 3)
+    assert set(["plnmotest_a", "plnmotest_b", "plnmotest_c"]).issubset(connection.databases)
+    assert_equal(connection.templates_used, set([template_identifier(135)]))
+
+
+def _source():
+    source = LocalPostgresDatabaseSource(postgres_database_user="postgres")
+    connection = _FakeConnection()
+    source._connection = connection
+    return source, connection
+
+
+class _FakeConnection(object):
+
+    def __init__(self):
+        self.databases = set(["postgres"])
+        self.statements = []
+        self.copies = 0
+        self.templates_used = set()
+
+    def execute(self, sql):
+        self.statements.append(sql)
+        names = [n.replace('""', '"') for n in re.findall(r'"((?:[^"]|"")*)"', sql)]
+        if sql.startswith("SELECT datname"):
+            return [(d,) for d in sorted(self.databases)]
+        elif sql.startswith("CREATE DATABASE"):
+            assert names[0] not in self.databases
+            self.databases.add(names[0])
+            if len(names) > 1:
+                assert names[1] in self.databases
+                self.copies += 1
+                self.templates_used.add(names[1])
+        elif sql.startswith("DROP DATABASE"):
+            self.databases.remove(names[0])
+        elif sql.startswith("ALTER DATABASE"):
+            self.databases.remove(names[0])
+            self.databases.add(names[1])
+        return []
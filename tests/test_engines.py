@@ -1,10 +1,24 @@
 """Unit tests for engines and runnables."""
 
+import contextlib
 import os
+import shutil
+import tempfile
+import threading
+import time
 
+from planemo import cwl
 from planemo.engine import engine_context
+from planemo.engine import galaxy as galaxy_engine
+from planemo.engine.cwltool import CwlToolEngine
+from planemo.engine.interface import BaseEngine
+from planemo.runnable import cases
+from planemo.runnable import ErrorRunResponse
 from planemo.runnable import for_path
 from planemo.runnable import get_outputs
+from planemo.runnable import RunnableType
+from planemo.test.cache import TestResultCache
+from planemo.test.results import is_json_lines
 
 from .test_utils import CWL_DRAFT3_DIR, test_context, TEST_DATA_DIR
 
@@ -14,6 +28,7 @@ A_CWL_WORKFLOW = os.path.join(CWL_DRAFT3_DIR, "count-lines1-wf.cwl")
 A_GALAXY_TOOL = os.path.join(TEST_DATA_DIR, "tools", "ok_select_param.xml")
 A_GALAXY_GA_WORKFLOW = os.path.join(TEST_DATA_DIR, "test_workflow_1.ga")
 A_GALAXY_YAML_WORKFLOW = os.path.join(TEST_DATA_DIR, "wf1.gxwf.yml")
+A_TESTED_CWL_TOOL = os.path.join(TEST_DATA_DIR, "output_tests_tool.cwl")
 
 CAN_HANDLE = {
     'galaxy': {
@@ -46,3 +61,151 @@ def test_outputs():
     assert len(outputs) == 1
     output_id = outputs[0].get_id()
     assert output_id == "output_file"
+
+
+def test_galaxy_engine_serves_once_per_test_session():
+    served = []
+
+    class FakeConfig(object):
+        user_gi = None
+
+        def __init__(self, runnables):
+            self.runnables = runnables
+
+    class CountingGalaxyEngine(galaxy_engine.GalaxyEngine):
+
+        @contextlib.contextmanager
+        def _serve(self, runnables):
+            served.append(runnables)
+            yield FakeConfig(runnables)
+
+    executed_configs = []
+
+    def fake_execute(config, runnable, job_path, **kwds):
+        executed_configs.append(config)
+        return ErrorRunResponse("not really executed")
+
+    original_execute = galaxy_engine.execute
+    galaxy_engine.execute = fake_execute
+    try:
+        runnable = for_path(A_TESTED_CWL_TOOL)
+        test_cases = cases(runnable)
+        assert len(test_cases) > 1
+        engine = CountingGalaxyEngine(test_context())
+        test_results = engine._collect_test_results(test_cases)
+    finally:
+        galaxy_engine.execute = original_execute
+
+    assert len(served) == 1
+    assert served[0] == [runnable]
+    assert len(test_results) == len(test_cases)
+    assert len(set(map(id, executed_configs))) == 1
+
+
+def test_parallel_test_results_are_ordered():
+    runnable = for_path(A_TESTED_CWL_TOOL)
+    test_cases = cases(runnable)
+    lock = threading.Lock()
+    started = []
+
+    class SleepyEngine(BaseEngine):
+
+        def _run(self, runnable, job_path):
+            with lock:
+                started.append(job_path)
+                remaining = len(test_cases) - len(started)
+            # Cases started first finish last.
+            time.sleep(.02 * remaining)
+            return ErrorRunResponse("not really executed")
+
+    engine = SleepyEngine(test_context(), parallel=4)
+    test_results = engine._collect_test_results(test_cases)
+    assert len(started) == len(test_cases)
+    assert [t for (t, _) in test_results] == test_cases
+
+
+def _run_cwltool_in_worker(ctx, path, job_path, **kwds):
+    return ErrorRunResponse("%s %s %s" % (os.getpid(), ctx.workspace, kwds["parallel"]))
+
+
+def test_cwltool_parallel_test_cases_run_in_processes():
+    runnable = for_path(A_TESTED_CWL_TOOL)
+    test_cases = cases(runnable)[:2]
+    assert len(test_cases) == 2
+    ctx = test_context()
+    original_run_cwltool = cwl.run_cwltool
+    # Worker processes are forked and so see the replaced function.
+    cwl.run_cwltool = _run_cwltool_in_worker
+    try:
+        engine = CwlToolEngine(ctx, parallel=2)
+        test_results = engine._collect_test_results(test_cases)
+    finally:
+        cwl.run_cwltool = original_run_cwltool
+    assert [t.job_path for (t, _) in test_results] == [t.job_path for t in test_cases]
+    for _, run_response in test_results:
+        pid, workspace, parallel = run_response.error_message.split(" ")
+        assert int(pid) != os.getpid()
+        assert workspace == ctx.planemo_directory
+        assert parallel == "2"
+
+
+def test_test_results_streamed_to_json_lines():
+    runnable = for_path(A_TESTED_CWL_TOOL)
+    test_cases = cases(runnable)
+    temp_directory = tempfile.mkdtemp()
+    json_path = os.path.join(temp_directory, "tool_test_output.jsonl")
+    written = []
+
+    class ErrorEngine(BaseEngine):
+
+        handled_runnable_types = [runnable.type]
+
+        def _run(self, runnable, job_path):
+            with open(json_path, "r") as f:
+                written.append(f.read().count("\n"))
+            return ErrorRunResponse("not really executed")
+
+    try:
+        engine = ErrorEngine(test_context(), test_output_json=json_path)
+        structured_results = engine.test([runnable])
+        assert is_json_lines(json_path)
+        # Each result is written before the next test case runs.
+        assert written == list(range(1, len(test_cases) + 1))
+        assert structured_results.num_tests == len(test_cases)
+        assert len(list(structured_results.structured_data_tests)) == len(test_cases)
+    finally:
+        shutil.rmtree(temp_directory)
+
+
+def test_cached_test_results_streamed_in_runnable_order():
+    temp_directory = tempfile.mkdtemp()
+    for name in ["output_tests_tool.cwl", "output_tests_tool_test.yml", "cat_tool_job.json", "hello.txt"]:
+        shutil.copy(os.path.join(TEST_DATA_DIR, name), temp_directory)
+    shutil.copy(os.path.join(TEST_DATA_DIR, "output_tests_tool.cwl"), os.path.join(temp_directory, "cached_tool.cwl"))
+    shutil.copy(os.path.join(TEST_DATA_DIR, "output_tests_tool_test.yml"), os.path.join(temp_directory, "cached_tool_test.yml"))
+    with open(os.path.join(temp_directory, "cached_tool.cwl"), "a") as f:
+        f.write("# A distinct tool.\n")
+    json_path = os.path.join(temp_directory, "tool_test_output.jsonl")
+    ctx = test_context()
+    ctx.planemo_directory = os.path.join(temp_directory, "workspace")
+
+    class CachingEngine(BaseEngine):
+
+        handled_runnable_types = [RunnableType.cwl_tool]
+
+        def _run(self, runnable, job_path):
+            return ErrorRunResponse("not really executed")
+
+    try:
+        tested = for_path(os.path.join(temp_directory, "output_tests_tool.cwl"))
+        cached = for_path(os.path.join(temp_directory, "cached_tool.cwl"))
+        cache = TestResultCache(os.path.join(ctx.workspace, "test_cache"), "CachingEngine")
+        assert cache.put(cached, [{"id": "cached_tool_0", "has_data": True, "data": {"status": "success"}}])
+
+        engine = CachingEngine(ctx, test_output_json=json_path, test_cache=True)
+        structured_results = engine.test([tested, cached])
+        test_ids = [t["id"] for t in structured_results.structured_data_tests]
+        assert len(test_ids) == len(cases(tested)) + 1
+        assert test_ids[-1] == "cached_tool_0"
+    finally:
+        shutil.rmtree(temp_directory)
@@ -2,7 +2,10 @@
 import contextlib
 import os
 
-from planemo.galaxy.config import galaxy_config
+from planemo.galaxy.config import (
+    galaxy_config,
+    galaxy_version_id,
+)
 
 from .test_utils import TempDirectoryContext, test_context
 
@@ -30,6 +33,35 @@ def test_override_files_path():
             _assert_property_is(config, "file_path", tdc.temp_directory)
 
 
+def test_library_path_paste_only_with_link_inputs():
+    """Test server path imports are only allowed with --link_inputs."""
+    with _test_galaxy_config() as config:
+        assert "GALAXY_CONFIG_OVERRIDE_ALLOW_LIBRARY_PATH_PASTE" not in config.env
+    with _test_galaxy_config(link_inputs=True) as config:
+        _assert_property_is(config, "allow_library_path_paste", "True")
+
+
+def test_galaxy_version_id():
+    """Test the Galaxy version ID changes with the Galaxy version."""
+    ctx = test_context()
+    with TempDirectoryContext() as tdc:
+        galaxy_root = tdc.temp_directory
+        assert galaxy_version_id(ctx, galaxy_root=galaxy_root) is None
+
+        version_directory = os.path.join(galaxy_root, "lib", "galaxy")
+        os.makedirs(version_directory)
+        version_path = os.path.join(version_directory, "version.py")
+        with open(version_path, "w") as f:
+            f.write('VERSION_MAJOR = "17.09"\n')
+        version_id = galaxy_version_id(ctx, galaxy_root=galaxy_root)
+        assert version_id is not None
+        assert version_id == galaxy_version_id(ctx, galaxy_root=galaxy_root)
+
+        with open(version_path, "w") as f:
+            f.write('VERSION_MAJOR = "18.01"\n')
+        assert version_id != galaxy_version_id(ctx, galaxy_root=galaxy_root)
+
+
 def _assert_property_is(config, prop, value):
     env_var = "GALAXY_CONFIG_OVERRIDE_%s" % prop.upper()
     assert config.env[env_var] == value
@@ -0,0 +1,110 @@
+"""Unit tests for the warm Galaxy server pool in :mod:`planemo.galaxy.pool`."""
+import json
+import os
+import threading
+
+from six.moves import BaseHTTPServer
+
+from planemo.galaxy import pool
+
+from .test_utils import (
+    assert_equal,
+    TempDirectoryTestCase,
+    test_context,
+)
+
+
+class GalaxyPoolTestCase(TempDirectoryTestCase):
+
+    def setUp(self):  # noqa
+        super(GalaxyPoolTestCase, self).setUp()
+        self.ctx = test_context()
+        self.ctx.planemo_directory = self.temp_directory
+
+    def test_pool_key(self):
+        key = pool.pool_key(galaxy_root="/galaxy", conda_auto_install=True)
+        assert_equal(key, pool.pool_key(conda_auto_install=True, galaxy_root="/galaxy"))
+        # Options not affecting the running server don't change the key.
+        assert_equal(key, pool.pool_key(galaxy_root="/galaxy", conda_auto_install=True, test_output="x.html"))
+        assert key != pool.pool_key(galaxy_root="/galaxy", conda_auto_install=False)
+        assert key != pool.pool_key(galaxy_root="/galaxy2", conda_auto_install=True)
+
+    def test_lease(self):
+        server_directory = os.path.join(self.temp_directory, "server")
+        os.makedirs(server_directory)
+        lease_path = pool._acquire_lease(server_directory)
+        assert lease_path is not None
+        assert_equal(pool._lease_holder(server_directory), os.getpid())
+        assert pool._acquire_lease(server_directory) is None
+        pool._release_lease(lease_path)
+        assert pool._lease_holder(server_directory) is None
+        assert pool._acquire_lease(server_directory) is not None
+
+    def test_stale_lease_broken(self):
+        server_directory = os.path.join(self.temp_directory, "server")
+        os.makedirs(server_directory)
+        with open(os.path.join(server_directory, pool.LEASE_FILE_NAME), "w") as f:
+            f.write("not a pid")
+        assert pool._lease_holder(server_directory) is None
+        assert pool._acquire_lease(server_directory) is not None
+
+    def test_load_server_restores_env(self):
+        server_directory = os.path.join(self.temp_directory, "server")
+        os.makedirs(server_directory)
+        pid_file = os.path.join(server_directory, "galaxy.pid")
+        with open(pid_file, "w") as f:
+            f.write(str(os.getpid()))
+        http_server = BaseHTTPServer.HTTPServer(("localhost", 0), _OkHandler)
+        thread = threading.Thread(target=http_server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            server = dict(
+                port=http_server.server_address[1],
+                server_name="planemo1",
+                master_api_key="pool_key",
+                config_directory=server_directory,
+                galaxy_root="/galaxy",
+                pid_file=pid_file,
+                env={"GALAXY_TEST_TOOL_CONF": "tool_conf.xml"},
+            )
+            with open(os.path.join(server_directory, pool.POOL_SERVER_JSON_NAME), "w") as f:
+                json.dump(server, f)
+            config = pool._load_server(server_directory, [])
+        finally:
+            http_server.shutdown()
+            http_server.server_close()
+        assert_equal(config.env, {"GALAXY_TEST_TOOL_CONF": "tool_conf.xml"})
+        assert_equal(config.master_api_key, "pool_key")
+
+    def test_list_and_clear(self):
+        pool_directory = pool._pool_directory(self.ctx, dict(galaxy_root="/galaxy"))
+        server_directory = os.path.join(pool_directory, "server_1")
+        os.makedirs(server_directory)
+        server = dict(port=9999, pid_file=os.path.join(server_directory, "galaxy.pid"))
+        with open(os.path.join(server_directory, pool.POOL_SERVER_JSON_NAME), "w") as f:
+            json.dump(server, f)
+
+        servers = pool.list_pooled_servers(self.ctx)
+        assert_equal(len(servers), 1)
+        assert_equal(servers[0]["port"], 9999)
+        assert not servers[0]["leased"]
+
+        lease_path = pool._acquire_lease(server_directory)
+        assert_equal(pool.clear_pool(self.ctx), 0)
+        assert pool.list_pooled_servers(self.ctx)[0]["leased"]
+        pool._release_lease(lease_path)
+
+        assert_equal(pool.clear_pool(self.ctx), 1)
+        assert_equal(pool.list_pooled_servers(self.ctx), [])
+        assert not os.path.exists(pool_directory)
+
+
+class _OkHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):  # noqa
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
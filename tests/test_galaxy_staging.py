@@ -0,0 +1,98 @@
+"""Unit tests for :mod:`planemo.galaxy.staging`."""
+import os
+import threading
+
+from planemo.galaxy.staging import DatasetStager
+
+from .test_utils import (
+    assert_equal,
+    TempDirectoryTestCase,
+)
+
+
+class _Tools(object):
+
+    def __init__(self, gi):
+        self.gi = gi
+
+    def upload_file(self, path, history_id):
+        with self.gi.lock:
+            self.gi.uploads.append(path)
+            dataset_id = "d%d" % len(self.gi.states)
+            self.gi.states[dataset_id] = "ok"
+        return {"outputs": [dict(id=dataset_id, history_id=history_id)]}
+
+
+class _Datasets(object):
+
+    def __init__(self, gi):
+        self.gi = gi
+
+    def show_dataset(self, dataset_id):
+        return dict(id=dataset_id, state=self.gi.states[dataset_id])
+
+
+class _Histories(object):
+
+    def __init__(self, gi):
+        self.gi = gi
+
+    def copy_dataset(self, history_id, dataset_id):
+        with self.gi.lock:
+            self.gi.copies.append((history_id, dataset_id))
+            return dict(id="copy_of_%s" % dataset_id, history_id=history_id)
+
+
+class _GalaxyInstance(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.uploads = []
+        self.copies = []
+        self.states = {}
+        self.tools = _Tools(self)
+        self.datasets = _Datasets(self)
+        self.histories = _Histories(self)
+
+
+class DatasetStagerTestCase(TempDirectoryTestCase):
+
+    def test_stage_deduplicates(self):
+        paths = [self._write("a/1.txt", "a"), self._write("b/1.txt", "a"), self._write("3.txt", "b")]
+        gi = _GalaxyInstance()
+        stager = DatasetStager()
+
+        staged = stager.stage(gi, "h1", paths + paths)
+        assert_equal(sorted(staged.keys()), sorted(paths))
+        # Identical files are only uploaded once.
+        assert_equal(len(gi.uploads), 2)
+
+        staged = stager.stage(gi, "h2", paths)
+        assert_equal(len(gi.uploads), 2)
+        assert_equal(set(d["history_id"] for d in staged.values()), set(["h2"]))
+
+    def test_stage_errored_not_reused(self):
+        path = self._write("1.txt", "a")
+        gi = _GalaxyInstance()
+        stager = DatasetStager()
+        dataset = stager.stage(gi, "h1", [path])[path]
+        gi.states[dataset["id"]] = "error"
+        stager.stage(gi, "h2", [path])
+        assert_equal(len(gi.uploads), 2)
+        assert_equal(gi.copies, [])
+
+    def test_stage_keeps_names(self):
+        paths = [self._write("1.txt", "a"), self._write("2.txt", "a")]
+        gi = _GalaxyInstance()
+        staged = DatasetStager().stage(gi, "h1", paths)
+        # Datasets are named after their files, so each name is uploaded.
+        assert_equal(sorted(gi.uploads), sorted(paths))
+        assert staged[paths[0]]["id"] != staged[paths[1]]["id"]
+
+    def _write(self, name, contents):
+        path = os.path.join(self.temp_directory, name)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
@@ -1,13 +1,19 @@
 """Tests for the `planeo.galaxy.test` module."""
 
+import contextlib
+import json
 import os
 import shutil
 
 from planemo.galaxy.test import structures
 from planemo.galaxy.test.actions import passed
 from planemo.galaxy.test.actions import run_in_config
+from planemo.galaxy.test.actions import run_in_instances
+from planemo.galaxy.test.actions import run_in_pooled_galaxy
+from planemo.runnable import for_path
 
 from .test_utils import (
+    TempDirectoryContext,
     TempDirectoryTestCase,
     test_context,
     TEST_DATA_DIR,
@@ -113,6 +119,57 @@ class RunInConfigTestCase(TempDirectoryTestCase):
         with self.assertRaises(Exception):
             self._do_run(mock_galaxy_run)
 
+    def test_all_tests_cached(self):
+        """Test reports are written when every test result is cached."""
+        version_directory = os.path.join(self.config.galaxy_root, "lib", "galaxy")
+        os.makedirs(version_directory)
+        with open(os.path.join(version_directory, "version.py"), "w") as f:
+            f.write('VERSION_MAJOR = "18.01"\n')
+        tool_path = os.path.join(self.temp_directory, "cat.xml")
+        with open(tool_path, "w") as f:
+            f.write('<tool id="cat" name="cat" version="1.0"><command>true</command></tool>')
+        self.config.runnables = [for_path(tool_path)]
+        self.kwds["test_cache"] = True
+
+        def mock_galaxy_run(ctx_, command, env, action):
+            self._copy_good_artifacts(["xml", "html", "json"])
+            return 0
+
+        assert self._do_run(mock_galaxy_run) == 0
+        os.remove(self.kwds["test_output_xunit"])
+
+        def unexpected_galaxy_run(ctx_, command, env, action):
+            raise AssertionError("Cached tests should not run.")
+
+        assert self._do_run(unexpected_galaxy_run) == 0
+        cases = list(structures.iter_xunit_cases(self.kwds["test_output_xunit"]))
+        assert [structures.case_id(c).id for c in cases] == ["functional.test_toolbox.TestForTool_cat.test_tool_000000"]
+        assert passed(cases[0])
+
+    def test_pooled_galaxy(self):
+        """Test tool tests target a leased Galaxy with GALAXY_TEST_EXTERNAL."""
+        self.config.port = 9876
+        self.config.master_api_key = "pool_key"
+        self.config.test_data_dir = os.path.join(self.temp_directory, "test-data")
+        leases = []
+
+        @contextlib.contextmanager
+        def mock_lease(ctx, runnables, **kwds):
+            leases.append(runnables)
+            yield self.config
+
+        def mock_galaxy_run(ctx_, command, env, action):
+            assert env["GALAXY_TEST_EXTERNAL"] == "http://localhost:9876"
+            assert env["GALAXY_CONFIG_MASTER_API_KEY"] == "pool_key"
+            assert env["GALAXY_TEST_TOOL_CONF"] == os.path.join(self.temp_directory, "tool_conf.xml")
+            assert env["GALAXY_TEST_FILE_DIR"] == self.config.test_data_dir
+            self._copy_good_artifacts(["xml", "html", "json"])
+            return 0
+
+        exit_code = run_in_pooled_galaxy(self.ctx, [], run=mock_galaxy_run, lease=mock_lease, **self.kwds)
+        assert exit_code == 0
+        assert leases == [[]]
+
     def _copy_artifacts(self, suffix, extensions):
         for extension in extensions:
             source = os.path.join(TEST_DATA_DIR, "tt_%s.%s" % (suffix, extension))
@@ -129,6 +186,106 @@ class RunInConfigTestCase(TempDirectoryTestCase):
         return run_in_config(self.ctx, self.config, run=mock_run_function, **self.kwds)
 
 
+class RunInInstancesTestCase(TempDirectoryTestCase):
+    """Test cases for ``run_in_instances``."""
+
+    def _write_tools(self):
+        tool_paths = []
+        for tool_id in ["a", "b", "c"]:
+            tool_path = os.path.join(self.temp_directory, "%s.xml" % tool_id)
+            with open(tool_path, "w") as f:
+                f.write('<tool id="%s" name="%s" version="1.0"><command>true</command></tool>' % (tool_id, tool_id))
+            tool_paths.append(tool_path)
+        return tool_paths
+
+    def test_results_merged(self):
+        td = self.temp_directory
+        tool_paths = self._write_tools()
+        kwds = {
+            "instances": 2,
+            "test_output": os.path.join(td, "tests.html"),
+            "test_output_json": os.path.join(td, "tests.json"),
+            "test_output_xunit": os.path.join(td, "tests.xml"),
+            "summary": "none",
+        }
+        configs = []
+
+        @contextlib.contextmanager
+        def config_factory(ctx, runnables, **instance_kwds):
+            config = _MockConfig(os.path.join(td, "config%d" % len(configs)))
+            os.makedirs(config.config_directory)
+            config.runnables = runnables
+            config.port = instance_kwds["port"]
+            configs.append(config)
+            yield config
+
+        commands = []
+
+        def mock_galaxy_run(ctx_, command, env, action):
+            commands.append(command)
+            if action == "Preparing Galaxy":
+                return 0
+            config = [c for c in configs if c.env is env][0]
+            assert env["GALAXY_TEST_PORT"] == str(config.port)
+            shutil.copy(os.path.join(TEST_DATA_DIR, "tt_success.xml"), os.path.join(config.config_directory, "xunit.xml"))
+            shutil.copy(os.path.join(TEST_DATA_DIR, "tt_success.json"), os.path.join(config.config_directory, "structured_data.json"))
+            return 0
+
+        runnables = [for_path(p) for p in tool_paths]
+        exit_code = run_in_instances(test_context(), runnables, run=mock_galaxy_run, config_factory=config_factory, **kwds)
+        assert exit_code == 0
+        assert len(configs) == 2
+        assert sorted(len(c.runnables) for c in configs) == [1, 2]
+        assert configs[0].port != configs[1].port
+        # Galaxy is prepared once, instances then skip common startup.
+        assert len(commands) == 3
+        assert "common_startup.sh" in commands[0]
+        assert all("run_tests.sh $COMMON_STARTUP_ARGS --skip-common-startup" in c for c in commands[1:])
+
+        with open(os.path.join(TEST_DATA_DIR, "tt_success.json"), "r") as f:
+            instance_test_count = len(json.load(f)["tests"])
+        with open(kwds["test_output_json"], "r") as f:
+            merged = json.load(f)
+        assert len(merged["tests"]) == 2 * instance_test_count
+        assert merged["summary"]["num_tests"] == 2 * instance_test_count
+        merged_cases = list(structures.iter_xunit_cases(kwds["test_output_xunit"]))
+        assert len(merged_cases) == 2 * len(list(structures.iter_xunit_cases(os.path.join(TEST_DATA_DIR, "tt_success.xml"))))
+        assert os.path.exists(kwds["test_output"])
+
+    def test_exceptions_reach_configs(self):
+        td = self.temp_directory
+        kwds = {
+            "instances": 2,
+            "test_output": os.path.join(td, "tests.html"),
+            "summary": "none",
+        }
+        configs = []
+        exceptions = []
+
+        @contextlib.contextmanager
+        def config_factory(ctx, runnables, **instance_kwds):
+            config = _MockConfig(os.path.join(td, "config%d" % len(configs)))
+            configs.append(config)
+            try:
+                yield config
+            except Exception as e:
+                exceptions.append(e)
+                raise
+
+        def mock_galaxy_run(ctx_, command, env, action):
+            raise Exception("Galaxy failed")
+
+        runnables = [for_path(p) for p in self._write_tools()]
+        try:
+            run_in_instances(test_context(), runnables, run=mock_galaxy_run, config_factory=config_factory, **kwds)
+        except Exception as e:
+            assert str(e) == "Galaxy failed"
+        else:
+            raise AssertionError("Expected exception.")
+        assert len(configs) == 2
+        assert [str(e) for e in exceptions] == ["Galaxy failed", "Galaxy failed"]
+
+
 def get_test_id_new():
     """Test ID parsing on newer nose dependency."""
     _get_test_id(nose_1_3_report)
@@ -150,6 +307,33 @@ def _get_test_id(path):
     assert test_id.num == 0
 
 
+def test_iter_xunit_cases():
+    """Test streaming xUnit parsing matches the parsed tree."""
+    root = structures.parse_xunit_report(xunit_report_with_failure).getroot()
+    expected_ids = [structures.case_id(el).id for el in structures.find_cases(root)]
+    ids = [structures.case_id(el).id for el in structures.iter_xunit_cases(xunit_report_with_failure)]
+    assert ids == expected_ids
+    assert passed(next(structures.iter_xunit_cases(xunit_report_with_failure)))
+
+
+def test_write_xunit_report():
+    """Test xUnit reports written from structured data round trip test ids and problems."""
+    root = structures.parse_xunit_report(xunit_report_with_failure).getroot()
+    ids = [structures.case_id(el).id for el in structures.find_cases(root)][:2]
+    tests = [
+        {"id": ids[0], "data": {"status": "success", "time_seconds": 1.5}},
+        {"id": ids[1], "data": {"status": "failure", "problem_type": "AssertionError", "problem_log": "Failed"}},
+    ]
+    with TempDirectoryContext() as tdc:
+        path = os.path.join(tdc.temp_directory, "xunit.xml")
+        structures.write_xunit_report(tests, path)
+        cases = list(structures.iter_xunit_cases(path))
+        assert [structures.case_id(el).id for el in cases] == ids
+        assert passed(cases[0])
+        assert not passed(cases[1])
+        assert structures.parse_xunit_report(path).getroot().attrib["failures"] == "1"
+
+
 def test_passed():
     """Test :func:`passed`."""
     xml_tree = structures.parse_xunit_report(xunit_report_with_failure)
@@ -167,3 +351,4 @@ class _MockConfig(object):
         self.config_directory = temp_directory
         self.env = {"test_key": "test_value"}
         self.galaxy_root = os.path.join(self.config_directory, "galaxy-dev")
+        self.test_data_dir = None
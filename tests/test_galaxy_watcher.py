@@ -0,0 +1,130 @@
+"""Unit tests for :mod:`planemo.galaxy.watcher`."""
+import threading
+
+from planemo.galaxy.watcher import GalaxyStateWatcher
+
+from .test_utils import assert_equal
+
+
+class _Response(object):
+
+    def __init__(self, json):
+        self._json = json
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._json
+
+
+class _Jobs(object):
+
+    def __init__(self, states):
+        self.states = states
+        self.requests = []
+
+    def index(self, params):
+        self.requests.append("index")
+        states = {}
+        for job_id, job_states in self.states.items():
+            states[job_id] = job_states[0]
+            if len(job_states) > 1:
+                job_states.pop(0)
+        return [
+            dict(id=job_id, state=state) for (job_id, state) in states.items()
+            if state in params["state"]
+        ]
+
+    def show_job(self, job_id, full_details=False):
+        assert not full_details
+        self.requests.append(job_id)
+        return dict(id=job_id, state=self.states[job_id][-1])
+
+
+class _Histories(object):
+
+    def __init__(self, states):
+        self.states = states
+        self.release = threading.Event()
+        self.release.set()
+
+    def show(self, history_id, params):
+        assert_equal(params, {"keys": "state"})
+        self.release.wait()
+        return dict(state=self.states[history_id].pop(0))
+
+
+class _GalaxyInstance(object):
+    url = "http://localhost:8080/api"
+
+    def __init__(self, job_states=None, history_states=None):
+        self.jobs = _Jobs(job_states or {})
+        self.histories = _Histories(history_states or {})
+
+    def make_get_request(self, url, params=None):
+        path = url[len(self.url + "/"):]
+        if path == "jobs":
+            return _Response(self.jobs.index(params))
+        # Only watched histories should be requested - not the history index.
+        assert path.startswith("histories/"), path
+        return _Response(self.histories.show(path[len("histories/"):], params))
+
+
+def test_wait_for_job():
+    gi = _GalaxyInstance(job_states={"1": ["ok"]})
+    watcher = GalaxyStateWatcher(gi, polling_delay=0.01, max_polling_delay=0.02)
+    assert_equal(watcher.wait_for_job("1"), "ok")
+    assert_equal(gi.jobs.requests, ["1"])
+
+
+def test_wait_for_jobs_batched():
+    job_states = dict((str(i), ["queued", "running", "ok"]) for i in range(5))
+    gi = _GalaxyInstance(job_states=job_states)
+    watcher = GalaxyStateWatcher(gi, polling_delay=0.01, max_polling_delay=0.02)
+    results = {}
+
+    def wait(job_id):
+        results[job_id] = watcher.wait_for_job(job_id)
+
+    threads = [threading.Thread(target=wait, args=(job_id,)) for job_id in job_states]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert_equal(results, dict((job_id, "ok") for job_id in job_states))
+    # Far fewer requests than one per job per polling tick.
+    assert gi.jobs.requests.count("index") < 10, gi.jobs.requests
+
+
+def test_history_state_not_reused():
+    gi = _GalaxyInstance(history_states={"h": ["ok", "queued", "error"]})
+    watcher = GalaxyStateWatcher(gi, polling_delay=0.01, max_polling_delay=0.02)
+    assert_equal(watcher.wait_for_history("h"), "ok")
+    assert_equal(watcher.wait_for_history("h"), "error")
+
+
+def test_timeout():
+    gi = _GalaxyInstance(history_states={"h": ["queued"] * 100})
+    watcher = GalaxyStateWatcher(gi, polling_delay=0.01, max_polling_delay=0.02)
+    try:
+        watcher.wait_for_history("h", timeout=0.05)
+    except Exception as e:
+        assert "Timed out" in str(e)
+    else:
+        raise AssertionError("Expected wait to time out.")
+
+
+def test_fetch_does_not_block_other_waits():
+    gi = _GalaxyInstance(job_states={"1": ["ok"]}, history_states={"h": ["ok"]})
+    gi.histories.release.clear()
+    watcher = GalaxyStateWatcher(gi, polling_delay=0.01, max_polling_delay=0.02)
+    history_thread = threading.Thread(target=watcher.wait_for_history, args=("h",))
+    history_thread.start()
+    try:
+        # The history request is stuck, job states are still fetched.
+        assert_equal(watcher.wait_for_job("1", timeout=1), "ok")
+    finally:
+        gi.histories.release.set()
+        history_thread.join()
@@ -1,5 +1,6 @@
 """Test utilities from :module:`planemo.io`."""
 import tempfile
+import threading
 
 from .test_utils import (
     assert_equal,
@@ -29,6 +30,32 @@ def test_io_capture():
     assert capture is None
 
 
+def test_thread_routed_io_capture():
+    """Test :class:`planemo.io.Capturing` inside :func:`planemo.io.thread_routed_io`."""
+    captures = {}
+
+    def run(message):
+        with io.Capturing() as capture:
+            io.info(message)
+        captures[message] = capture
+
+    with io.thread_routed_io():
+        with io.Capturing() as outer:
+            threads = [threading.Thread(target=run, args=("Thread %d" % i,)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            io.info("Main thread")
+
+    for i in range(4):
+        message = "Thread %d" % i
+        assert_equal(len(captures[message]), 1)
+        assert message in captures[message][0]["data"]
+    assert_equal(len(outer), 1)
+    assert "Main thread" in outer[0]["data"]
+
+
 def test_filter_paths():
     """Test :func:`planemo.io.filter_paths`."""
     test_cwd = "/a/b"
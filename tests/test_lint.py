@@ -1,6 +1,11 @@
 import glob
 import os
 
+from planemo.lint import (
+    LintRecord,
+    RecordingLintContext,
+)
+
 from .test_utils import (
     CliTestCase,
     PROJECT_TEMPLATES_DIR,
@@ -10,6 +15,28 @@ from .test_utils import (
 )
 
 
+def _lint_fake(target, lint_ctx):
+    print("Fetching %s" % target)
+    lint_ctx.warn("first line\nsecond line")
+    lint_ctx.info("Found %d inputs", 2)
+
+
+def test_recording_lint_context():
+    lint_ctx = RecordingLintContext("all")
+    lint_ctx.lint("lint_tsts_fake", _lint_fake, "target")
+    assert lint_ctx.records == [
+        LintRecord(None, None, [("INFO", "Fetching target")]),
+        LintRecord("tests_fake", "WARNING", [("WARNING", "first line\nsecond line"), ("INFO", "Found 2 inputs")]),
+    ], lint_ctx.records
+    assert lint_ctx.failed("warn")
+    assert not lint_ctx.failed("error")
+
+    lint_ctx = RecordingLintContext("error", skip_types=["tests_other"])
+    lint_ctx.lint("lint_fake", _lint_fake, "target")
+    lint_ctx.lint("lint_tsts_other", _lint_fake, "target")
+    assert lint_ctx.records == [LintRecord(None, None, [("INFO", "Fetching target")])], lint_ctx.records
+
+
 class LintTestCase(CliTestCase):
 
     def test_ok_tools(self):
@@ -43,6 +70,15 @@ class LintTestCase(CliTestCase):
             exit_code=0
         )
 
+    def test_lint_multiple_jobs(self):
+        names = ["fail_citation.xml", "fail_order.xml", "ok_conditional.xml"]
+        paths = list(map(lambda p: os.path.join(TEST_TOOLS_DIR, p), names))
+        self._check_exit_code(["lint", "--jobs", "2"] + paths, exit_code=1)
+        self._check_exit_code(
+            ["lint", "--jobs", "2", "--skip", "citations,xml_order"] + paths,
+            exit_code=0
+        )
+
     def test_skips(self):
         fail_citation = os.path.join(TEST_TOOLS_DIR, "fail_citation.xml")
         lint_cmd = ["lint", fail_citation]
@@ -0,0 +1,69 @@
+"""Unit tests for :mod:`planemo.mulled`."""
+import os
+
+from galaxy.tools.deps.mulled.mulled_build import InvolucroContext
+from galaxy.tools.deps.mulled.util import build_target
+
+from planemo import mulled
+
+from .test_utils import (
+    assert_equal,
+    TempDirectoryTestCase,
+)
+
+
+def test_mull_builds_deduplicated():
+    samtools = build_target("samtools", "1.3.1")
+    bwa = build_target("bwa", "0.7.13")
+    builds = mulled.mull_builds([[samtools], [samtools, bwa], [bwa, samtools], [samtools]])
+    assert_equal([b.image for b in builds], [
+        "samtools:1.3.1",
+        "mulled-v2-fe8faa35dbf6dc65a0f7f5d4ea12e31a79f73e40:4d0535c94ef45be8459f429561f0894c3fe0ebcf-0",
+    ])
+    assert_equal(builds[0].repository, "quay.io/biocontainers/samtools:1.3.1")
+    assert_equal(builds[0].log_name, "samtools_1.3.1.log")
+
+
+class LocalImageExistsTestCase(TempDirectoryTestCase):
+
+    def test_docker_options_used(self):
+        docker_bin = os.path.join(self.temp_directory, "docker")
+        args_path = os.path.join(self.temp_directory, "args")
+        with open(docker_bin, "w") as f:
+            f.write('#!/bin/sh\necho "$@" > %s\n[ "$5" = "quay.io/biocontainers/samtools:1.3.1" ]\n' % args_path)
+        os.chmod(docker_bin, 0o755)
+        docker_kwds = dict(docker_sudo=False, docker_sudo_cmd="sudo", docker_host="tcp://dockerhost:2375")
+
+        assert mulled.local_image_exists("quay.io/biocontainers/samtools:1.3.1", docker_cmd=docker_bin, **docker_kwds)
+        with open(args_path, "r") as f:
+            assert_equal(f.read().strip(), "-H tcp://dockerhost:2375 inspect --type=image quay.io/biocontainers/samtools:1.3.1")
+        assert not mulled.local_image_exists("quay.io/biocontainers/bwa:0.7.13", docker_cmd=docker_bin, **docker_kwds)
+
+        sudo_kwds = dict(docker_kwds, docker_sudo=True, docker_sudo_cmd=docker_bin, docker_host=None)
+        mulled.local_image_exists("quay.io/biocontainers/samtools:1.3.1", docker_cmd="docker", **sudo_kwds)
+        with open(args_path, "r") as f:
+            assert_equal(f.read().strip(), "docker inspect --type=image quay.io/biocontainers/samtools:1.3.1")
+
+
+class LoggedInvolucroContextTestCase(TempDirectoryTestCase):
+
+    def test_exec_command_in_working_directory(self):
+        involucro_bin = os.path.join(self.temp_directory, "involucro")
+        with open(involucro_bin, "w") as f:
+            f.write("#!/bin/sh\npwd\nls\n")
+        os.chmod(involucro_bin, 0o755)
+        working_directory = os.path.join(self.temp_directory, "work")
+        os.mkdir(working_directory)
+        log_path = os.path.join(self.temp_directory, "build.log")
+
+        with open(log_path, "w") as log:
+            context = mulled._LoggedInvolucroContext(
+                InvolucroContext(involucro_bin=involucro_bin), working_directory, log
+            )
+            assert_equal(context.exec_command(["build"]), 0)
+
+        with open(log_path, "r") as f:
+            lines = f.read().splitlines()
+        assert lines[0].startswith(involucro_bin)
+        assert_equal(lines[1:], [os.path.realpath(working_directory), "build"])
+        assert not os.path.exists(os.path.join(working_directory, "build"))
@@ -8,8 +8,26 @@ test_planemo
 Tests for `planemo` module.
 """
 
+import subprocess
+import sys
+
+from planemo.cli import build_command_manifest
+from planemo.commands.manifest import COMMANDS
+
 from .test_utils import CliTestCase
 
+# Modules too slow to import just to list planemo's commands.
+HEAVY_MODULES = ["bioblend", "cwltool", "docker", "galaxy", "jinja2", "lxml", "requests"]
+HELP_IMPORTS_SCRIPT = """
+import sys
+from planemo.cli import planemo
+try:
+    planemo(["--help"])
+except SystemExit:
+    pass
+sys.stderr.write(",".join(sorted(set(m.split(".")[0] for m in sys.modules))))
+"""
+
 
 class TestPlanemo(CliTestCase):
 
@@ -50,3 +68,19 @@ class TestPlanemo(CliTestCase):
 
     def test_planemo_help_command(self):
         self._check_exit_code(["--help"])
+
+    def test_command_manifest_up_to_date(self):
+        manifest = build_command_manifest()
+        assert manifest == dict((k, v) for (k, v) in COMMANDS.items() if k in manifest), \
+            "Command manifest out of date - run make command-manifest."
+
+    def test_help_does_not_import_commands(self):
+        process = subprocess.Popen(
+            [sys.executable, "-c", HELP_IMPORTS_SCRIPT],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        _, stderr = process.communicate()
+        imported = stderr.decode("utf-8").strip().splitlines()[-1].split(",")
+        heavy = [m for m in HEAVY_MODULES if m in imported]
+        assert not heavy, "planemo --help imported %s" % heavy
@@ -1,3 +1,5 @@
+import os
+
 from .test_utils import (
     CliTestCase,
     skip_unless_environ,
@@ -17,3 +19,19 @@ class ProfileCommandsTestCase(CliTestCase):
             self._check_exit_code(["profile_delete", "profile1234"])
             result = self._check_exit_code(["profile_list"])
             assert "profile1234" not in result.output, result.output
+
+    def test_profile_create_galaxy_root(self):
+        with self._isolate() as f:
+            galaxy_root = os.path.join(f, "galaxy")
+            os.makedirs(galaxy_root)
+            self._check_exit_code([
+                "profile_create", "profileroot1234",
+                "--database_type", "sqlite",
+                "--galaxy_root", galaxy_root,
+                "--skip_venv",
+            ])
+            try:
+                result = self._check_exit_code(["profile_list"])
+                assert "profileroot1234" in result.output
+            finally:
+                self._check_exit_code(["profile_delete", "profileroot1234"])
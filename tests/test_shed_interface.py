@@ -0,0 +1,156 @@
+"""Unit tests for :mod:`planemo.shed.interface`."""
+import requests
+from requests.packages.urllib3.exceptions import (
+    MaxRetryError,
+    NewConnectionError,
+)
+
+from planemo.shed import interface
+
+from .test_utils import assert_equal
+
+
+class _Response(object):
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _HttpError(Exception):
+
+    def __init__(self, status_code):
+        super(_HttpError, self).__init__("HTTP %d" % status_code)
+        self.status_code = status_code
+
+
+def test_retrying_request_transient():
+    outcomes = [requests.exceptions.ConnectionError(), _Response(503), _Response(200)]
+    payloads = []
+
+    def make_request(url, payload=None):
+        payloads.append(payload)
+        payload["x"] = "modified"
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    request = interface._retrying_request(make_request, 3, 0)
+    assert_equal(request("http://shed", payload={"x": "y"}).status_code, 200)
+    # Each attempt gets a fresh copy of the original payload.
+    assert_equal([p["x"] for p in payloads], ["modified"] * 3)
+    assert_equal(len(set(id(p) for p in payloads)), 3)
+
+
+def test_retrying_request_gives_up():
+    attempts = []
+
+    def make_request(url):
+        attempts.append(url)
+        raise _HttpError(502)
+
+    request = interface._retrying_request(make_request, 2, 0)
+    try:
+        request("http://shed")
+    except _HttpError:
+        pass
+    else:
+        raise AssertionError("Expected final error to be raised.")
+    assert_equal(len(attempts), 3)
+
+
+def test_retrying_request_permanent_error():
+    attempts = []
+
+    def make_request(url):
+        attempts.append(url)
+        raise _HttpError(400)
+
+    request = interface._retrying_request(make_request, 2, 0)
+    try:
+        request("http://shed")
+    except _HttpError:
+        pass
+    assert_equal(len(attempts), 1)
+    assert_equal(interface._retrying_request(lambda url: _Response(404), 2, 0)("http://shed").status_code, 404)
+
+
+def test_retrying_non_idempotent_request():
+    attempts = []
+    outcomes = [_connect_error(), _Response(503)]
+
+    def make_request(url):
+        attempts.append(url)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    request = interface._retrying_request(make_request, 3, 0, idempotent=False)
+    # Retried after failing to connect, but a 503 may come after the request
+    # was handled so it is returned as is.
+    assert_equal(request("http://shed").status_code, 503)
+    assert_equal(len(attempts), 2)
+
+    def make_failing_request(url):
+        attempts.append(url)
+        raise requests.exceptions.ConnectionError("Connection aborted.")
+
+    del attempts[:]
+    request = interface._retrying_request(make_failing_request, 3, 0, idempotent=False)
+    try:
+        request("http://shed")
+    except requests.exceptions.ConnectionError:
+        pass
+    else:
+        raise AssertionError("Expected connection error to be raised.")
+    assert_equal(len(attempts), 1)
+
+
+def _connect_error():
+    reason = NewConnectionError(None, "Failed to establish a new connection")
+    return requests.exceptions.ConnectionError(MaxRetryError(None, "http://shed", reason))
+
+
+class _RepositoriesResponse(object):
+
+    def __init__(self, repositories):
+        self._repositories = repositories
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._repositories
+
+
+class _ToolShedInstance(object):
+    url = "http://shed/api"
+
+    def __init__(self, repositories):
+        self.repositories = repositories
+        self.requests = []
+
+    def make_get_request(self, url, params=None):
+        self.requests.append(params)
+        owner = params["owner"]
+        return _RepositoriesResponse([r for r in self.repositories if r["owner"] == owner])
+
+
+def test_repository_index():
+    tsi = _ToolShedInstance([
+        dict(id="1", owner="iuc", name="cat"),
+        dict(id="2", owner="iuc", name="cat2"),
+        dict(id="3", owner="devteam", name="cat"),
+    ])
+    index = interface.RepositoryIndex(tsi)
+    assert_equal(index.find("iuc", "cat")["id"], "1")
+    assert_equal(index.find("iuc", "cat2")["id"], "2")
+    assert index.find("iuc", "cat3") is None
+    assert_equal(index.find("devteam", "cat")["id"], "3")
+    # One owner filtered request per owner.
+    assert_equal(tsi.requests, [{"owner": "iuc"}, {"owner": "devteam"}])
+
+    index.add(dict(id="4", owner="iuc", name="cat3"))
+    assert_equal(index.find("iuc", "cat3")["id"], "4")
+    assert_equal(len(tsi.requests), 2)
@@ -17,6 +17,27 @@ class ShedLintTestCase(CliTestCase):
         with self._isolate_repo("workflow_1"):
             self._check_exit_code(["shed_lint"])
 
+    def test_jobs(self):
+        with self._isolate_repo("multi_repos_nested"):
+            self._check_exit_code(["shed_lint", "--recursive", "--jobs", "2"])
+        with self._isolate_repo("bad_missing_include"):
+            self._check_exit_code(["shed_lint", "--jobs", "2"], exit_code=1)
+
+    def test_cache_realizations(self):
+        workspace = join(self._home, "workspace")
+        with self._isolate_repo("single_tool"):
+            command = ["--directory", workspace, "shed_lint", "--cache_realizations"]
+            self._check_exit_code(command)
+            result = self._check_exit_code(command)
+            assert "unchanged since last successful lint" in result.output
+            # URLs can break without the repository changing.
+            result = self._check_exit_code(command + ["--urls"])
+            assert "unchanged since last successful lint" not in result.output
+        with self._isolate_repo("bad_invalid_tool_xml"):
+            command = ["--directory", workspace, "shed_lint", "--cache_realizations", "--tools"]
+            self._check_exit_code(command, exit_code=1)
+            self._check_exit_code(command, exit_code=1)
+
     def test_invalid_repos(self):
         # And now
         with self._isolate_repo("bad_readme_rst"):
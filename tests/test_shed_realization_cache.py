@@ -0,0 +1,92 @@
+"""Unit tests for cached shed realizations in :mod:`planemo.shed.realization_cache`."""
+import os
+
+import yaml
+
+from planemo import shed
+from planemo.shed.realization_cache import RealizationCache
+
+from .test_utils import (
+    assert_equal,
+    TempDirectoryTestCase,
+    test_context,
+)
+
+
+class RealizationCacheTestCase(TempDirectoryTestCase):
+
+    def setUp(self):  # noqa
+        super(RealizationCacheTestCase, self).setUp()
+        self.ctx = test_context()
+        self.ctx.planemo_directory = os.path.join(self.temp_directory, "workspace")
+        self.repo_directory = os.path.join(self.temp_directory, "repo")
+        os.makedirs(self.repo_directory)
+        with open(os.path.join(self.repo_directory, ".shed.yml"), "w") as f:
+            yaml.dump(dict(name="cat", owner="iuc", description="cat"), f)
+        self._write("cat.xml", "<tool />")
+
+    def test_key(self):
+        cache = RealizationCache(os.path.join(self.temp_directory, "cache"))
+        files = [("cat.xml", os.path.join(self.repo_directory, "cat.xml"))]
+        key = cache.compute_key({"name": "cat"}, files, [])
+        assert_equal(key, cache.compute_key({"name": "cat"}, files, []))
+        assert key != cache.compute_key({"name": "cat2"}, files, [])
+        self._write("cat.xml", "<tool id=\"cat\" />")
+        assert key != cache.compute_key({"name": "cat"}, files, [])
+
+    def test_realization_reused(self):
+        realized = self._realize()
+        assert realized.cache is not None
+        assert os.path.exists(os.path.join(realized.path, "cat.xml"))
+        marker = os.path.join(realized.path, "marker")
+        open(marker, "w").close()
+
+        realized.record_result("lint", 0)
+        realized = self._realize()
+        # Unchanged repository - realized directory is left alone.
+        assert os.path.exists(marker)
+        assert realized.unchanged_since_success("lint")
+        tar_path, temporary = realized.build_tarball()
+        assert not temporary
+        assert_equal(realized.build_tarball()[0], tar_path)
+
+        self._write("cat.xml", "<tool id=\"cat\" />")
+        realized = self._realize()
+        assert not os.path.exists(marker)
+        assert not realized.unchanged_since_success("lint")
+        assert not os.path.exists(tar_path)
+
+    def test_not_cached_by_default(self):
+        realized = self._realize(cache_realizations=False)
+        assert realized.cache is None
+        assert not realized.unchanged_since_success("lint")
+        tar_path, temporary = realized.build_tarball()
+        assert temporary
+        os.remove(tar_path)
+
+    def test_upload_operation(self):
+        realized = self._realize()
+        kwds = dict(shed_target="toolshed")
+        operation = shed._upload_operation(self.ctx, realized, **kwds)
+        assert_equal(operation, shed._upload_operation(self.ctx, realized, **kwds))
+        for key, value in [("owner", "devteam"), ("name", "cat2"), ("message", "Update"), ("shed_target", "testtoolshed")]:
+            other_kwds = kwds.copy()
+            other_kwds[key] = value
+            assert operation != shed._upload_operation(self.ctx, realized, **other_kwds), key
+
+    def _realize(self, cache_realizations=True):
+        realized = []
+
+        def collect(realized_repository):
+            realized.append(realized_repository)
+            return 0
+
+        shed.for_each_repository(
+            self.ctx, collect, [self.repo_directory], cache_realizations=cache_realizations
+        )
+        assert_equal(len(realized), 1)
+        return realized[0]
+
+    def _write(self, name, contents):
+        with open(os.path.join(self.repo_directory, name), "w") as f:
+            f.write(contents)
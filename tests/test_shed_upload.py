@@ -195,6 +195,16 @@ class ShedUploadTestCase(CliShedTestCase):
             self._verify_upload(f, ["cat1.xml", "macros.xml"], ["cat1"])
             self._verify_upload(f, ["cat2.xml", "macros.xml"], ["cat2"])
 
+    def test_upload_recursive_jobs(self):
+        with self._isolate_repo("multi_repos_nested") as f:
+            upload_command = [
+                "shed_update", "-r", "--force_repository_creation", "--jobs", "2"
+            ]
+            upload_command.extend(self._shed_args())
+            self._check_exit_code(upload_command)
+            self._verify_upload(f, ["cat1.xml", "macros.xml"], ["cat1"])
+            self._verify_upload(f, ["cat2.xml", "macros.xml"], ["cat2"])
+
     def test_upload_filters_invalid_suite(self):
         with self._isolate_repo("suite_1") as f:
             # No .shed.yml, make sure to test it can infer type
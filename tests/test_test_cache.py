@@ -0,0 +1,51 @@
+"""Tests for the content-addressed test result cache in :mod:`planemo.test.cache`."""
+import os
+import shutil
+
+from planemo.runnable import for_path
+from planemo.test.cache import TestResultCache
+
+from .test_utils import (
+    assert_equal,
+    TempDirectoryTestCase,
+    TEST_DATA_DIR,
+)
+
+
+class TestResultCacheTestCase(TempDirectoryTestCase):
+
+    def setUp(self):  # noqa
+        super(TestResultCacheTestCase, self).setUp()
+        for name in ["output_tests_tool.cwl", "output_tests_tool_test.yml", "cat_tool_job.json", "hello.txt"]:
+            shutil.copy(os.path.join(TEST_DATA_DIR, name), self.temp_directory)
+        self.tool_path = os.path.join(self.temp_directory, "output_tests_tool.cwl")
+        self.cache = TestResultCache(os.path.join(self.temp_directory, "cache"), "engine1")
+
+    def test_key_changes_with_content(self):
+        runnable = for_path(self.tool_path)
+        key = self.cache.key(runnable)
+        assert_equal(key, self.cache.key(runnable))
+        other_engine = TestResultCache(self.cache.cache_directory, "engine2")
+        assert key != other_engine.key(runnable)
+
+        # Changing test data referenced by a job changes the key.
+        with open(os.path.join(self.temp_directory, "hello.txt"), "a") as f:
+            f.write("more data\n")
+        assert key != self.cache.key(runnable)
+
+    def test_only_successes_cached(self):
+        runnable = for_path(self.tool_path)
+        assert self.cache.get(runnable) is None
+
+        failed_tests = [_test("success"), _test("failure")]
+        assert not self.cache.put(runnable, failed_tests)
+        assert self.cache.get(runnable) is None
+
+        assert self.cache.put(runnable, [_test("success")])
+        cached_tests = self.cache.get(runnable)
+        assert_equal(len(cached_tests), 1)
+        assert cached_tests[0]["data"]["cached"]
+
+
+def _test(status):
+    return {"id": "output_tests_tool_0", "has_data": True, "data": {"status": status}}
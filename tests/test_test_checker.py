@@ -1,10 +1,12 @@
 """Unit tests for runnable test case checking and related functionality."""
+import hashlib
 import os
 
 from planemo.runnable import (
     cases,
     for_path,
 )
+from planemo.test import check_output
 
 from .test_utils import TEST_DATA_DIR
 
@@ -54,6 +56,25 @@ def test_file_case_checker():
     assert sd["data"]["status"] == "failure"
 
 
+def test_check_output_streaming():
+    hello_txt_path = os.path.join(TEST_DATA_DIR, "hello.txt")
+    other_path = os.path.join(TEST_DATA_DIR, "int_tool_job.json")
+    runnable = for_path(os.path.join(TEST_DATA_DIR, "cat_tool.cwl"))
+    with open(hello_txt_path, "rb") as f:
+        hello_md5 = hashlib.md5(f.read()).hexdigest()
+
+    def problems(path, **test_properties):
+        return check_output(runnable, {"path": path}, test_properties)
+
+    assert problems(hello_txt_path, file="hello.txt") == []
+    assert problems(other_path, file="hello.txt")
+    assert problems(hello_txt_path, md5=hello_md5) == []
+    assert problems(hello_txt_path, checksum="md5$%s" % hello_md5) == []
+    assert "checksum" in problems(other_path, md5=hello_md5)[0]
+    assert problems(other_path, file="hello.txt", compare="sim_size", delta="100000") == []
+    assert problems(other_path, file="hello.txt", compare="sim_size", delta="0")
+
+
 class MockRunResponse(object):
 
     def __init__(self, outputs_dict):
@@ -76,4 +97,5 @@ class MockErrorRunResponse(object):
 __all__ = (
     "test_non_file_case_checker",
     "test_file_case_checker",
+    "test_check_output_streaming",
 )
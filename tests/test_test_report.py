@@ -1,5 +1,12 @@
+import json
 import os
 
+from planemo.test.results import (
+    is_json_lines,
+    StructuredData,
+    write_structured_data,
+)
+
 from .test_utils import CliTestCase, TEST_DATA_DIR
 
 
@@ -9,3 +16,62 @@ class TestReportsTestCase(CliTestCase):
         with self._isolate():
             json_path = os.path.join(TEST_DATA_DIR, "issue381.json")
             self._check_exit_code(["test_reports", json_path], exit_code=0)
+
+    def test_build_reports_json_lines(self):
+        with self._isolate() as f:
+            json_path = os.path.join(TEST_DATA_DIR, "issue381.json")
+            with open(json_path, "r") as json_f:
+                data = json.load(json_f)
+            jsonl_path = os.path.join(f, "tool_test_output.jsonl")
+            write_structured_data(jsonl_path, data)
+            assert is_json_lines(jsonl_path)
+            assert not is_json_lines(json_path)
+
+            sd = StructuredData(jsonl_path)
+            assert sd.json_lines
+            assert list(sd.structured_data_tests) == data["tests"]
+            assert sd.num_tests == data["summary"]["num_tests"]
+            sd.set_exit_code(1)
+            sd.update()
+            sd = StructuredData(jsonl_path)
+            assert sd.exit_code == 1
+
+            html_path = os.path.join(f, "report.html")
+            self._check_exit_code(["test_reports", jsonl_path, "--test_output", html_path], exit_code=0)
+            with open(html_path, "r") as html_f:
+                assert data["tests"][0]["id"] in html_f.read()
+
+    def test_set_tests_resets_index(self):
+        json_path = os.path.join(TEST_DATA_DIR, "issue381.json")
+        sd = StructuredData(json_path)
+        first_id = sd.structured_data_tests[0]["id"]
+        assert first_id in sd.structured_data_by_id
+        extra_test = {"id": "extra_test", "has_data": True, "data": {"status": "success"}}
+        sd.set_tests([extra_test] + list(sd.structured_data_tests))
+        assert sd.structured_data["tests"][0] is extra_test
+        assert "extra_test" in sd.structured_data_by_id
+        assert first_id in sd.structured_data_by_id
+
+    def test_build_reports_sharded(self):
+        with self._isolate() as f:
+            json_path = os.path.join(TEST_DATA_DIR, "issue381.json")
+            with open(json_path, "r") as json_f:
+                data = json.load(json_f)
+            html_path = os.path.join(f, "report.html")
+            self._check_exit_code([
+                "test_reports", json_path,
+                "--test_output", html_path,
+                "--test_output_html_mode", "sharded",
+            ], exit_code=0)
+            details_path = os.path.join(f, "report_details")
+            shards = sorted(os.listdir(details_path))
+            assert shards[0] == "shard_00000.js"
+            with open(os.path.join(details_path, shards[0]), "r") as shard_f:
+                assert shard_f.read().startswith("registerTestShard(0, ")
+            with open(html_path, "r") as html_f:
+                html = html_f.read()
+            assert "renderTestIndex(" in html
+            assert "report_details" in html
+            # Details (like the command line) are only in the shards.
+            command_line = data["tests"][0]["data"]["job"]["command_line"]
+            assert command_line not in html
@@ -0,0 +1,77 @@
+"""Unit tests for :mod:`planemo.tool_cache`."""
+import os
+
+from planemo.tool_cache import (
+    load_tool_source,
+    ToolIndex,
+)
+
+from .test_utils import (
+    assert_equal,
+    TempDirectoryTestCase,
+)
+
+TOOL = """<tool id="cached" name="Cached" version="@VERSION@">
+    <macros><import>macros.xml</import></macros>
+    <requirements><requirement type="package" version="@VERSION@">samtools</requirement></requirements>
+    <command>true</command>
+    <tests><test><param name="input" value="1.bam,2.bam" /><output name="out" file="out.txt" /></test></tests>
+</tool>
+"""
+MACROS = """<macros><token name="@VERSION@">%s</token></macros>"""
+
+
+class ToolCacheTestCase(TempDirectoryTestCase):
+
+    def setUp(self):
+        super(ToolCacheTestCase, self).setUp()
+        self.tool_path = self._write("tool.xml", TOOL)
+        self._write("macros.xml", MACROS % "1.0")
+        self.cache_directory = os.path.join(self.temp_directory, "cache")
+
+    def test_summary(self):
+        summary = ToolIndex(self.cache_directory).summary(self.tool_path)
+        assert_equal(summary.parse_id(), "cached")
+        assert_equal(summary.parse_version(), "1.0")
+        assert_equal(summary.test_count, 1)
+        assert_equal(summary.test_data, ["1.bam", "2.bam", "out.txt"])
+        assert_equal(summary.macro_paths, [os.path.join(self.temp_directory, "macros.xml")])
+        requirements, _ = summary.parse_requirements_and_containers()
+        assert_equal([(r.name, r.version) for r in requirements], [("samtools", "1.0")])
+
+    def test_summary_persisted_until_macros_change(self):
+        ToolIndex(self.cache_directory).summary(self.tool_path)
+        # A fresh index (as in a new planemo process) reads the stored summary.
+        index = ToolIndex(self.cache_directory)
+        assert index._read(os.path.abspath(self.tool_path)) is not None
+
+        self._write("macros.xml", MACROS % "1.1")
+        assert index._read(os.path.abspath(self.tool_path)) is None
+        assert_equal(index.summary(self.tool_path).parse_version(), "1.1")
+
+    def test_load_tool_source_memoized(self):
+        tool_source = load_tool_source(self.tool_path)
+        assert load_tool_source(self.tool_path) is tool_source
+
+        self._write("macros.xml", MACROS % "10.0")
+        tool_source = load_tool_source(self.tool_path)
+        assert_equal(tool_source.parse_version(), "10.0")
+
+    def test_nested_macro_imports(self):
+        self._write("macros.xml", "<macros><import>versions.xml</import></macros>")
+        self._write("versions.xml", MACROS % "2.0")
+        summary = ToolIndex(self.cache_directory).summary(self.tool_path)
+        assert_equal(summary.parse_version(), "2.0")
+        assert_equal(summary.macro_paths, [
+            os.path.join(self.temp_directory, "macros.xml"),
+            os.path.join(self.temp_directory, "versions.xml"),
+        ])
+
+        self._write("versions.xml", MACROS % "2.1")
+        assert_equal(load_tool_source(self.tool_path).parse_version(), "2.1")
+
+    def _write(self, name, contents):
+        path = os.path.join(self.temp_directory, name)
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
@@ -0,0 +1,83 @@
+"""Tests for concurrent URL checking in :mod:`planemo.url_checker`."""
+import os
+import threading
+from xml.etree import ElementTree as ET
+
+from galaxy.tools.lint import LintContext
+from six.moves import BaseHTTPServer
+
+from planemo import lint
+from planemo.url_checker import UrlChecker
+
+from .test_utils import (
+    assert_equal,
+    TempDirectoryTestCase,
+)
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):  # noqa
+        self.server.requested.append(self.path)
+        status = 404 if self.path.startswith("/missing") else 200
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(b"content")
+
+    def log_message(self, *args):
+        pass
+
+
+class UrlCheckerTestCase(TempDirectoryTestCase):
+
+    def setUp(self):  # noqa
+        super(UrlCheckerTestCase, self).setUp()
+        self.server = BaseHTTPServer.HTTPServer(("localhost", 0), _Handler)
+        self.server.requested = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.base_url = "http://localhost:%d" % self.server.server_address[1]
+        self.cache_path = os.path.join(self.temp_directory, "url_cache.json")
+
+    def tearDown(self):  # noqa
+        self.server.shutdown()
+        self.server.server_close()
+        super(UrlCheckerTestCase, self).tearDown()
+
+    def test_check_all_deduplicates(self):
+        checker = UrlChecker(self.cache_path)
+        ok_url = self.base_url + "/ok"
+        missing_url = self.base_url + "/missing"
+        targets = [(ok_url, None), (missing_url, None), (ok_url, None)] * 5
+        results = checker.check_all(targets)
+        assert_equal([r.status_code for r in results], [200, 404])
+        assert_equal(sorted(self.server.requested), ["/missing", "/ok"])
+
+        # Results reused from memory and then from the on-disk cache.
+        checker.check(ok_url)
+        checker.save()
+        assert_equal(UrlChecker(self.cache_path).check(ok_url).status_code, 200)
+        assert_equal(len(self.server.requested), 2)
+
+        # Expired entries are fetched again.
+        assert_equal(UrlChecker(self.cache_path, ttl=-1).check(ok_url).status_code, 200)
+        assert_equal(len(self.server.requested), 3)
+
+    def test_connection_errors_not_cached(self):
+        checker = UrlChecker(self.cache_path)
+        self.server.server_close()
+        result = checker.check("http://localhost:1/")
+        assert result.error
+        assert not result.cacheable
+        checker.save()
+        assert not os.path.exists(self.cache_path)
+
+    def test_lint_urls(self):
+        root = ET.fromstring(
+            "<tool><help>See %s/ok and %s/missing for details.</help></tool>" % (self.base_url, self.base_url)
+        )
+        lint_ctx = LintContext("all")
+        lint_ctx.lint("lint_urls", lint.lint_urls, root)
+        assert_equal(len(lint_ctx.error_messages), 1)
+        assert "missing" in lint_ctx.error_messages[0]
@@ -1,4 +1,5 @@
 import os
+from xml.etree import ElementTree as ET
 
 from planemo import shed_lint
 from planemo.xml import validation
@@ -22,6 +23,21 @@ def test_xmllint_validation():
     _check_validator(xmllint_xsd_validator)
 
 
+@skip_unless_module("lxml")
+def test_lxml_schema_compiled_once():
+    schema_path = _path("xsd_schema_1.xsd")
+    assert validation.compiled_schema(schema_path) is validation.compiled_schema(schema_path)
+
+
+def test_validate_tree():
+    xsd_validator = validation.get_validator()
+    schema_path = _path("xsd_schema_1.xsd")
+    assert xsd_validator.validate_tree(schema_path, ET.parse(_path("xml_good_1.xml"))).passed
+    result = xsd_validator.validate_tree(schema_path, ET.parse(_path("xml_bad_1.xml")).getroot())
+    assert not result.passed
+    assert "not_command" in str(result.output), str(result.output)
+
+
 def test_tool_dependencies_validation():
     _assert_validates(shed_lint.TOOL_DEPENDENCIES_XSD,
                       _path("tool_dependencies_good_1.xml"))